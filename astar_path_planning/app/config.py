@@ -0,0 +1,56 @@
+import os
+
+# 应用配置，均可通过环境变量覆盖
+
+# /path/find 结果缓存的最大条目数，为0时关闭缓存
+PATH_CACHE_SIZE = int(os.environ.get("ASTAR_PATH_CACHE_SIZE", "256"))
+# 缓存条目的有效期（秒），为0时不过期
+PATH_CACHE_TTL = float(os.environ.get("ASTAR_PATH_CACHE_TTL", "300"))
+
+# /path/batch 使用的工作进程数，为0时使用CPU核数
+BATCH_WORKERS = int(os.environ.get("ASTAR_BATCH_WORKERS", "0"))
+# 单次批量请求允许的最大查询数量
+BATCH_MAX_QUERIES = int(os.environ.get("ASTAR_BATCH_MAX_QUERIES", "2000"))
+
+# 地图尺寸上限；宽或高超过MAX_DENSE_MAP_SIZE的地图使用基于内存映射文件的分块存储
+MAX_MAP_SIZE = int(os.environ.get("ASTAR_MAX_MAP_SIZE", "10000"))
+MAX_DENSE_MAP_SIZE = int(os.environ.get("ASTAR_MAX_DENSE_MAP_SIZE", "200"))
+# 分块地图的存放目录，为空时在系统临时目录中创建（地图释放后删除）；/grid/open 只能打开该目录下的地图
+TILED_MAP_DIR = os.environ.get("ASTAR_TILED_MAP_DIR", "")
+# 分块边长和内存中最多缓存的分块数量
+MAP_TILE_SIZE = int(os.environ.get("ASTAR_MAP_TILE_SIZE", "256"))
+MAP_TILE_CACHE = int(os.environ.get("ASTAR_MAP_TILE_CACHE", "64"))
+
+# 内存中最多保留的地图数量，以及所有地图数组的内存预算（MB）；超出时淘汰最久未访问的地图，为0时不限制
+MAX_MAPS = int(os.environ.get("ASTAR_MAX_MAPS", "32"))
+MAP_MEMORY_BUDGET = int(os.environ.get("ASTAR_MAP_MEMORY_BUDGET", "1024"))
+
+# /path/field 代价场缓存的最大条目数（每个条目约占 地图格子数*5 字节）
+FIELD_CACHE_SIZE = int(os.environ.get("ASTAR_FIELD_CACHE_SIZE", "16"))
+
+# /visualization/render 底图缓存的最大条目数（按地图版本缓存）
+RENDER_CACHE_SIZE = int(os.environ.get("ASTAR_RENDER_CACHE_SIZE", "8"))
+# 渲染图像的最大边长（格子数），更大的地图降采样后渲染
+RENDER_MAX_IMAGE_SIZE = int(os.environ.get("ASTAR_RENDER_MAX_IMAGE_SIZE", "2048"))
+
+# /path/find 搜索的执行方式：thread（线程池）或 process（与 /path/batch 共用进程池）；渲染始终在线程池中执行
+SEARCH_EXECUTOR = os.environ.get("ASTAR_SEARCH_EXECUTOR", "thread")
+# 搜索和渲染使用的线程池大小
+SEARCH_WORKERS = int(os.environ.get("ASTAR_SEARCH_WORKERS", "4"))
+# 单次搜索最多扩展的节点数和最长时间（秒），请求中的限制只能更严格；为0时不限制
+SEARCH_MAX_NODES = int(os.environ.get("ASTAR_SEARCH_MAX_NODES", "5000000"))
+SEARCH_TIMEOUT = float(os.environ.get("ASTAR_SEARCH_TIMEOUT", "30"))
+
+# 是否记录请求和搜索的耗时直方图，并在 /metrics 以Prometheus文本格式提供
+METRICS_ENABLED = os.environ.get("ASTAR_METRICS_ENABLED", "1") == "1"
+# 是否对每次 /path/find 搜索启用插桩计数（堆操作、邻居评估、代价函数调用等）并计入 /metrics；
+# 关闭时只有请求了include_stats的搜索启用插桩，其余搜索没有额外开销
+SEARCH_STATS = os.environ.get("ASTAR_SEARCH_STATS", "0") == "1"
+
+# 是否允许请求以profile=true在性能分析器下运行 /path/find 和 /visualization/render
+PROFILING_ENABLED = os.environ.get("ASTAR_PROFILING_ENABLED", "0") == "1"
+# 性能分析报告中保留的热点函数数量，以及内存中保留的最近报告数量
+PROFILE_TOP = int(os.environ.get("ASTAR_PROFILE_TOP", "25"))
+PROFILE_KEEP = int(os.environ.get("ASTAR_PROFILE_KEEP", "32"))
+# 不为空时把完整的分析结果（.prof 或采样统计）写入该目录
+PROFILE_DIR = os.environ.get("ASTAR_PROFILE_DIR", "")
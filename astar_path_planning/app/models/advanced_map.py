@@ -1,7 +1,16 @@
+import copy
 import numpy as np
 import math
 from typing import List, Tuple, Dict
-from .grid_map import GridMap, TerrainMap
+from .grid_map import GridMap, TerrainMap, DIRECTIONS, padded_window
+
+# 天气对移动代价的影响系数
+WEATHER_FACTORS = {
+    'clear': 1.0,
+    'rain': 1.5,
+    'snow': 2.0,
+    'fog': 1.3
+}
 
 class DynamicObstacle:
     """动态障碍物类"""
@@ -62,23 +71,41 @@ class AdvancedMap(TerrainMap):
         obstacle = DynamicObstacle(x, y, movement_pattern, params)
         self.dynamic_obstacles.append(obstacle)
     
-    def update_dynamic_obstacles(self, delta_time: float):
-        """更新所有动态障碍物的位置"""
+    def unshare(self):
+        """动态障碍物对象也换用副本：update_dynamic_obstacles会原地修改它们，不能影响快照"""
+        if self.__dict__.get("_shared"):
+            self.dynamic_obstacles = copy.deepcopy(self.dynamic_obstacles)
+        super().unshare()
+    
+    def update_dynamic_obstacles(self, delta_time: float) -> List[Tuple[int, int]]:
+        """
+        更新所有动态障碍物的位置
+        
+        返回:
+            状态发生变化的格子坐标列表（旧位置和新位置），可直接交给增量规划器
+        """
+        changed = set()
+        
         # 清除旧的动态障碍物标记
         for obstacle in self.dynamic_obstacles:
             if self.is_valid(obstacle.x, obstacle.y):
                 super().clear_obstacle(obstacle.x, obstacle.y)
+                changed.add((obstacle.x, obstacle.y))
         
         # 更新并标记新的动态障碍物位置
         for obstacle in self.dynamic_obstacles:
             obstacle.update(delta_time)
             if self.is_valid(obstacle.x, obstacle.y):
                 super().set_obstacle(obstacle.x, obstacle.y)
+                changed.add((obstacle.x, obstacle.y))
+        
+        return list(changed)
     
     def set_elevation(self, x: int, y: int, height: float):
         """设置地形高度"""
-        if self.is_valid(x, y):
+        if self.is_valid(x, y) and self.elevation[y, x] != height:
             self.elevation[y, x] = height
+            self.mark_dirty(x, y, x + 1, y + 1)
     
     def get_elevation(self, x: int, y: int) -> float:
         """获取地形高度"""
@@ -88,8 +115,19 @@ class AdvancedMap(TerrainMap):
     
     def set_zone(self, x: int, y: int, zone_id: int):
         """设置区域标识"""
-        if self.is_valid(x, y):
+        if self.is_valid(x, y) and self.zones[y, x] != zone_id:
             self.zones[y, x] = zone_id
+            self.mark_dirty(x, y, x + 1, y + 1)
+    
+    def set_elevation_map(self, elevation: np.ndarray):
+        """一次性设置整张地图的高度，形状为(height, width)"""
+        self.elevation[:] = elevation
+        self.mark_all_dirty()
+    
+    def set_zone_map(self, zones: np.ndarray):
+        """一次性设置整张地图的区域标识，形状为(height, width)"""
+        self.zones[:] = zones
+        self.mark_all_dirty()
     
     def get_zone(self, x: int, y: int) -> int:
         """获取区域标识"""
@@ -99,11 +137,29 @@ class AdvancedMap(TerrainMap):
     
     def set_weather(self, condition: str):
         """设置天气状况"""
-        self.weather_condition = condition
+        if condition != self.weather_condition:
+            self.weather_condition = condition
+            self.mark_all_dirty()
     
     def set_light_level(self, level: float):
         """设置光照水平"""
-        self.light_level = max(0.0, min(1.0, level))
+        level = max(0.0, min(1.0, level))
+        if level != self.light_level:
+            self.light_level = level
+            self.mark_all_dirty()
+    
+    def get_environment_factor(self) -> float:
+        """天气与光照共同作用的代价系数（夜间移动代价增加）"""
+        weather_factor = WEATHER_FACTORS.get(self.weather_condition, 1.0)
+        light_factor = 1.0 + (1.0 - self.light_level) * 0.5
+        return weather_factor * light_factor
+    
+    def has_uniform_cost(self) -> bool:
+        """除地形代价外，还要求可通行格子的高度一致（天气和光照只整体缩放代价）"""
+        if not super().has_uniform_cost():
+            return False
+        free_elevation = self.elevation[~self.grid]
+        return free_elevation.size == 0 or bool(np.all(free_elevation == free_elevation[0]))
     
     def get_movement_cost(self, x1: int, y1: int, x2: int, y2: int) -> float:
         """计算考虑多个因素的移动代价"""
@@ -117,19 +173,19 @@ class AdvancedMap(TerrainMap):
         elevation_diff = abs(self.get_elevation(x2, y2) - self.get_elevation(x1, y1))
         elevation_cost = elevation_diff * 0.5
         
-        # 天气影响
-        weather_factor = {
-            'clear': 1.0,
-            'rain': 1.5,
-            'snow': 2.0,
-            'fog': 1.3
-        }.get(self.weather_condition, 1.0)
-        
-        # 光照影响（夜间移动代价增加）
-        light_factor = 1.0 + (1.0 - self.light_level) * 0.5
-        
-        # 计算总代价
+        # 计算总代价（天气和光照影响）
         total_cost = base_cost + elevation_cost
-        total_cost *= weather_factor * light_factor
+        total_cost *= self.get_environment_factor()
         
-        return total_cost
\ No newline at end of file
+        return total_cost
+    
+    def _compute_edge_costs(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """在基础边代价上叠加高度差代价以及天气和光照系数，与get_movement_cost一致"""
+        costs = super()._compute_edge_costs(x0, y0, x1, y1)
+        h, w = y1 - y0, x1 - x0
+        elevation = padded_window(self.elevation, x0, y0, x1, y1, 0.0)
+        source = elevation[1:1 + h, 1:1 + w]
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            costs[:, :, d] += np.abs(elevation[1 + dy:1 + dy + h, 1 + dx:1 + dx + w] - source) * 0.5
+        costs *= self.get_environment_factor()
+        return costs
\ No newline at end of file
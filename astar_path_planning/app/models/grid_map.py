@@ -1,9 +1,97 @@
 import numpy as np
 import math
+import itertools
+import copy
+
+# 八个邻居方向(dx, dy)，第i个方向对应邻居掩码的第i位；相反方向的编号为 7 - i
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+# 邻居掩码 -> 可通行方向编号的查找表
+MASK_DIRECTIONS = [tuple(d for d in range(8) if mask >> d & 1) for mask in range(256)]
+
+# 每个方向的移动距离
+DIRECTION_LENGTHS = np.array([math.sqrt(dx * dx + dy * dy) for dx, dy in DIRECTIONS])
+
+# 待重算区域超过该数量时合并为一个外接矩形
+_MAX_DIRTY_REGIONS = 64
+
+# 每张地图最多保留的修改记录条数，更早的记录被丢弃后只能整体重算
+_MAX_DIRTY_LOG = 256
+
+# 版本号在所有地图之间全局递增，同一个版本号只对应一份地图内容，
+# 上层缓存可以直接用版本号作为键，重新创建地图也不会与旧缓存冲突
+_version_counter = itertools.count(1)
+
+def merge_regions(regions, limit=_MAX_DIRTY_REGIONS):
+    """区域数量超过limit时合并为一个外接矩形，减少逐块重算的次数"""
+    if len(regions) <= limit:
+        return list(regions)
+    return [(min(r[0] for r in regions), min(r[1] for r in regions),
+             max(r[2] for r in regions), max(r[3] for r in regions))]
+
+def padded_window(array, x0, y0, x1, y1, fill):
+    """
+    取出区域[x0, x1) x [y0, y1)向外扩一圈的窗口，超出地图的部分用fill填充
+    
+    返回:
+        形状为(y1-y0+2, x1-x0+2)的数组
+    """
+    height, width = array.shape
+    window = np.full((y1 - y0 + 2, x1 - x0 + 2), fill, dtype=array.dtype)
+    sx0, sy0 = max(x0 - 1, 0), max(y0 - 1, 0)
+    sx1, sy1 = min(x1 + 1, width), min(y1 + 1, height)
+    window[sy0 - y0 + 1:sy1 - y0 + 1, sx0 - x0 + 1:sx1 - x0 + 1] = array[sy0:sy1, sx0:sx1]
+    return window
+
+def stroke_mask(points, brush_size=1):
+    """
+    生成方形笔刷沿折线绘制的掩码
+    
+    相邻点之间按格子逐步插值，每个点覆盖以它为中心、向四周各扩展brush_size//2格的正方形
+    （与前端笔刷一致）。
+    
+    参数:
+        points: 折线顶点[(x, y), ...]
+        brush_size: 笔刷尺寸
+    
+    返回:
+        (掩码, x0, y0)，掩码左上角对应地图坐标(x0, y0)；points为空时返回None
+    """
+    if not points:
+        return None
+    pts = np.asarray(points, dtype=int).reshape(-1, 2)
+    
+    # 折线插值为相邻格子组成的点列
+    centers = [pts[:1]]
+    for (ax, ay), (bx, by) in zip(pts[:-1], pts[1:]):
+        steps = max(abs(bx - ax), abs(by - ay))
+        if steps:
+            t = np.arange(1, steps + 1) / steps
+            centers.append(np.stack([np.rint(ax + (bx - ax) * t), np.rint(ay + (by - ay) * t)], axis=1).astype(int))
+    centers = np.concatenate(centers)
+    
+    half = brush_size // 2
+    x0, y0 = centers.min(axis=0) - half
+    x1, y1 = centers.max(axis=0) + half + 1
+    core = np.zeros((y1 - y0 - 2 * half, x1 - x0 - 2 * half), dtype=bool)
+    core[centers[:, 1] - y0 - half, centers[:, 0] - x0 - half] = True
+    
+    # 用平移叠加代替逐点绘制正方形（膨胀）
+    mask = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+    h, w = core.shape
+    for dy in range(2 * half + 1):
+        for dx in range(2 * half + 1):
+            mask[dy:dy + h, dx:dx + w] |= core
+    return mask, int(x0), int(y0)
 
 class GridMap:
     """栅格地图类，用于表示二维栅格环境"""
     
+    # 是否提供稠密的边代价张量（get_edge_costs），不提供的地图（如分块地图）只能逐边调用get_movement_cost
+    has_edge_costs = True
+    # snapshot()得到的快照是否与之后的修改隔离（写时复制）；不隔离的地图（如分块地图）由MapRegistry的读写锁保证一致
+    isolated_snapshots = True
+    
     def __init__(self, width, height):
         """
         初始化栅格地图
@@ -16,6 +104,106 @@ class GridMap:
         self.height = height
         self.grid = np.zeros((height, width), dtype=bool)  # False表示可通行，True表示障碍物
         self.cost_map = np.ones((height, width), dtype=float)  # 默认代价为1.0
+        # 每个格子的8位可通行邻居掩码，第i位表示DIRECTIONS[i]方向的邻居可通行
+        self.neighbor_mask = np.zeros((height, width), dtype=np.uint8)
+        self.update_neighbor_mask(0, 0, width, height)
+        # 地图内容版本号，每次修改都会递增；_dirty_log记录每次修改的(版本号, 区域)
+        self.version = next(_version_counter)
+        self._dirty_log = []
+        self._dirty_log_floor = self.version  # 早于该版本的修改记录已被丢弃
+        # 边代价张量edge_costs[y, x, d]：从(x,y)沿DIRECTIONS[d]移动一步的代价，按需延迟重算
+        self._edge_costs = np.empty((height, width, 8), dtype=float)
+        self._edge_cost_version = None
+    
+    def mark_dirty(self, x0, y0, x1, y1):
+        """
+        记录矩形区域[x0, x1) x [y0, y1)内的格子发生了变化，并递增版本号
+        
+        所有修改地图的方法都必须调用它，邻居掩码以外的派生数据
+        （边代价、缓存的路径、渲染图像等）依靠版本号判断是否需要重算。
+        """
+        region = (max(x0, 0), max(y0, 0), min(x1, self.width), min(y1, self.height))
+        self.version = next(_version_counter)
+        self._dirty_log.append((self.version, region))
+        if len(self._dirty_log) > _MAX_DIRTY_LOG:
+            dropped = self._dirty_log[:_MAX_DIRTY_LOG // 2]
+            del self._dirty_log[:_MAX_DIRTY_LOG // 2]
+            self._dirty_log_floor = dropped[-1][0]
+    
+    def mark_all_dirty(self):
+        """记录整张地图发生了变化（如天气、光照改变）"""
+        self.mark_dirty(0, 0, self.width, self.height)
+    
+    def dirty_regions_since(self, version):
+        """
+        获取自指定版本以来发生变化的区域
+        
+        参数:
+            version: 派生数据上次同步时的地图版本号
+        
+        返回:
+            区域列表[(x0, y0, x1, y1), ...]；版本号为None或相关记录已被丢弃时返回None，
+            调用方应整体重算
+        """
+        if version is None or version < self._dirty_log_floor:
+            return None
+        if version >= self.version:
+            return []
+        return [region for v, region in self._dirty_log if v > version]
+    
+    def snapshot(self):
+        """
+        创建共享底层数组的只读快照（写时复制）
+    
+        快照与地图共享所有数组，创建代价与地图大小无关。之后修改地图前必须先调用
+        unshare()，地图换用数组副本，快照继续看到创建时的内容。
+        快照与地图共享derived_state()，增量维护的派生数据可以跨版本复用。
+    
+        返回:
+            与当前地图内容和版本号相同的地图对象，不应被修改
+        """
+        self.derived_state()
+        # 不用copy.copy：它经过__getstate__，会丢掉共享的派生数据
+        snap = object.__new__(type(self))
+        snap.__dict__.update(self.__dict__)
+        self._shared = True
+        return snap
+    
+    def unshare(self):
+        """修改地图前调用：如果数组仍被快照共享，换用私有副本"""
+        if not self.__dict__.get("_shared"):
+            return
+        for key, value in self.__dict__.items():
+            if key == "_derived":
+                continue
+            if isinstance(value, np.ndarray):
+                self.__dict__[key] = value.copy()
+            elif isinstance(value, (list, dict)):
+                self.__dict__[key] = copy.copy(value)
+        self._shared = False
+    
+    def derived_state(self):
+        """
+        获取派生数据（如分层A*的抽象图）的存放字典
+    
+        地图和它的所有快照共享同一个字典，派生数据可以依靠dirty_regions_since
+        从旧快照增量更新到新快照。序列化时不保留。
+        """
+        state = self.__dict__.get("_derived")
+        if state is None:
+            state = self.__dict__["_derived"] = {}
+        return state
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_derived", None)
+        state.pop("_shared", None)
+        return state
+    
+    def nbytes(self):
+        """地图在内存中占用的数组字节数（内存映射的数组不计入）"""
+        return sum(value.nbytes for value in self.__dict__.values()
+                   if isinstance(value, np.ndarray) and not isinstance(value, np.memmap))
     
     def is_valid(self, x, y):
         """检查坐标是否在地图范围内"""
@@ -24,14 +212,177 @@ class GridMap:
     def set_obstacle(self, x, y):
         """在指定位置设置障碍物"""
         if self.is_valid(x, y):
-            self.grid[y, x] = True
-            self.cost_map[y, x] = float('inf')
+            if not self.grid[y, x]:
+                self.grid[y, x] = True
+                self._flip_neighbor_bits(x, y, passable=False)
+                self.cost_map[y, x] = float('inf')
+                self.mark_dirty(x, y, x + 1, y + 1)
     
     def clear_obstacle(self, x, y):
         """清除指定位置的障碍物"""
         if self.is_valid(x, y):
-            self.grid[y, x] = False
-            self.cost_map[y, x] = 1.0
+            if self.grid[y, x]:
+                self.grid[y, x] = False
+                self._flip_neighbor_bits(x, y, passable=True)
+            if self.cost_map[y, x] != 1.0:
+                self.cost_map[y, x] = 1.0
+                self.mark_dirty(x, y, x + 1, y + 1)
+    
+    def _clip_mask(self, mask, x0, y0):
+        """
+        把左上角位于(x0, y0)的布尔掩码裁剪到地图范围内
+        
+        返回:
+            (裁剪后的掩码, x0, y0, x1, y1)；掩码完全在地图外时返回None
+        """
+        mask = np.asarray(mask, dtype=bool)
+        h, w = mask.shape
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x0 + w, self.width), min(y0 + h, self.height)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return None
+        return mask[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0], cx0, cy0, cx1, cy1
+    
+    def _mark_changed(self, changed, x0, y0, passability_changed=False):
+        """
+        按变化格子的包围盒记录一次修改，通行状态变化时同时重算邻居掩码
+        
+        返回:
+            变化的格子数量
+        """
+        ys, xs = np.nonzero(changed)
+        if len(ys) == 0:
+            return 0
+        bx0, by0 = x0 + int(xs.min()), y0 + int(ys.min())
+        bx1, by1 = x0 + int(xs.max()) + 1, y0 + int(ys.max()) + 1
+        if passability_changed:
+            self.update_neighbor_mask(bx0 - 1, by0 - 1, bx1 + 1, by1 + 1)
+        self.mark_dirty(bx0, by0, bx1, by1)
+        return len(ys)
+    
+    def set_obstacles(self, mask, x0=0, y0=0):
+        """
+        把掩码为True的格子批量设为障碍物，整个操作只递增一次版本号
+        
+        参数:
+            mask: 布尔数组，mask[j, i]对应格子(x0+i, y0+j)，超出地图的部分被忽略
+            x0, y0: 掩码左上角在地图中的坐标
+        
+        返回:
+            变化的格子数量
+        """
+        clipped = self._clip_mask(mask, x0, y0)
+        if clipped is None:
+            return 0
+        mask, x0, y0, x1, y1 = clipped
+        grid = self.grid[y0:y1, x0:x1]
+        changed = mask & ~grid
+        grid[changed] = True
+        self.cost_map[y0:y1, x0:x1][changed] = float('inf')
+        return self._mark_changed(changed, x0, y0, passability_changed=True)
+    
+    def clear_obstacles(self, mask, x0=0, y0=0):
+        """
+        批量清除掩码为True的格子上的障碍物，并把代价重置为1.0（与clear_obstacle一致）
+        
+        参数:
+            mask: 布尔数组，mask[j, i]对应格子(x0+i, y0+j)，超出地图的部分被忽略
+            x0, y0: 掩码左上角在地图中的坐标
+        
+        返回:
+            变化的格子数量
+        """
+        clipped = self._clip_mask(mask, x0, y0)
+        if clipped is None:
+            return 0
+        mask, x0, y0, x1, y1 = clipped
+        grid = self.grid[y0:y1, x0:x1]
+        cost = self.cost_map[y0:y1, x0:x1]
+        freed = mask & grid
+        changed = mask & (grid | (cost != 1.0))
+        grid[freed] = False
+        cost[changed] = 1.0
+        return self._mark_changed(changed, x0, y0, passability_changed=bool(freed.any()))
+    
+    def fill_rect(self, x0, y0, x1, y1, is_obstacle=True):
+        """
+        把矩形区域[x0, x1) x [y0, y1)全部设为障碍物或全部清除
+        
+        返回:
+            变化的格子数量
+        """
+        if x0 >= x1 or y0 >= y1:
+            return 0
+        mask = np.ones((y1 - y0, x1 - x0), dtype=bool)
+        if is_obstacle:
+            return self.set_obstacles(mask, x0, y0)
+        return self.clear_obstacles(mask, x0, y0)
+    
+    def set_terrain_costs(self, mask, cost, x0=0, y0=0):
+        """
+        批量设置掩码为True的可通行格子的地形代价，障碍物格子保持不变
+        
+        返回:
+            变化的格子数量
+        """
+        clipped = self._clip_mask(mask, x0, y0)
+        if clipped is None:
+            return 0
+        mask, x0, y0, x1, y1 = clipped
+        cost_map = self.cost_map[y0:y1, x0:x1]
+        changed = mask & ~self.grid[y0:y1, x0:x1] & (cost_map != cost)
+        cost_map[changed] = cost
+        return self._mark_changed(changed, x0, y0)
+    
+    def clear(self):
+        """
+        清除所有障碍物并把整张地图的代价重置为1.0（地形地图同时重置为平地），整个操作只递增一次版本号
+        
+        直接按行写入图层，不生成整张地图大小的掩码。
+        """
+        self._clear_rows(0, self.height)
+        self.update_neighbor_mask(0, 0, self.width, self.height)
+        self.mark_dirty(0, 0, self.width, self.height)
+    
+    def _clear_rows(self, y0, y1):
+        """把第y0到y1行（不含）重置为无障碍物、代价1.0"""
+        self.grid[y0:y1] = False
+        self.cost_map[y0:y1] = 1.0
+    
+    def _flip_neighbor_bits(self, x, y, passable):
+        """(x,y)的通行状态改变后，只更新周围3x3范围内指向它的掩码位"""
+        mask = self.neighbor_mask
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                # 邻居指向(x,y)的方向与d相反
+                bit = 1 << (7 - d)
+                if passable:
+                    mask[ny, nx] |= bit
+                else:
+                    mask[ny, nx] &= ~bit & 0xFF
+    
+    def update_neighbor_mask(self, x0, y0, x1, y1):
+        """
+        用NumPy移位重新计算矩形区域[x0, x1) x [y0, y1)内的邻居掩码
+        
+        参数:
+            x0, y0: 区域左上角（包含）
+            x1, y1: 区域右下角（不包含）
+        """
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.width), min(y1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        
+        # 区域外扩一圈的可通行标记，地图边界外视为障碍物
+        free = (~padded_window(self.grid, x0, y0, x1, y1, True)).astype(np.uint8)
+        
+        h, w = y1 - y0, x1 - x0
+        mask = np.zeros((h, w), dtype=np.uint8)
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            mask |= free[1 + dy:1 + dy + h, 1 + dx:1 + dx + w] << d
+        self.neighbor_mask[y0:y1, x0:x1] = mask
     
     def is_obstacle(self, x, y):
         """检查指定位置是否是障碍物"""
@@ -41,8 +392,9 @@ class GridMap:
     
     def set_terrain_cost(self, x, y, cost):
         """设置指定位置的地形代价"""
-        if self.is_valid(x, y) and not self.is_obstacle(x, y):
+        if self.is_valid(x, y) and not self.is_obstacle(x, y) and self.cost_map[y, x] != cost:
             self.cost_map[y, x] = cost
+            self.mark_dirty(x, y, x + 1, y + 1)
     
     def get_terrain_cost(self, x, y):
         """获取指定位置的地形代价"""
@@ -59,8 +411,56 @@ class GridMap:
         base_cost = math.sqrt((x2-x1)**2 + (y2-y1)**2)
         return base_cost * self.cost_map[y2, x2]
     
+    def _compute_edge_costs(self, x0, y0, x1, y1):
+        """
+        计算区域[x0, x1) x [y0, y1)内所有格子的8个方向的出边代价
+        
+        返回:
+            形状为(y1-y0, x1-x0, 8)的数组，目标格子是障碍物或超出地图时为inf
+        """
+        h, w = y1 - y0, x1 - x0
+        target_cost = padded_window(np.where(self.grid, np.inf, self.cost_map), x0, y0, x1, y1, np.inf)
+        costs = np.empty((h, w, 8), dtype=float)
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            # 移动距离 * 目标格子的地形代价
+            costs[:, :, d] = DIRECTION_LENGTHS[d] * target_cost[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+        return costs
+    
+    def get_edge_costs(self):
+        """
+        获取边代价张量，只重算上次调用之后变化过的区域
+        
+        返回:
+            形状为(height, width, 8)的数组，edge_costs[y, x, d]与
+            get_movement_cost(x, y, x+dx, y+dy)相同，(dx, dy) = DIRECTIONS[d]
+        """
+        if self._edge_cost_version == self.version:
+            return self._edge_costs
+        
+        regions = self.dirty_regions_since(self._edge_cost_version)
+        if regions is None:
+            regions = [(0, 0, self.width, self.height)]
+        else:
+            # 格子变化会影响以它为起点或终点的边，即周围3x3范围内格子的出边
+            regions = [(max(x0 - 1, 0), max(y0 - 1, 0), min(x1 + 1, self.width), min(y1 + 1, self.height))
+                       for x0, y0, x1, y1 in regions]
+        for x0, y0, x1, y1 in merge_regions(regions):
+            if x0 < x1 and y0 < y1:
+                self._edge_costs[y0:y1, x0:x1] = self._compute_edge_costs(x0, y0, x1, y1)
+        self._edge_cost_version = self.version
+        return self._edge_costs
+    
+    def has_uniform_cost(self):
+        """检查所有可通行格子的地形代价是否一致（跳点搜索等算法要求均匀代价）"""
+        free_costs = self.cost_map[~self.grid]
+        return free_costs.size == 0 or bool(np.all(free_costs == free_costs[0]))
+    
     def get_neighbors(self, x, y):
         """获取(x,y)周围的八个方向的邻居坐标"""
+        if self.is_valid(x, y):
+            return [(x + DIRECTIONS[d][0], y + DIRECTIONS[d][1])
+                    for d in MASK_DIRECTIONS[self.neighbor_mask[y, x]]]
+        
         neighbors = []
         
         for dx in [-1, 0, 1]:
@@ -100,8 +500,38 @@ class TerrainMap(GridMap):
             cost_factor: 地形代价系数
         """
         if self.is_valid(x, y) and not self.is_obstacle(x, y):
-            self.terrain_type[y, x] = terrain_type
-            self.cost_map[y, x] = cost_factor
+            if self.terrain_type[y, x] != terrain_type or self.cost_map[y, x] != cost_factor:
+                self.terrain_type[y, x] = terrain_type
+                self.cost_map[y, x] = cost_factor
+                self.mark_dirty(x, y, x + 1, y + 1)
+    
+    def set_terrain_region(self, mask, terrain_type, cost_factor, x0=0, y0=0):
+        """
+        批量设置掩码为True的可通行格子的地形类型和代价，障碍物格子保持不变
+        
+        参数:
+            mask: 布尔数组，mask[j, i]对应格子(x0+i, y0+j)，超出地图的部分被忽略
+            terrain_type: 地形类型
+            cost_factor: 地形代价系数
+            x0, y0: 掩码左上角在地图中的坐标
+        
+        返回:
+            变化的格子数量
+        """
+        clipped = self._clip_mask(mask, x0, y0)
+        if clipped is None:
+            return 0
+        mask, x0, y0, x1, y1 = clipped
+        terrain = self.terrain_type[y0:y1, x0:x1]
+        cost_map = self.cost_map[y0:y1, x0:x1]
+        changed = mask & ~self.grid[y0:y1, x0:x1] & ((terrain != terrain_type) | (cost_map != cost_factor))
+        terrain[changed] = terrain_type
+        cost_map[changed] = cost_factor
+        return self._mark_changed(changed, x0, y0)
+    
+    def _clear_rows(self, y0, y1):
+        super()._clear_rows(y0, y1)
+        self.terrain_type[y0:y1] = 0
     
     def get_terrain_type(self, x, y):
         """获取指定位置的地形类型"""
@@ -0,0 +1,253 @@
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+from astar_path_planning.app.models.grid_map import (
+    TerrainMap, DIRECTIONS, MASK_DIRECTIONS, padded_window, _version_counter
+)
+
+# 图层文件：文件名 -> 元素类型
+LAYERS = {
+    "obstacles": ("obstacles.bin", np.bool_),
+    "terrain": ("terrain.bin", np.uint8),
+    "cost": ("cost.bin", np.float32),
+}
+META_FILE = "meta.json"
+
+DEFAULT_TILE_SIZE = 256
+DEFAULT_CACHE_TILES = 64
+
+# 初始化代价图层时每次写入的行数，避免一次性分配整张地图的临时数组
+_FILL_ROWS = 1024
+
+
+class _Tile:
+    """
+    内存中的一块地图
+
+    mask:   每个格子的8位可通行邻居掩码（与GridMap.neighbor_mask含义相同）
+    target: 进入每个格子的地形代价，障碍物为inf
+    两者都是按 (y-y0)*w+(x-x0) 索引的扁平列表，便于逐格子快速读取
+    """
+
+    __slots__ = ("x0", "y0", "w", "mask", "target")
+
+    def __init__(self, x0, y0, w, mask, target):
+        self.x0 = x0
+        self.y0 = y0
+        self.w = w
+        self.mask = mask
+        self.target = target
+
+
+class TiledMap(TerrainMap):
+    """
+    基于内存映射文件的分块地形地图，用于超出内存的大地图
+
+    障碍物(bool)、地形类型(uint8)和代价(float32)三个图层分别保存在本地磁盘的文件中，
+    grid、terrain_type、cost_map是对应的np.memmap，由操作系统按需换入。
+    搜索时用到的邻居掩码和代价按tile_size x tile_size的分块延迟计算，
+    最近使用的分块保存在LRU缓存中，地图修改时只丢弃受影响的分块。
+
+    对外提供与GridMap相同的is_valid、is_obstacle、get_neighbors、get_movement_cost接口，
+    现有的规划算法无需修改即可运行。不提供稠密的neighbor_mask和边代价张量。
+    """
+
+    # 没有稠密邻居掩码和边代价张量，搜索引擎会改用get_neighbors和get_movement_cost接口
+    neighbor_mask = None
+    has_edge_costs = False
+    # 快照就是地图本身，修改需要等待进行中的读取结束（MapRegistry.reading）
+    isolated_snapshots = False
+
+    def __init__(self, directory, mode="r+", cache_tiles=DEFAULT_CACHE_TILES, temporary=False):
+        """
+        打开已有的分块地图目录
+
+        参数:
+            directory: 地图目录（由TiledMap.create创建）
+            mode: 内存映射模式，"r+"可读写，"r"只读
+            cache_tiles: 内存中最多缓存的分块数量
+            temporary: 为True时地图对象被释放后删除整个目录
+        """
+        # 不调用GridMap.__init__：它会分配整张地图的稠密数组
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.tile_size = meta["tile_size"]
+        self.cache_tiles = cache_tiles
+        self._mode = mode
+        self._open_layers()
+
+        self.version = next(_version_counter)
+        self._dirty_log = []
+        self._dirty_log_floor = self.version
+        self._tiles = OrderedDict()
+        self._tiles_lock = threading.Lock()
+        self._last_tile = (None, None)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, directory, True) if temporary else None
+
+    @classmethod
+    def create(cls, width, height, directory=None, tile_size=DEFAULT_TILE_SIZE, **kwargs):
+        """
+        在磁盘上创建一张空白的分块地图（无障碍物，代价为1.0）
+
+        参数:
+            width, height: 地图尺寸
+            directory: 地图目录，为None时在临时目录中创建，地图对象释放后自动删除
+            tile_size: 分块边长
+
+        返回:
+            TiledMap对象
+        """
+        temporary = directory is None
+        if temporary:
+            directory = tempfile.mkdtemp(prefix="astar_tiled_")
+        os.makedirs(directory, exist_ok=True)
+
+        for name, (filename, dtype) in LAYERS.items():
+            layer = np.memmap(os.path.join(directory, filename), dtype=dtype, mode="w+", shape=(height, width))
+            if name == "cost":
+                for y0 in range(0, height, _FILL_ROWS):
+                    layer[y0:y0 + _FILL_ROWS] = 1.0
+            layer.flush()
+            del layer
+
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"width": width, "height": height, "tile_size": tile_size}, f)
+        return cls(directory, temporary=temporary, **kwargs)
+
+    def _open_layers(self):
+        shape = (self.height, self.width)
+        layers = {name: np.memmap(os.path.join(self.directory, filename), dtype=dtype, mode=self._mode, shape=shape)
+                  for name, (filename, dtype) in LAYERS.items()}
+        self.grid = layers["obstacles"]
+        self.terrain_type = layers["terrain"]
+        self.cost_map = layers["cost"]
+
+    def __getstate__(self):
+        # 序列化时只保留目录和元数据，接收方重新映射文件（只读），不会接管临时目录的删除
+        state = self.__dict__.copy()
+        for key in ("grid", "terrain_type", "cost_map", "_tiles", "_tiles_lock", "_last_tile", "_finalizer", "_derived"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._mode = "r"
+        self._open_layers()
+        self._tiles = OrderedDict()
+        self._tiles_lock = threading.Lock()
+        self._last_tile = (None, None)
+        self._finalizer = None
+
+    def snapshot(self):
+        """
+        分块地图的图层在磁盘文件中，不做写时复制，快照就是地图本身
+
+        在MapRegistry.reading()之外读取时，进行中的修改可能被部分看到。
+        """
+        return self
+
+    def unshare(self):
+        """分块地图不做写时复制"""
+
+    def nbytes(self):
+        """内存中缓存的分块占用的字节数（估算：每个格子两个列表项），内存映射的图层不计入"""
+        return len(self._tiles) * self.tile_size * self.tile_size * 2 * 8
+
+    def flush(self):
+        """把修改写回磁盘"""
+        for layer in (self.grid, self.terrain_type, self.cost_map):
+            layer.flush()
+
+    def _load_tile(self, tx, ty):
+        """从内存映射图层计算一块的邻居掩码和进入代价"""
+        size = self.tile_size
+        x0, y0 = tx * size, ty * size
+        x1, y1 = min(x0 + size, self.width), min(y0 + size, self.height)
+        h, w = y1 - y0, x1 - x0
+
+        obstacles = np.asarray(self.grid[y0:y1, x0:x1])
+        free = (~padded_window(self.grid, x0, y0, x1, y1, True)).astype(np.uint8)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            mask |= free[1 + dy:1 + dy + h, 1 + dx:1 + dx + w] << d
+        target = np.where(obstacles, np.inf, np.asarray(self.cost_map[y0:y1, x0:x1], dtype=float))
+        return _Tile(x0, y0, w, mask.ravel().tolist(), target.ravel().tolist())
+
+    def _tile(self, x, y):
+        """获取包含(x, y)的分块，必要时从磁盘加载"""
+        size = self.tile_size
+        key = (x // size, y // size)
+        last_key, last_tile = self._last_tile
+        if key == last_key:
+            return last_tile
+        with self._tiles_lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                tile = self._tiles[key] = self._load_tile(*key)
+                while len(self._tiles) > self.cache_tiles:
+                    self._tiles.popitem(last=False)
+            else:
+                self._tiles.move_to_end(key)
+            self._last_tile = (key, tile)
+        return tile
+
+    def cached_tiles(self):
+        """当前缓存在内存中的分块数量"""
+        return len(self._tiles)
+
+    def mark_dirty(self, x0, y0, x1, y1):
+        """记录修改并丢弃受影响的分块（包括邻居掩码引用到修改格子的相邻分块）"""
+        size = self.tile_size
+        tx0, ty0 = max(x0 - 1, 0) // size, max(y0 - 1, 0) // size
+        tx1, ty1 = min(x1, self.width) // size, min(y1, self.height) // size
+        with self._tiles_lock:
+            for key in [k for k in self._tiles if tx0 <= k[0] <= tx1 and ty0 <= k[1] <= ty1]:
+                del self._tiles[key]
+            self._last_tile = (None, None)
+        super().mark_dirty(x0, y0, x1, y1)
+
+    def _flip_neighbor_bits(self, x, y, passable):
+        """邻居掩码保存在分块中，由mark_dirty丢弃受影响的分块"""
+
+    def update_neighbor_mask(self, x0, y0, x1, y1):
+        """邻居掩码保存在分块中，由mark_dirty丢弃受影响的分块"""
+
+    def clear(self):
+        """按_FILL_ROWS行一带重置各图层，每次只换入一带的页面"""
+        for y0 in range(0, self.height, _FILL_ROWS):
+            self._clear_rows(y0, y0 + _FILL_ROWS)
+        self.mark_dirty(0, 0, self.width, self.height)
+
+    def has_uniform_cost(self):
+        """
+        分块地图不做整图扫描，始终返回False
+
+        跳点搜索等依赖整图稠密数组的算法因此会回退到A*。
+        """
+        return False
+
+    def get_neighbors(self, x, y):
+        """获取(x,y)周围的八个方向的邻居坐标"""
+        if not self.is_valid(x, y):
+            return super().get_neighbors(x, y)
+        tile = self._tile(x, y)
+        mask = tile.mask[(y - tile.y0) * tile.w + x - tile.x0]
+        return [(x + DIRECTIONS[d][0], y + DIRECTIONS[d][1]) for d in MASK_DIRECTIONS[mask]]
+
+    def get_movement_cost(self, x1, y1, x2, y2):
+        """计算从(x1,y1)移动到(x2,y2)的代价"""
+        if not self.is_valid(x2, y2):
+            return float('inf')
+        tile = self._tile(x2, y2)
+        target = tile.target[(y2 - tile.y0) * tile.w + x2 - tile.x0]
+        # 移动距离 * 目标格子的地形代价
+        return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2) * target
@@ -1,19 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, Path
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Path, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Callable, Iterator
 from pydantic import BaseModel
+from contextlib import contextmanager, ExitStack
+import os
+import threading
 import numpy as np
-from astar_path_planning.app.models.grid_map import GridMap, TerrainMap
-from astar_path_planning.app.utils.map_generator import initialize_test_environment, generate_random_obstacles, generate_maze, generate_complex_terrain
+from astar_path_planning.app.models.grid_map import GridMap, TerrainMap, stroke_mask
+from astar_path_planning.app.models.tiled_map import TiledMap, META_FILE
+from astar_path_planning.app.utils.map_generator import initialize_test_environment, initialize_tiled_environment, generate_random_obstacles, generate_maze, generate_complex_terrain
+from astar_path_planning.app.utils.map_codec import MAP_MEDIA_TYPE, iter_encode_map, encoded_length, map_arrays
+from astar_path_planning.app.utils.map_registry import MapRegistry, DEFAULT_MAP_ID, is_valid_map_id
+from astar_path_planning.app import config as app_config
 
 router = APIRouter(prefix="/grid", tags=["地图管理"])
 
-# 内存中的地图对象
-current_map = None
+# 地图变更监听器，地图被创建、修改或清空后以listener(map_id, grid_map)的形式调用，
+# 地图被删除或淘汰后grid_map为None
+map_change_listeners: List[Callable[[str, Optional[GridMap]], None]] = []
+
+def notify_map_changed(map_id: str, grid_map: Optional[GridMap]):
+    """通知监听器地图已变化（用于使路径缓存等派生数据失效）"""
+    for listener in map_change_listeners:
+        listener(map_id, grid_map)
+
+# 内存中的地图，按地图ID注册；超出数量或内存上限时淘汰最久未访问的地图
+registry = MapRegistry(max_maps=app_config.MAX_MAPS, memory_budget=app_config.MAP_MEMORY_BUDGET * 1024 * 1024,
+                       on_remove=lambda map_id: notify_map_changed(map_id, None))
+_default_map_lock = threading.Lock()
 
 class MapConfig(BaseModel):
     width: int = 50
     height: int = 50
-    map_type: str = "simple"  # simple, maze, complex
+    map_type: str = "simple"  # simple, maze, complex, advanced；分块大地图支持simple, empty
+    seed: Optional[int] = None  # 随机种子，相同种子生成相同的地图
 
 class MapCell(BaseModel):
     x: int
@@ -22,110 +42,380 @@ class MapCell(BaseModel):
     terrain_type: int = 0
     cost: float = 1.0
 
+class CellPoint(BaseModel):
+    x: int
+    y: int
+
+class RectEdit(BaseModel):
+    # 矩形区域[x0, x1) x [y0, y1)，超出地图的部分被忽略
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    is_obstacle: bool = False
+    terrain_type: int = 0
+    cost: float = 1.0
+
+class StrokeEdit(BaseModel):
+    points: List[CellPoint]  # 笔刷经过的折线顶点
+    brush_size: int = 1
+    is_obstacle: bool = False
+    terrain_type: int = 0
+    cost: float = 1.0
+
+class BatchEditRequest(BaseModel):
+    # 按cells、rects、strokes的顺序依次应用，同一单元格出现多次时以最后一次为准
+    cells: List[MapCell] = []
+    rects: List[RectEdit] = []
+    strokes: List[StrokeEdit] = []
+
 class MapData(BaseModel):
     width: int
     height: int
-    cells: List[MapCell]
+    cells: List[MapCell]  # 分块大地图不返回逐格子数据，为空列表
     map_type: str = "simple"
+    version: int = 0  # 地图内容版本号，地图每次修改后递增
+    tiled: bool = False  # 是否为基于内存映射文件的分块大地图
+    map_id: str = DEFAULT_MAP_ID
+
+class MapInfo(BaseModel):
+    map_id: str
+    width: int
+    height: int
+    map_type: str
+    version: int
+    nbytes: int  # 地图数组占用的内存字节数（内存映射的图层不计入）
+    created_at: float
+    idle_seconds: float  # 距上次访问的秒数
 
-def get_current_map() -> GridMap:
-    """获取当前地图对象"""
-    global current_map
-    if current_map is None:
-        current_map = initialize_test_environment(50, 50, 'simple')
-    return current_map
+class MapListResponse(BaseModel):
+    maps: List[MapInfo]  # 按最近访问顺序，最新在前
+    memory_usage: int
+    memory_budget: int  # 字节，为0时不限制
+    max_maps: int
+    evictions: int
 
-@router.post("/create", response_model=MapData)
-async def create_map(config: MapConfig):
+class OpenMapRequest(BaseModel):
+    name: str  # ASTAR_TILED_MAP_DIR下的地图目录名
+
+def wants_binary(request: Request, format: Optional[str]) -> bool:
+    """根据format查询参数或Accept请求头判断是否返回二进制地图格式"""
+    if format is not None:
+        if format not in ("json", "binary"):
+            raise HTTPException(status_code=400, detail="format只支持json或binary")
+        return format == "binary"
+    return MAP_MEDIA_TYPE in request.headers.get("accept", "")
+
+def binary_map_response(map_id: str, grid_map: GridMap, map_type: str, compress: bool,
+                        headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """
+    二进制格式的地图响应
+
+    按行带流式编码（见iter_encode_map），分块大地图也不会把整个编码结果放在内存中，
+    编码期间持有地图的读锁；不压缩时长度事先可知，设置Content-Length。
+    """
+    headers = dict(headers or {})
+    if not compress:
+        headers["Content-Length"] = str(encoded_length(grid_map, map_type))
+    return StreamingResponse(read_stream(map_id, iter_encode_map(grid_map, map_type, compress)),
+                             media_type=MAP_MEDIA_TYPE, headers=headers)
+
+def map_cells(grid_map: GridMap, include_terrain: bool) -> List[MapCell]:
+    """把地图转换为逐格子的JSON响应格式，分块大地图返回空列表"""
+    if isinstance(grid_map, TiledMap):
+        return []
+    arrays = map_arrays(grid_map)
+    obstacles = arrays["obstacles"].tolist()
+    costs = grid_map.cost_map.tolist()
+    terrain = arrays["terrain"].tolist() if include_terrain else None
+    return [
+        MapCell(x=x, y=y, is_obstacle=obstacles[y][x], cost=costs[y][x],
+                terrain_type=terrain[y][x] if terrain is not None else 0)
+        for y in range(grid_map.height)
+        for x in range(grid_map.width)
+    ]
+
+def get_map_id(map_id: str = Query(DEFAULT_MAP_ID, description="地图ID，默认为default")) -> str:
+    """地图ID查询参数，所有地图、路径和可视化接口共用"""
+    if not is_valid_map_id(map_id):
+        raise HTTPException(status_code=400, detail="地图ID只能包含字母、数字、下划线和连字符，最长64个字符")
+    return map_id
+
+def ensure_map(map_id: str):
+    """
+    检查地图是否存在，默认地图不存在（首次访问或已被淘汰）时自动创建
+    
+    异常:
+        HTTPException: 其他地图不存在时返回404
+    """
+    if map_id in registry:
+        return
+    if map_id != DEFAULT_MAP_ID:
+        raise HTTPException(status_code=404, detail=f"地图{map_id}不存在或已被回收")
+    with _default_map_lock:
+        if map_id not in registry:
+            registry.put(initialize_test_environment(50, 50, 'simple'), 'simple', map_id)
+
+def get_current_map(map_id: str = Depends(get_map_id)) -> GridMap:
+    """
+    获取地图当前版本的只读快照
+    
+    快照与地图共享数组，之后的编辑写时复制，搜索和渲染期间读到的内容保持一致。
+    """
+    ensure_map(map_id)
+    try:
+        return registry.snapshot(map_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"地图{map_id}不存在或已被回收")
+
+def read_map(map_id: str, func, *args):
+    """在地图的读锁内调用func，分块地图的修改等待调用结束（见MapRegistry.reading）"""
+    with registry.reading(map_id):
+        return func(*args)
+
+def read_stream(map_id: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """在地图的读锁内逐块生成流式响应，读锁从第一块开始持有，直到生成结束或客户端断开"""
+    with registry.reading(map_id):
+        yield from chunks
+
+@contextmanager
+def edit_map(map_id: str):
     """
-    创建新地图
+    在地图的锁内修改地图（写时复制，不影响正在使用快照的请求）
+    
+    分块地图的修改要等待进行中的读取结束，使用它的接口定义为普通函数，在线程池中执行，不阻塞事件循环。
+    """
+    ensure_map(map_id)
+    with ExitStack() as stack:
+        try:
+            grid_map = stack.enter_context(registry.edit(map_id))
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"地图{map_id}不存在或已被回收")
+        yield grid_map
+
+def build_map(config: MapConfig) -> GridMap:
     """
-    global current_map
+    按配置生成地图，超过稠密地图上限时使用分块存储
     
+    异常:
+        HTTPException: 尺寸无效或分块地图不支持该地图类型
+    """
     if config.width <= 0 or config.height <= 0:
         raise HTTPException(status_code=400, detail="地图尺寸必须大于0")
     
-    if config.width > 200 or config.height > 200:
-        raise HTTPException(status_code=400, detail="地图尺寸过大，最大支持200x200")
-    
-    # 根据类型初始化地图
-    current_map = initialize_test_environment(config.width, config.height, config.map_type)
-    
-    # 转换为API响应格式
-    cells = []
-    for y in range(current_map.height):
-        for x in range(current_map.width):
-            cell = MapCell(
-                x=x,
-                y=y,
-                is_obstacle=current_map.is_obstacle(x, y),
-                cost=current_map.get_terrain_cost(x, y)
-            )
-            
-            # 如果是地形地图，添加地形类型
-            if config.map_type == "complex" and isinstance(current_map, TerrainMap):
-                cell.terrain_type = current_map.terrain_type[y, x]
-                
-            cells.append(cell)
+    max_size = app_config.MAX_MAP_SIZE
+    if config.width > max_size or config.height > max_size:
+        raise HTTPException(status_code=400, detail=f"地图尺寸过大，最大支持{max_size}x{max_size}")
+    
+    # 根据类型初始化地图，超过稠密地图上限时使用分块存储
+    dense_size = app_config.MAX_DENSE_MAP_SIZE
+    if config.width > dense_size or config.height > dense_size:
+        try:
+            return initialize_tiled_environment(config.width, config.height, config.map_type,
+                                                seed=config.seed, tile_size=app_config.MAP_TILE_SIZE,
+                                                cache_tiles=app_config.MAP_TILE_CACHE)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"{e}，超过{dense_size}x{dense_size}的地图只支持simple和empty")
+    return initialize_test_environment(config.width, config.height, config.map_type, seed=config.seed)
+
+def register_map(map_id: Optional[str], config: MapConfig, request: Request, format: Optional[str], compress: bool):
+    """
+    生成地图并以map_id注册（已存在时替换），map_id为None时生成新的ID
+    
+    大地图的生成需要数秒，调用它的接口定义为普通函数，在线程池中执行，不阻塞事件循环。
+    """
+    grid_map = build_map(config)
+    map_id = registry.put(grid_map, config.map_type, map_id)
+    notify_map_changed(map_id, grid_map)
+    
+    if wants_binary(request, format):
+        return binary_map_response(map_id, registry.snapshot(map_id), config.map_type, compress, {"X-Map-Id": map_id})
+    
+    # 转换为API响应格式，如果是地形地图，添加地形类型
+    cells = map_cells(grid_map, config.map_type == "complex" and isinstance(grid_map, TerrainMap))
     
-    return MapData(width=current_map.width, height=current_map.height, cells=cells, map_type=config.map_type)
+    return MapData(width=grid_map.width, height=grid_map.height, cells=cells, map_type=config.map_type,
+                   version=grid_map.version, tiled=isinstance(grid_map, TiledMap), map_id=map_id)
+
+@router.post("/create", response_model=MapData)
+def create_map(config: MapConfig, request: Request, format: Optional[str] = Query(None),
+               compress: bool = Query(False), map_id: str = Depends(get_map_id)):
+    """
+    创建新地图，替换map_id对应的地图
+    
+    format=binary（或Accept: application/x-astar-map）时返回紧凑的二进制格式，
+    compress=true时负载使用zlib压缩。
+    """
+    return register_map(map_id, config, request, format, compress)
+
+@router.post("/maps", response_model=MapData)
+def create_registered_map(config: MapConfig, request: Request, format: Optional[str] = Query(None),
+                          compress: bool = Query(False)):
+    """
+    以新生成的地图ID创建地图，响应中的map_id用于之后的请求
+    
+    多个客户端各自创建地图，互不覆盖。二进制格式的地图ID在X-Map-Id响应头中。
+    """
+    return register_map(None, config, request, format, compress)
+
+@router.get("/maps", response_model=MapListResponse)
+async def list_maps():
+    """
+    列出内存中的所有地图及内存占用
+    """
+    return MapListResponse(maps=[MapInfo(**info) for info in registry.list_maps()],
+                           memory_usage=registry.memory_usage(), memory_budget=registry.memory_budget,
+                           max_maps=registry.max_maps, evictions=registry.evictions)
+
+@router.delete("/maps/{map_id}")
+async def delete_map(map_id: str = Path(...)):
+    """
+    删除地图，正在使用该地图快照的搜索不受影响
+    """
+    if not registry.delete(map_id):
+        raise HTTPException(status_code=404, detail=f"地图{map_id}不存在或已被回收")
+    return {"message": "地图已删除", "map_id": map_id}
 
 @router.get("/current", response_model=MapData)
-async def get_map(grid_map: GridMap = Depends(get_current_map)):
+async def get_map(request: Request, format: Optional[str] = Query(None), compress: bool = Query(False),
+                  map_id: str = Depends(get_map_id), grid_map: GridMap = Depends(get_current_map)):
     """
     获取当前地图数据
-    """
-    cells = []
-    for y in range(grid_map.height):
-        for x in range(grid_map.width):
-            cell = MapCell(
-                x=x,
-                y=y,
-                is_obstacle=grid_map.is_obstacle(x, y),
-                cost=grid_map.get_terrain_cost(x, y)
-            )
-            
-            # 如果是地形地图，添加地形类型
-            if isinstance(grid_map, TerrainMap):
-                cell.terrain_type = grid_map.terrain_type[y, x]
-                
-            cells.append(cell)
     
+    format=binary（或Accept: application/x-astar-map）时返回紧凑的二进制格式，
+    compress=true时负载使用zlib压缩。
+    """
     map_type = "complex" if isinstance(grid_map, TerrainMap) else "simple"
-    return MapData(width=grid_map.width, height=grid_map.height, cells=cells, map_type=map_type)
+    if wants_binary(request, format):
+        return binary_map_response(map_id, grid_map, map_type, compress)
+    
+    # 如果是地形地图，添加地形类型
+    cells = map_cells(grid_map, isinstance(grid_map, TerrainMap))
+    
+    return MapData(width=grid_map.width, height=grid_map.height, cells=cells, map_type=map_type,
+                   version=grid_map.version, tiled=isinstance(grid_map, TiledMap), map_id=map_id)
+
+@router.post("/open", response_model=MapData)
+async def open_map(request: OpenMapRequest, map_id: str = Depends(get_map_id)):
+    """
+    打开ASTAR_TILED_MAP_DIR下已有的分块大地图（由TiledMap.create生成），替换map_id对应的地图
+    """
+    if not app_config.TILED_MAP_DIR:
+        raise HTTPException(status_code=400, detail="未配置ASTAR_TILED_MAP_DIR")
+    # 只允许目录名，防止访问配置目录以外的路径
+    if not request.name or os.path.basename(request.name) != request.name or request.name in (".", ".."):
+        raise HTTPException(status_code=400, detail="地图名称无效")
+    directory = os.path.join(app_config.TILED_MAP_DIR, request.name)
+    if not os.path.isfile(os.path.join(directory, META_FILE)):
+        raise HTTPException(status_code=404, detail="地图不存在")
+    
+    grid_map = TiledMap(directory, cache_tiles=app_config.MAP_TILE_CACHE)
+    registry.put(grid_map, "complex", map_id)
+    notify_map_changed(map_id, grid_map)
+    return MapData(width=grid_map.width, height=grid_map.height, cells=[], map_type="complex",
+                   version=grid_map.version, tiled=True, map_id=map_id)
 
 @router.post("/cell/update")
-async def update_cell(cell: MapCell, grid_map: GridMap = Depends(get_current_map)):
+def update_cell(cell: MapCell, map_id: str = Depends(get_map_id)):
     """
     更新单元格状态
     """
-    if not grid_map.is_valid(cell.x, cell.y):
-        raise HTTPException(status_code=400, detail="坐标超出地图范围")
-    
-    if cell.is_obstacle:
-        grid_map.set_obstacle(cell.x, cell.y)
-    else:
-        grid_map.clear_obstacle(cell.x, cell.y)
+    with edit_map(map_id) as grid_map:
+        if not grid_map.is_valid(cell.x, cell.y):
+            raise HTTPException(status_code=400, detail="坐标超出地图范围")
         
-        # 如果是地形地图，更新地形类型和代价
-        if isinstance(grid_map, TerrainMap):
-            grid_map.set_terrain(cell.x, cell.y, cell.terrain_type, cell.cost)
+        if cell.is_obstacle:
+            grid_map.set_obstacle(cell.x, cell.y)
         else:
-            grid_map.set_terrain_cost(cell.x, cell.y, cell.cost)
+            grid_map.clear_obstacle(cell.x, cell.y)
+            
+            # 如果是地形地图，更新地形类型和代价
+            if isinstance(grid_map, TerrainMap):
+                grid_map.set_terrain(cell.x, cell.y, cell.terrain_type, cell.cost)
+            else:
+                grid_map.set_terrain_cost(cell.x, cell.y, cell.cost)
+        
+        notify_map_changed(map_id, grid_map)
+        return {"message": "单元格更新成功", "version": grid_map.version}
+
+def apply_edit(grid_map: GridMap, mask: np.ndarray, x0: int, y0: int,
+               is_obstacle: bool, terrain_type: int, cost: float) -> int:
+    """
+    对掩码覆盖的格子应用与 /grid/cell/update 相同的编辑
+    
+    返回:
+        变化的格子数量
+    """
+    if is_obstacle:
+        return grid_map.set_obstacles(mask, x0, y0)
+    
+    changed = grid_map.clear_obstacles(mask, x0, y0)
+    # 如果是地形地图，更新地形类型和代价
+    if isinstance(grid_map, TerrainMap):
+        changed += grid_map.set_terrain_region(mask, terrain_type, cost, x0, y0)
+    else:
+        changed += grid_map.set_terrain_costs(mask, cost, x0, y0)
+    return changed
+
+@router.post("/cells/batch")
+def update_cells_batch(request: BatchEditRequest, map_id: str = Depends(get_map_id)):
+    """
+    批量编辑单元格、矩形区域和笔刷轨迹
     
-    return {"message": "单元格更新成功"}
+    编辑按参数分组后以数组操作整体应用，地图变化监听器只通知一次。
+    整批编辑在地图的锁内完成，其他请求不会看到只应用了一部分的地图。
+    """
+    with edit_map(map_id) as grid_map:
+        for i, cell in enumerate(request.cells):
+            if not grid_map.is_valid(cell.x, cell.y):
+                raise HTTPException(status_code=400, detail=f"第{i}个单元格坐标超出地图范围")
+        for i, stroke in enumerate(request.strokes):
+            if not 1 <= stroke.brush_size <= 50:
+                raise HTTPException(status_code=400, detail=f"第{i}个笔刷尺寸无效，支持1-50")
+            # 顶点都在地图内时，插值的点数和掩码大小都不超过地图尺寸
+            if not all(grid_map.is_valid(p.x, p.y) for p in stroke.points):
+                raise HTTPException(status_code=400, detail=f"第{i}个笔刷轨迹的顶点超出地图范围")
+        
+        changed = 0
+        
+        # 单元格按编辑参数分组，每组生成一个覆盖该组外接矩形的掩码
+        latest = {(cell.x, cell.y): cell for cell in request.cells}
+        groups: Dict[tuple, List[MapCell]] = {}
+        for cell in latest.values():
+            groups.setdefault((cell.is_obstacle, cell.terrain_type, cell.cost), []).append(cell)
+        for (is_obstacle, terrain_type, cost), cells in groups.items():
+            xs = np.array([cell.x for cell in cells])
+            ys = np.array([cell.y for cell in cells])
+            x0, y0 = int(xs.min()), int(ys.min())
+            mask = np.zeros((int(ys.max()) - y0 + 1, int(xs.max()) - x0 + 1), dtype=bool)
+            mask[ys - y0, xs - x0] = True
+            changed += apply_edit(grid_map, mask, x0, y0, is_obstacle, terrain_type, cost)
+        
+        for rect in request.rects:
+            # 先裁剪到地图范围再分配掩码，超出地图的部分被忽略
+            x0, x1 = max(rect.x0, 0), min(rect.x1, grid_map.width)
+            y0, y1 = max(rect.y0, 0), min(rect.y1, grid_map.height)
+            if x0 < x1 and y0 < y1:
+                mask = np.ones((y1 - y0, x1 - x0), dtype=bool)
+                changed += apply_edit(grid_map, mask, x0, y0, rect.is_obstacle, rect.terrain_type, rect.cost)
+        
+        for stroke in request.strokes:
+            result = stroke_mask([(p.x, p.y) for p in stroke.points], stroke.brush_size)
+            if result is not None:
+                mask, x0, y0 = result
+                changed += apply_edit(grid_map, mask, x0, y0, stroke.is_obstacle, stroke.terrain_type, stroke.cost)
+        
+        if changed:
+            notify_map_changed(map_id, grid_map)
+        return {"message": "批量更新成功", "changed": changed, "version": grid_map.version}
 
 @router.post("/clear")
-async def clear_map(grid_map: GridMap = Depends(get_current_map)):
+def clear_map(map_id: str = Depends(get_map_id)):
     """
-    清空地图（移除所有障碍物）
+    清空地图（移除所有障碍物，地形地图同时重置为平地）
     """
-    for y in range(grid_map.height):
-        for x in range(grid_map.width):
-            grid_map.clear_obstacle(x, y)
-            
-            # 如果是地形地图，重置为平地
-            if isinstance(grid_map, TerrainMap):
-                grid_map.set_terrain(x, y, 0, 1.0)
-    
-    return {"message": "地图已清空"} 
\ No newline at end of file
+    with edit_map(map_id) as grid_map:
+        grid_map.clear()
+        
+        notify_map_changed(map_id, grid_map)
+        return {"message": "地图已清空", "version": grid_map.version} 
\ No newline at end of file
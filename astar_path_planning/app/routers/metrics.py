@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from astar_path_planning.app.utils import metrics
+
+router = APIRouter(tags=["监控"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    以Prometheus文本格式输出服务指标
+
+    包括各路由的请求耗时、各算法的搜索耗时和扩展节点数、搜索结束原因、
+    启用插桩的搜索中的堆操作和邻居评估次数，以及后处理和渲染耗时。
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,135 +1,748 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel
+import base64
+import json
 import time
-from astar_path_planning.app.models.grid_map import GridMap
-from astar_path_planning.app.utils.astar import astar_search, euclidean_distance, manhattan_distance, diagonal_distance
-from astar_path_planning.app.utils.improved_astar import adaptive_astar_search, terrain_aware_heuristic, smooth_path, check_and_fix_collision
-from astar_path_planning.app.routers.grid import get_current_map
+import uuid
+import numpy as np
+from astar_path_planning.app.models.grid_map import GridMap, DIRECTIONS
+from astar_path_planning.app.models.tiled_map import TiledMap
+from astar_path_planning.app.utils.planning import (
+    MAP_HEURISTICS, ALGORITHMS, get_heuristic, heuristic_names, run_budgeted_search, iter_search, postprocess_path,
+    compute_path_metrics, is_any_angle
+)
+from astar_path_planning.app.utils.incremental_planner import LPAStarPlanner
+from astar_path_planning.app.utils import batch, offload, metrics
+from astar_path_planning.app.utils.search_engine import SearchBudget, SearchStats, STATUS_COMPLETE
+from astar_path_planning.app.utils.cost_field import CostField, compute_cost_field
+from astar_path_planning.app.utils.cache import LRUCache
+from astar_path_planning.app.utils.path_codec import (
+    encode_chain, encode_explored_bitmap, explored_coordinates
+)
+from astar_path_planning.app.utils.profiling import run_profiled
+from astar_path_planning.app.routers.grid import get_current_map, get_map_id, map_change_listeners, read_map, registry
+from astar_path_planning.app.routers.profiling import ProfileReport, check_profile_request, store_report
+from astar_path_planning.app import config
 
 router = APIRouter(prefix="/path", tags=["路径规划"])
 
+# 路径结果缓存，键以(地图ID, 地图版本号)开头，地图变化后旧条目不会再被命中
+path_cache = LRUCache(maxsize=config.PATH_CACHE_SIZE, ttl=config.PATH_CACHE_TTL)
+# 代价场缓存，键为(地图ID, 地图版本号, 终点)
+field_cache = LRUCache(maxsize=config.FIELD_CACHE_SIZE)
+
+def _invalidate_path_cache(map_id: str, grid_map: Optional[GridMap]):
+    """地图变化后立即移除该地图旧版本的缓存条目，地图被删除时移除它的全部条目"""
+    def stale(key):
+        return key[0] == map_id and (grid_map is None or key[1] != grid_map.version)
+    path_cache.invalidate(stale)
+    field_cache.invalidate(stale)
+
+map_change_listeners.append(_invalidate_path_cache)
+
+# 增量规划器，按规划器ID保存
+planners: Dict[str, LPAStarPlanner] = {}
+MAX_PLANNERS = 32
+
 class PathRequest(BaseModel):
     start_x: int
     start_y: int
     goal_x: int
     goal_y: int
-    algorithm: str = "astar"  # astar, adaptive_astar
-    heuristic: str = "euclidean"  # euclidean, manhattan, diagonal
+    algorithm: str = "astar"  # astar, adaptive_astar, jps, bidirectional_astar, hpa, theta_star
+    heuristic: str = "euclidean"  # euclidean, manhattan, diagonal, alt
     smooth: bool = False
     check_collision: bool = False
+    # points: 路径和探索节点为坐标列表；compact: 路径为起点加链码，探索节点为位图（只对/path/find有效）
+    encoding: str = "points"
+    include_explored: bool = True  # 为False时不返回探索节点，只返回数量
+    # 本次搜索最多扩展的节点数和最长时间（秒），不能超过服务端配置的上限；不设置时使用上限
+    max_nodes: Optional[int] = None
+    timeout: Optional[float] = None
+    include_stats: bool = False  # 为True时响应中附带搜索的插桩计数和后处理耗时（只对/path/find有效）
+    # 为True时在性能分析器下处理请求并在响应中附带热点函数报告（只对/path/find有效，需服务端开启）
+    profile: bool = False
+    profile_mode: str = "deterministic"  # deterministic（cProfile）或 sampling（定时采样调用栈）
+
+class PathStreamRequest(PathRequest):
+    chunk_size: int = 500  # 每批扩展的节点数
+    frontier_limit: int = 32  # 每批附带的open集合中f值最小的节点数，为0时不返回
 
 class PathPoint(BaseModel):
     x: int
     y: int
 
+class SearchStatsInfo(BaseModel):
+    heap_pushes: int
+    heap_pops: int  # 包括被跳过的过期条目
+    stale_pops: int  # 弹出时节点已扩展、被惰性删除跳过的条目数
+    expansions: int
+    neighbor_evaluations: int  # 后继函数返回的邻居数（跳点搜索的跳跃过程不计入）
+    cost_calls: int  # 回退到逐格计算代价时get_movement_cost的调用次数，使用边代价张量时为0
+    heuristic_calls: int
+    timings: Dict[str, float] = {}  # 后处理步骤 -> 耗时（秒）：smooth_path、check_and_fix_collision
+
+class ExploredBox(BaseModel):
+    """compact编码的探索位图覆盖的矩形"""
+    x: int
+    y: int
+    width: int
+    height: int
+
 class PathResponse(BaseModel):
-    path: List[PathPoint]
+    path: List[PathPoint]  # compact编码且路径可用链码表示时为空，改用path_start和path_chain
+    # include_explored为False时为空；compact编码下只在坐标列表比位图小时使用
     explored: List[PathPoint]
     path_length: float
     computation_time: float
     path_cost: float
     nodes_explored: int
+    cached: bool = False  # 结果是否来自缓存
+    path_start: Optional[PathPoint] = None  # compact编码：路径起点
+    path_chain: Optional[str] = None  # compact编码：从起点出发每一步的方向编号（'0'-'7'，与/path/field/directions一致）
+    # compact编码：探索节点外接矩形explored_box内的base64位图，按(y-y0)*width+(x-x0)每字节8格、低位在前
+    explored_bitmap: Optional[str] = None
+    explored_box: Optional[ExploredBox] = None
+    # 搜索结束的原因：complete（正常结束）、node_limit、timeout、cancelled；
+    # 非complete时path为到离终点最近的已扩展节点的部分路径（可能为空）
+    status: str = STATUS_COMPLETE
+    stats: Optional[SearchStatsInfo] = None  # 请求了include_stats时的插桩计数
+    profile: Optional[ProfileReport] = None  # 请求了profile时的性能分析报告
 
-def get_heuristic(heuristic_name: str):
-    """根据名称获取启发函数"""
-    if heuristic_name == "manhattan":
-        return manhattan_distance
-    elif heuristic_name == "diagonal":
-        return diagonal_distance
-    else:  # default to euclidean
-        return euclidean_distance
+class BatchQuery(BaseModel):
+    start_x: int
+    start_y: int
+    goal_x: int
+    goal_y: int
 
-@router.post("/find", response_model=PathResponse)
-async def find_path(request: PathRequest, grid_map: GridMap = Depends(get_current_map)):
-    """
-    使用指定算法寻找路径
-    """
+class BatchPathRequest(BaseModel):
+    queries: List[BatchQuery]
+    algorithm: str = "astar"
+    heuristic: str = "euclidean"
+    smooth: bool = False
+    check_collision: bool = False
+    include_explored: bool = False  # 批量查询默认不返回探索节点
+    max_nodes: Optional[int] = None  # 每个查询的搜索预算，含义同PathRequest
+    timeout: Optional[float] = None
+
+class BatchPathResult(BaseModel):
+    index: int  # 对应请求中queries的序号
+    path: List[PathPoint]
+    explored: List[PathPoint] = []
+    path_length: float
+    path_cost: float
+    nodes_explored: int
+    computation_time: float
+    status: str = STATUS_COMPLETE
+
+class BatchPathResponse(BaseModel):
+    results: List[BatchPathResult]
+    total_time: float
+
+class CostFieldRequest(BaseModel):
+    goal_x: int
+    goal_y: int
+    max_nodes: Optional[int] = None  # 搜索预算，含义同PathRequest
+    timeout: Optional[float] = None
+
+class CostFieldResponse(BaseModel):
+    goal: PathPoint
+    width: int
+    height: int
+    version: int  # 代价场对应的地图版本号
+    cost: str  # base64编码的float32小端数组，按行存储，不可达为inf
+    direction: str  # base64编码的int8数组，下一步方向编号（与/path/field/directions一致），-1表示终点或不可达
+    reachable: int  # 能到达终点的格子数量
+    computation_time: float
+    cached: bool = False
+
+class FieldPathRequest(BaseModel):
+    goal_x: int
+    goal_y: int
+    starts: List[PathPoint]
+    max_nodes: Optional[int] = None  # 搜索预算，含义同PathRequest
+    timeout: Optional[float] = None
+
+class FieldPath(BaseModel):
+    path: List[PathPoint]  # 起点不可达时为空
+    path_length: float
+    path_cost: float
+
+class FieldPathResponse(BaseModel):
+    paths: List[FieldPath]
+    computation_time: float
+    cached: bool = False  # 代价场是否来自缓存
+
+class PlannerRequest(BaseModel):
+    start_x: int
+    start_y: int
+    goal_x: int
+    goal_y: int
+    heuristic: str = "euclidean"  # euclidean, manhattan, diagonal
+    max_nodes: Optional[int] = None  # 搜索预算，含义同PathRequest
+    timeout: Optional[float] = None
+
+class ReplanRequest(BaseModel):
+    # 自上次规划以来发生变化的格子，为空时根据地图的修改记录自动确定
+    changed_cells: Optional[List[PathPoint]] = None
+    max_nodes: Optional[int] = None  # 搜索预算，含义同PathRequest
+    timeout: Optional[float] = None
+
+class PlannerResponse(PathResponse):
+    planner_id: str
+
+def validate_endpoints(grid_map: GridMap, request):
+    """检查请求中的起点和终点是否有效且不是障碍物"""
     # 检查起点和终点是否有效
     if not grid_map.is_valid(request.start_x, request.start_y):
         raise HTTPException(status_code=400, detail="起点坐标无效")
         
-    if not grid_map.is_valid(request.goal_x, request.goal_y):
-        raise HTTPException(status_code=400, detail="终点坐标无效")
+    validate_goal(grid_map, request)
     
-    # 检查起点和终点是否是障碍物
+    # 检查起点是否是障碍物
     if grid_map.is_obstacle(request.start_x, request.start_y):
         raise HTTPException(status_code=400, detail="起点是障碍物")
+
+def require_dense_map(grid_map: GridMap, feature: str):
+    """代价场、增量规划等功能需要整张地图的稠密数组，分块大地图不支持"""
+    if isinstance(grid_map, TiledMap):
+        raise HTTPException(status_code=400, detail=f"分块大地图不支持{feature}")
+
+def validate_goal(grid_map: GridMap, request):
+    """检查请求中的终点是否有效且不是障碍物"""
+    if not grid_map.is_valid(request.goal_x, request.goal_y):
+        raise HTTPException(status_code=400, detail="终点坐标无效")
         
     if grid_map.is_obstacle(request.goal_x, request.goal_y):
         raise HTTPException(status_code=400, detail="终点是障碍物")
+
+def _budget_limit(requested, configured):
+    """请求中的限制只能比配置更严格，未设置（或不大于0）时使用配置"""
+    if requested is None or requested <= 0:
+        return configured
+    return min(requested, configured) if configured > 0 else requested
+
+def make_budget(request) -> SearchBudget:
+    """根据请求和服务端配置确定搜索预算"""
+    return SearchBudget(_budget_limit(request.max_nodes, config.SEARCH_MAX_NODES),
+                        _budget_limit(request.timeout, config.SEARCH_TIMEOUT))
+
+async def run_offloaded(http_request: Request, future, on_disconnect=None):
+    """等待执行器中的任务，客户端断开连接时取消任务并返回499"""
+    try:
+        return await offload.await_future(future, http_request.is_disconnected, on_disconnect)
+    except offload.ClientDisconnected:
+        raise HTTPException(status_code=499, detail="客户端已断开连接")
+
+def encode_search_result(grid_map: GridMap, request: PathRequest, path: List[Tuple[int, int]], explored) -> Dict[str, Any]:
+    """
+    按请求的编码方式转换路径和探索节点，返回PathResponse的对应字段
+
+    compact编码下路径用起点加链码表示（路径不是逐格相连时仍返回坐标列表），
+    探索节点用外接矩形内的位图表示，位图不比坐标列表小时（探索节点稀疏分布）仍返回坐标列表；
+    include_explored为False时不转换探索节点。
+    """
+    fields = {"nodes_explored": len(explored), "path": [], "explored": []}
+    if request.encoding == "compact":
+        chain = encode_chain(path)
+        if chain is not None:
+            fields["path_start"] = PathPoint(x=path[0][0], y=path[0][1])
+            fields["path_chain"] = chain
+        else:
+            fields["path"] = [PathPoint(x=p[0], y=p[1]) for p in path]
+        if request.include_explored and len(explored):
+            xs, ys = explored_coordinates(explored)
+            encoded = encode_explored_bitmap(xs, ys)
+            if encoded is not None:
+                fields["explored_bitmap"], (x0, y0, w, h) = encoded
+                fields["explored_box"] = ExploredBox(x=x0, y=y0, width=w, height=h)
+            else:
+                fields["explored"] = [PathPoint(x=x, y=y) for x, y in zip(xs.tolist(), ys.tolist())]
+        return fields
+    
+    fields["path"] = [PathPoint(x=p[0], y=p[1]) for p in path]
+    if request.include_explored:
+        fields["explored"] = [PathPoint(x=e[0], y=e[1]) for e in explored]
+    return fields
+
+def build_path_response(grid_map: GridMap, request: PathRequest, path, explored, status: str,
+                        computation_time: float, stats: Optional[SearchStats] = None) -> PathResponse:
+    """对搜索结果做后处理并转换为API响应，指定stats时记录后处理耗时"""
+    if path is None:
+        path_length, path_cost = 0, float('inf')
+        path = []
+    else:
+        # 路径后处理
+        path = postprocess_path(grid_map, path, request.smooth, request.check_collision, stats,
+                                is_any_angle(request.algorithm, grid_map))
+        
+        # 计算路径长度和代价
+        path_length, path_cost = compute_path_metrics(grid_map, path)
     
-    # 获取启发函数
-    heuristic_func = get_heuristic(request.heuristic)
+    # 转换为API响应格式
+    return PathResponse(
+        path_length=path_length,
+        computation_time=computation_time,
+        path_cost=path_cost,
+        status=status,
+        stats=SearchStatsInfo(**stats.as_dict()) if stats is not None and request.include_stats else None,
+        **encode_search_result(grid_map, request, path, explored)
+    )
+
+def solve_and_build(grid_map: GridMap, request: PathRequest, start: Tuple[int, int], goal: Tuple[int, int],
+                    budget: SearchBudget, stats: Optional[SearchStats]) -> PathResponse:
+    """在当前线程中完成搜索、后处理和响应序列化，供性能分析模式使用"""
+    start_time = time.time()
+    path, explored, status = run_budgeted_search(grid_map, start, goal, request.algorithm, request.heuristic,
+                                                 budget, stats)
+    response = build_path_response(grid_map, request, path, explored, status, time.time() - start_time, stats)
+    # 响应正常由框架在返回后序列化，这里先序列化一次，使报告中包括序列化的耗时
+    response.model_dump_json()
+    return response
+
+def profile_find_path(grid_map: GridMap, request: PathRequest, start: Tuple[int, int], goal: Tuple[int, int],
+                      budget: SearchBudget, stats: Optional[SearchStats]) -> PathResponse:
+    """在性能分析器下处理路径请求，报告附在响应中"""
+    response, report = run_profiled(solve_and_build, grid_map, request, start, goal, budget, stats,
+                                    mode=request.profile_mode, top=config.PROFILE_TOP, output_dir=config.PROFILE_DIR)
+    response.profile = store_report(report)
+    return response
+
+@router.post("/find", response_model=PathResponse)
+async def find_path(request: PathRequest, http_request: Request, map_id: str = Depends(get_map_id),
+                    grid_map: GridMap = Depends(get_current_map)):
+    """
+    使用指定算法寻找路径
+
+    搜索在线程池（或配置的进程池）中执行，不阻塞其他请求；超过节点数或时间预算时返回部分结果，
+    status说明原因。客户端断开连接后搜索随之取消。
+    大范围搜索时可以用encoding="compact"或include_explored=False减小响应体积和序列化耗时。
+    include_stats为True时响应附带堆操作、邻居评估等插桩计数；不请求时搜索不做任何计数
+    （服务端开启SEARCH_STATS时除外）。
+    profile为True时（服务端开启PROFILING_ENABLED）搜索、后处理和序列化在同一线程的性能分析器下进行，
+    响应的profile字段给出按自身时间排序的热点函数；分析请求不读写缓存，也不使用进程池。
+    """
+    validate_endpoints(grid_map, request)
+    if request.encoding not in ("points", "compact"):
+        raise HTTPException(status_code=400, detail="encoding只支持points或compact")
+    
+    start = (request.start_x, request.start_y)
+    goal = (request.goal_x, request.goal_y)
+    budget = make_budget(request)
+    stats = SearchStats() if request.include_stats or config.SEARCH_STATS else None
+    
+    if request.profile:
+        check_profile_request(request.profile_mode)
+        # 分析器只能看到当前线程，整个请求在一个工作线程中处理；耗时受分析器影响，不计入指标
+        return await run_offloaded(http_request, offload.submit(
+            read_map, map_id, profile_find_path, grid_map, request, start, goal, budget, stats,
+            max_workers=config.SEARCH_WORKERS), budget.cancel)
+    
+    # 相同请求在地图未变化时直接返回缓存结果，跳过搜索和后处理
+    cache_key = (map_id, grid_map.version, request.start_x, request.start_y, request.goal_x, request.goal_y,
+                 request.algorithm, request.heuristic, request.smooth, request.check_collision,
+                 request.encoding, request.include_explored, request.include_stats)
+    cached_response = path_cache.get(cache_key)
+    if cached_response is not None:
+        return cached_response.model_copy(update={"cached": True})
     
     # 记录计算时间
     start_time = time.time()
     
-    # 根据请求的算法进行路径规划
+    # 根据请求的算法进行路径规划，跳点搜索在代价不均匀的地图上自动回退到A*
+    if config.SEARCH_EXECUTOR == "process":
+        future = batch.submit_search(grid_map, start, goal, request.algorithm, request.heuristic, budget,
+                                     max_workers=config.BATCH_WORKERS or None, collect_stats=stats is not None)
+        path, explored, status, stats = await run_offloaded(http_request, future, budget.cancel)
+    else:
+        future = offload.submit(read_map, map_id, run_budgeted_search, grid_map, start, goal, request.algorithm,
+                                request.heuristic, budget, stats, max_workers=config.SEARCH_WORKERS)
+        path, explored, status = await run_offloaded(http_request, future, budget.cancel)
+    
+    computation_time = time.time() - start_time
+    
+    # 后处理和序列化同样在线程池中进行，大量探索节点的转换不会阻塞事件循环
+    response = await run_offloaded(http_request, offload.submit(
+        read_map, map_id, build_path_response, grid_map, request, path, explored, status, computation_time, stats,
+        max_workers=config.SEARCH_WORKERS))
+    if config.METRICS_ENABLED:
+        algorithm = request.algorithm if request.algorithm in ALGORITHMS else "astar"
+        metrics.observe_search(algorithm, status, computation_time, len(explored), stats)
+        if stats is not None:
+            metrics.observe_postprocess(stats)
+    # 预算用尽的部分结果不缓存；分块地图的快照就是地图本身，处理期间被修改时结果可能混合修改前后的内容，
+    # 不能以修改前的版本号缓存
+    if status == STATUS_COMPLETE and grid_map.version == cache_key[1]:
+        path_cache.put(cache_key, response)
+    return response
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+@router.post("/stream")
+async def stream_path(request: PathStreamRequest, map_id: str = Depends(get_map_id),
+                      grid_map: GridMap = Depends(get_current_map)):
+    """
+    以Server-Sent Events分批推送搜索过程
+
+    每扩展chunk_size个节点推送一条progress事件：
+        {"explored": 本批新扩展的节点, "frontier": [{"x", "y", "f"}, ...], "open_size", "nodes_explored"}
+    搜索结束时推送一条result事件：
+        {"path", "path_length", "path_cost", "nodes_explored", "computation_time", "version", "status"}，
+        未找到路径时path为空、path_cost为null；预算用尽时status不为complete，path为部分路径。
+    服务端不保存完整的探索节点列表，客户端断开连接后搜索随之停止。
+    include_explored为False时progress事件不包含探索节点；encoding参数对流式接口无效。
+    分块地图在推送结束前持有读锁，期间的编辑等待推送结束。
+    """
+    validate_endpoints(grid_map, request)
+    if not 1 <= request.chunk_size <= 100000:
+        raise HTTPException(status_code=400, detail="chunk_size必须在1到100000之间")
+    if not 0 <= request.frontier_limit <= 1000:
+        raise HTTPException(status_code=400, detail="frontier_limit必须在0到1000之间")
+    
     start = (request.start_x, request.start_y)
     goal = (request.goal_x, request.goal_y)
+    budget = make_budget(request)
+    try:
+        search = iter_search(grid_map, start, goal, request.algorithm, request.heuristic,
+                             request.chunk_size, request.frontier_limit, budget)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    version = grid_map.version
+    
+    def events():
+        with registry.reading(map_id):
+            computation_time = 0.0
+            resumed_at = time.time()
+            for progress in search:
+                computation_time += time.time() - resumed_at
+                if not progress.done:
+                    yield sse_event("progress", {
+                        "explored": [{"x": x, "y": y} for x, y in progress.explored] if request.include_explored else [],
+                        "frontier": [{"x": x, "y": y, "f": f} for x, y, f in progress.frontier],
+                        "open_size": progress.open_size,
+                        "nodes_explored": progress.nodes_explored
+                    })
+                    resumed_at = time.time()
+                    continue
+            
+                # 最后一批探索节点与结果分开推送，结果事件保持精简
+                if progress.explored and request.include_explored:
+                    yield sse_event("progress", {
+                        "explored": [{"x": x, "y": y} for x, y in progress.explored],
+                        "frontier": [],
+                        "open_size": progress.open_size,
+                        "nodes_explored": progress.nodes_explored
+                    })
+                path = progress.path if progress.path is not None else budget.partial_path
+                if path is None:
+                    path_length, path_cost = 0.0, None
+                    path = []
+                else:
+                    path = postprocess_path(grid_map, path, request.smooth, request.check_collision)
+                    path_length, path_cost = compute_path_metrics(grid_map, path)
+                    if path_cost == float('inf'):
+                        # 平滑后的路径穿过障碍物；JSON没有inf，与/path/find一样输出null
+                        path_cost = None
+                yield sse_event("result", {
+                    "path": [{"x": x, "y": y} for x, y in path],
+                    "path_length": path_length,
+                    "path_cost": path_cost,
+                    "nodes_explored": progress.nodes_explored,
+                    "computation_time": computation_time,
+                    "version": version,
+                    "status": budget.status
+                })
+    
+    
+    # 同步生成器由线程池逐批驱动，搜索不会阻塞事件循环
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/batch", response_model=BatchPathResponse)
+async def find_paths_batch(request: BatchPathRequest, http_request: Request,
+                           grid_map: GridMap = Depends(get_current_map)):
+    """
+    批量路径规划
+    
+    地图按版本发布给工作进程（每个版本只传输一次），查询分块后在多个进程上并行求解，
+    结果按请求顺序返回，并附带每个查询的计算时间。客户端断开连接后尚未开始的分块被取消。
+    """
+    if len(request.queries) > config.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"查询数量过多，最多支持{config.BATCH_MAX_QUERIES}个")
     
-    if request.algorithm == "adaptive_astar":
-        path, explored = adaptive_astar_search(grid_map, start, goal, heuristic_func)
-    else:  # default to standard A*
-        path, explored = astar_search(grid_map, start, goal, heuristic_func)
+    for i, query in enumerate(request.queries):
+        try:
+            validate_endpoints(grid_map, query)
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"第{i}个查询：{e.detail}")
     
+    start_time = time.time()
+    queries = [((q.start_x, q.start_y), (q.goal_x, q.goal_y)) for q in request.queries]
+    options = {
+        "algorithm": request.algorithm,
+        "heuristic": request.heuristic,
+        "smooth": request.smooth,
+        "check_collision": request.check_collision,
+        "include_explored": request.include_explored,
+        "max_nodes": _budget_limit(request.max_nodes, config.SEARCH_MAX_NODES),
+        "timeout": _budget_limit(request.timeout, config.SEARCH_TIMEOUT)
+    }
+    futures = batch.submit_batch(grid_map, queries, options, max_workers=config.BATCH_WORKERS or None)
+    try:
+        chunks = await offload.await_all(futures, http_request.is_disconnected)
+    except offload.ClientDisconnected:
+        raise HTTPException(status_code=499, detail="客户端已断开连接")
+    
+    results = sorted((result for chunk in chunks for result in chunk), key=lambda r: r["index"])
+    return BatchPathResponse(
+        results=[
+            BatchPathResult(
+                index=r["index"],
+                path=[PathPoint(x=p[0], y=p[1]) for p in r["path"]],
+                explored=[PathPoint(x=e[0], y=e[1]) for e in r["explored"]],
+                path_length=r["path_length"],
+                path_cost=r["path_cost"],
+                nodes_explored=r["nodes_explored"],
+                computation_time=r["computation_time"],
+                status=r["status"]
+            )
+            for r in results
+        ],
+        total_time=time.time() - start_time
+    )
+
+def get_cost_field(map_id: str, grid_map: GridMap, goal: Tuple[int, int],
+                   budget: SearchBudget) -> Tuple[CostField, bool]:
+    """
+    获取以goal为终点的代价场，同一地图版本和终点只计算一次
+    
+    返回:
+        (代价场, 是否来自缓存)
+    
+    异常:
+        HTTPException: 计算超出预算，代价场不完整（不缓存）
+    """
+    cache_key = (map_id, grid_map.version, goal)
+    field = field_cache.get(cache_key)
+    if field is not None:
+        return field, True
+    with budget:
+        field = compute_cost_field(grid_map, goal)
+    if field is None:
+        raise HTTPException(status_code=503, detail=f"代价场计算未完成：{budget.status}")
+    field_cache.put(cache_key, field)
+    return field, False
+
+def build_field_response(map_id: str, grid_map: GridMap, request: CostFieldRequest,
+                         budget: SearchBudget) -> CostFieldResponse:
+    """在预算内获取代价场并编码为API响应"""
+    start_time = time.time()
+    field, cached = get_cost_field(map_id, grid_map, (request.goal_x, request.goal_y), budget)
     computation_time = time.time() - start_time
     
-    # 如果未找到路径
-    if path is None:
-        return PathResponse(
-            path=[],
-            explored=[PathPoint(x=e[0], y=e[1]) for e in explored],
-            path_length=0,
-            computation_time=computation_time,
-            path_cost=float('inf'),
-            nodes_explored=len(explored)
-        )
-    
-    # 路径后处理
-    original_path = path.copy()
-    
-    # 如果需要路径平滑
-    if request.smooth and len(path) > 2:
-        path = smooth_path(grid_map, path)
-    
-    # 如果需要碰撞检查
-    if request.check_collision:
-        path = check_and_fix_collision(grid_map, path)
-    
-    # 计算路径长度和代价
-    path_length = 0.0
-    path_cost = 0.0
-    
-    for i in range(1, len(path)):
-        x1, y1 = path[i-1]
-        x2, y2 = path[i]
-        segment_length = euclidean_distance((x1, y1), (x2, y2))
-        path_length += segment_length
-        path_cost += grid_map.get_movement_cost(x1, y1, x2, y2)
+    return CostFieldResponse(
+        goal=PathPoint(x=request.goal_x, y=request.goal_y),
+        width=field.width,
+        height=field.height,
+        version=field.version,
+        cost=base64.b64encode(field.cost.astype('<f4').tobytes()).decode('ascii'),
+        direction=base64.b64encode(field.direction.tobytes()).decode('ascii'),
+        reachable=int(np.isfinite(field.cost).sum()),
+        computation_time=computation_time,
+        cached=cached
+    )
+
+def build_field_paths_response(map_id: str, grid_map: GridMap, request: FieldPathRequest,
+                               budget: SearchBudget) -> FieldPathResponse:
+    """在预算内获取代价场，并沿方向场为每个起点生成路径"""
+    start_time = time.time()
+    field, cached = get_cost_field(map_id, grid_map, (request.goal_x, request.goal_y), budget)
     
-    # 转换为API响应格式
-    return PathResponse(
+    paths = []
+    for start in request.starts:
+        path = field.path_from((start.x, start.y))
+        if path is None:
+            paths.append(FieldPath(path=[], path_length=0, path_cost=float('inf')))
+            continue
+        path_length, path_cost = compute_path_metrics(grid_map, path)
+        paths.append(FieldPath(
+            path=[PathPoint(x=p[0], y=p[1]) for p in path],
+            path_length=path_length,
+            path_cost=path_cost
+        ))
+    
+    return FieldPathResponse(paths=paths, computation_time=time.time() - start_time, cached=cached)
+
+@router.post("/field", response_model=CostFieldResponse)
+async def get_field(request: CostFieldRequest, http_request: Request, map_id: str = Depends(get_map_id),
+                    grid_map: GridMap = Depends(get_current_map)):
+    """
+    计算所有格子到终点的代价场和方向场
+    
+    多个单位前往同一终点时，只需计算一次代价场，任意起点沿方向场即可得到最短路径。
+    计算在线程池中按搜索预算进行，超出预算时返回503；客户端断开连接后计算随之取消。
+    """
+    require_dense_map(grid_map, "代价场")
+    validate_goal(grid_map, request)
+    
+    budget = make_budget(request)
+    return await run_offloaded(http_request, offload.submit(
+        build_field_response, map_id, grid_map, request, budget,
+        max_workers=config.SEARCH_WORKERS), budget.cancel)
+
+@router.post("/field/paths", response_model=FieldPathResponse)
+async def get_field_paths(request: FieldPathRequest, http_request: Request, map_id: str = Depends(get_map_id),
+                          grid_map: GridMap = Depends(get_current_map)):
+    """
+    沿代价场为多个起点生成前往同一终点的路径
+    
+    代价场命中缓存时，每条路径的耗时只与路径长度有关。预算和取消的处理同/path/field。
+    """
+    require_dense_map(grid_map, "代价场")
+    validate_goal(grid_map, request)
+    for i, start in enumerate(request.starts):
+        if not grid_map.is_valid(start.x, start.y):
+            raise HTTPException(status_code=400, detail=f"第{i}个起点坐标无效")
+    
+    budget = make_budget(request)
+    return await run_offloaded(http_request, offload.submit(
+        build_field_paths_response, map_id, grid_map, request, budget,
+        max_workers=config.SEARCH_WORKERS), budget.cancel)
+
+@router.get("/field/directions")
+async def get_field_directions():
+    """
+    获取方向场中方向编号对应的(dx, dy)
+    """
+    return {"directions": [{"id": d, "dx": dx, "dy": dy} for d, (dx, dy) in enumerate(DIRECTIONS)]}
+
+@router.get("/cache")
+async def get_cache_stats():
+    """
+    获取路径缓存的命中、未命中和淘汰统计
+    """
+    return path_cache.stats()
+
+@router.delete("/cache")
+async def clear_cache():
+    """
+    清空路径缓存
+    """
+    path_cache.clear()
+    return {"message": "路径缓存已清空"}
+
+def _planner_response(planner_id: str, grid_map: GridMap, path, explored, computation_time: float,
+                      status: str) -> PlannerResponse:
+    """把增量规划结果转换为API响应格式"""
+    path = path or []
+    path_length, path_cost = compute_path_metrics(grid_map, path)
+    return PlannerResponse(
+        planner_id=planner_id,
         path=[PathPoint(x=p[0], y=p[1]) for p in path],
         explored=[PathPoint(x=e[0], y=e[1]) for e in explored],
         path_length=path_length,
         computation_time=computation_time,
-        path_cost=path_cost,
-        nodes_explored=len(explored)
+        path_cost=path_cost if path else float('inf'),
+        nodes_explored=len(explored),
+        status=status
     )
 
+def plan_initial(planner_id: str, grid_map: GridMap, request: PlannerRequest,
+                 budget: SearchBudget) -> Tuple[LPAStarPlanner, PlannerResponse]:
+    """创建增量规划器并在预算内完成首次规划"""
+    start_time = time.time()
+    planner = LPAStarPlanner(grid_map, (request.start_x, request.start_y), (request.goal_x, request.goal_y),
+                             get_heuristic(request.heuristic))
+    with planner.lock, budget:
+        path, explored = planner.compute_shortest_path()
+    computation_time = time.time() - start_time
+    return planner, _planner_response(planner_id, grid_map, path, explored, computation_time, budget.status)
+
+def plan_again(planner_id: str, planner: LPAStarPlanner, grid_map: GridMap, request: ReplanRequest,
+               budget: SearchBudget) -> PlannerResponse:
+    """在预算内根据地图变化修复规划器的路径"""
+    start_time = time.time()
+    with planner.lock, budget:
+        if planner.grid_map.derived_state() is not grid_map.derived_state():
+            # 不是同一张地图的快照（地图已被重新创建或换了地图ID），之前的搜索状态全部失效
+            planner.reset(grid_map)
+            path, explored = planner.compute_shortest_path()
+        else:
+            # 同一张地图的新快照：修改记录随快照延续，可以增量修复
+            planner.grid_map = grid_map
+            changed_cells = None
+            if request.changed_cells is not None:
+                changed_cells = [(cell.x, cell.y) for cell in request.changed_cells]
+            path, explored = planner.replan(changed_cells)
+    computation_time = time.time() - start_time
+    return _planner_response(planner_id, grid_map, path, explored, computation_time, budget.status)
+
+@router.post("/planner", response_model=PlannerResponse)
+async def create_planner(request: PlannerRequest, http_request: Request,
+                         grid_map: GridMap = Depends(get_current_map)):
+    """
+    创建增量规划器并完成首次规划
+    
+    规划器会保留搜索状态，之后地图局部修改时调用 /path/planner/{planner_id}/replan
+    只修复受影响的部分。规划在线程池中按搜索预算进行，超出预算时路径为空、status说明原因，
+    规划器仍会创建，之后的重新规划从中断处继续；客户端断开连接后规划取消，不创建规划器。
+    """
+    require_dense_map(grid_map, "增量规划器")
+    validate_endpoints(grid_map, request)
+    # 地标距离表只对创建时的地图版本是下界，地图修改后增量修复会得到非最优路径
+    if request.heuristic in MAP_HEURISTICS:
+        raise HTTPException(status_code=400, detail=f"增量规划器不支持启发函数{request.heuristic}")
+    
+    # 超出数量上限时丢弃最早创建的规划器
+    while len(planners) >= MAX_PLANNERS:
+        oldest = min(planners, key=lambda pid: planners[pid].created_at)
+        del planners[oldest]
+    
+    planner_id = uuid.uuid4().hex
+    budget = make_budget(request)
+    planner, response = await run_offloaded(http_request, offload.submit(
+        plan_initial, planner_id, grid_map, request, budget,
+        max_workers=config.SEARCH_WORKERS), budget.cancel)
+    planners[planner_id] = planner
+    return response
+
+@router.post("/planner/{planner_id}/replan", response_model=PlannerResponse)
+async def replan(planner_id: str, request: ReplanRequest, http_request: Request,
+                 grid_map: GridMap = Depends(get_current_map)):
+    """
+    根据变化的格子增量修复路径
+    
+    预算和取消的处理同创建规划器：中断时已处理的部分保留在规划器中，下次重新规划时继续。
+    """
+    planner = planners.get(planner_id)
+    if planner is None:
+        raise HTTPException(status_code=404, detail="规划器不存在")
+    
+    budget = make_budget(request)
+    return await run_offloaded(http_request, offload.submit(
+        plan_again, planner_id, planner, grid_map, request, budget,
+        max_workers=config.SEARCH_WORKERS), budget.cancel)
+
+@router.delete("/planner/{planner_id}")
+async def delete_planner(planner_id: str):
+    """
+    删除增量规划器
+    """
+    if planners.pop(planner_id, None) is None:
+        raise HTTPException(status_code=404, detail="规划器不存在")
+    return {"message": "规划器已删除"}
+
 @router.get("/heuristics")
 async def get_available_heuristics():
     """
     获取可用的启发函数列表
     """
     return {
-        "heuristics": [
-            {"id": "euclidean", "name": "欧几里得距离"},
-            {"id": "manhattan", "name": "曼哈顿距离"},
-            {"id": "diagonal", "name": "对角线距离"}
-        ]
+        "heuristics": [{"id": heuristic_id, "name": name} for heuristic_id, name in heuristic_names().items()]
     }
 
 @router.get("/algorithms")
@@ -138,8 +751,5 @@ async def get_available_algorithms():
     获取可用的路径规划算法列表
     """
     return {
-        "algorithms": [
-            {"id": "astar", "name": "A*算法"},
-            {"id": "adaptive_astar", "name": "自适应A*算法"}
-        ]
+        "algorithms": [{"id": algorithm_id, "name": name} for algorithm_id, (_, name) in ALGORITHMS.items()]
     } 
\ No newline at end of file
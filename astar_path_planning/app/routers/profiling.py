@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from pydantic import BaseModel
+from astar_path_planning.app.utils.cache import LRUCache
+from astar_path_planning.app.utils.profiling import PROFILE_MODES
+from astar_path_planning.app import config
+
+router = APIRouter(prefix="/profiles", tags=["监控"])
+
+# 最近的性能分析报告，按报告ID保存
+profile_reports = LRUCache(maxsize=config.PROFILE_KEEP)
+
+class ProfileFunction(BaseModel):
+    function: str
+    location: str  # 文件:行号，内置函数为~
+    calls: Optional[int] = None  # 调用次数，采样分析时为None
+    self_time: float  # 函数自身的耗时（秒），采样分析时为估算值
+    cumulative_time: float  # 包括被调用函数在内的耗时（秒）
+
+class ProfileReport(BaseModel):
+    profile_id: str
+    mode: str  # deterministic 或 sampling
+    total_time: float
+    samples: Optional[int] = None  # 采样分析的样本数
+    functions: List[ProfileFunction]  # 按自身时间从高到低排列的热点函数
+    file: Optional[str] = None  # 服务端保存的完整结果文件（配置了PROFILE_DIR时）
+
+def check_profile_request(mode: str):
+    """检查服务端是否允许性能分析以及分析方式是否有效"""
+    if not config.PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="服务端未开启性能分析（ASTAR_PROFILING_ENABLED）")
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"profile_mode只支持{'、'.join(PROFILE_MODES)}")
+
+def store_report(report: dict) -> ProfileReport:
+    """保存报告供之后通过 /profiles/{profile_id} 查询"""
+    profile = ProfileReport(**report)
+    profile_reports.put(profile.profile_id, profile)
+    return profile
+
+@router.get("/{profile_id}", response_model=ProfileReport)
+async def get_profile(profile_id: str):
+    """
+    获取性能分析报告
+
+    /visualization/render 的报告只能通过这里查询，报告ID在响应头X-Profile-Id中。
+    """
+    profile = profile_reports.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="性能分析报告不存在或已过期")
+    return profile
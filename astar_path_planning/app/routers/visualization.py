@@ -1,19 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi import APIRouter, HTTPException, Depends, Response, Request
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
-import matplotlib.pyplot as plt
-import matplotlib
-import io
-import base64
+import time
 import numpy as np
 from astar_path_planning.app.models.grid_map import GridMap, TerrainMap
-from astar_path_planning.app.routers.grid import get_current_map
-
-# 修复matplotlib在没有GUI的情况下的问题
-matplotlib.use('Agg')
+from astar_path_planning.app.routers.grid import get_current_map, get_map_id, map_change_listeners, read_map
+from astar_path_planning.app.utils.cache import LRUCache
+from astar_path_planning.app.utils.renderer import sample_step, render_base, compose_image, encode_png, render_svg
+from astar_path_planning.app.utils import offload, metrics
+from astar_path_planning.app.utils.profiling import run_profiled
+from astar_path_planning.app.routers.profiling import check_profile_request, store_report
+from astar_path_planning.app import config
 
 router = APIRouter(prefix="/visualization", tags=["可视化"])
 
+# 地图底图缓存，键为(地图ID, 地图版本号, 采样步长, 是否显示地图)，叠加层每次请求重新绘制
+base_cache = LRUCache(maxsize=config.RENDER_CACHE_SIZE)
+
+def _invalidate_base_cache(map_id: str, grid_map: Optional[GridMap]):
+    """地图变化后移除该地图旧版本的底图，地图被删除时移除它的全部底图"""
+    base_cache.invalidate(lambda key: key[0] == map_id and (grid_map is None or key[1] != grid_map.version))
+
+map_change_listeners.append(_invalidate_base_cache)
+
 class VisualizationRequest(BaseModel):
     path: Optional[List[Dict[str, int]]] = None
     explored: Optional[List[Dict[str, int]]] = None
@@ -21,105 +30,100 @@ class VisualizationRequest(BaseModel):
     show_explored: bool = True
     show_path: bool = True
     format: str = "png"  # png, svg
+    # 为True时在性能分析器下渲染（需服务端开启），报告ID在响应头X-Profile-Id中，通过/profiles/{id}查询
+    profile: bool = False
+    profile_mode: str = "deterministic"  # deterministic 或 sampling
+
+def get_base_image(map_id: str, grid_map: GridMap, step: int, show_map: bool) -> np.ndarray:
+    """获取地图底图，同一地图版本只生成一次"""
+    key = (map_id, grid_map.version, step, show_map)
+    base = base_cache.get(key)
+    if base is None:
+        base = render_base(grid_map, step, show_map)
+        base.setflags(write=False)
+        base_cache.put(key, base)
+    return base
+
+def points_array(points: Optional[List[Dict[str, int]]]) -> Optional[np.ndarray]:
+    """把坐标字典列表转换为(N, 2)整数数组"""
+    if not points:
+        return None
+    return np.array([(point["x"], point["y"]) for point in points], dtype=np.intp)
+
+def render_image(map_id: str, grid_map: GridMap, request: VisualizationRequest):
+    """生成图像，返回(内容, 媒体类型)"""
+    start_time = time.perf_counter()
+    step = sample_step(grid_map.width, grid_map.height, config.RENDER_MAX_IMAGE_SIZE)
+    base = get_base_image(map_id, grid_map, step, request.show_grid)
+    path = points_array(request.path) if request.show_path else None
+    explored = points_array(request.explored) if request.show_explored else None
+    
+    if request.format == "svg":
+        result = render_svg(base, step, (grid_map.width, grid_map.height), path, explored), "image/svg+xml"
+    else:
+        image = compose_image(base, step, path, explored)
+        result = encode_png(image), "image/png"
+    
+    if config.METRICS_ENABLED and not request.profile:
+        metrics.render_duration.observe(time.perf_counter() - start_time, format=request.format)
+    return result
+
+def profile_render(map_id: str, grid_map: GridMap, request: VisualizationRequest):
+    """在性能分析器下生成图像并保存报告，返回(内容, 媒体类型, 报告ID)"""
+    (content, media_type), report = run_profiled(render_image, map_id, grid_map, request, mode=request.profile_mode,
+                                                 top=config.PROFILE_TOP, output_dir=config.PROFILE_DIR)
+    return content, media_type, store_report(report).profile_id
 
 @router.post("/render")
-async def render_visualization(request: VisualizationRequest, grid_map: GridMap = Depends(get_current_map)):
+async def render_visualization(request: VisualizationRequest, http_request: Request,
+                               map_id: str = Depends(get_map_id), grid_map: GridMap = Depends(get_current_map)):
     """
     生成地图和路径可视化
+
+    PNG直接由NumPy合成并编码，SVG使用matplotlib绘制矢量图形。
+    地图底图按地图版本缓存，每次请求只重新绘制路径和探索节点。
+    超过RENDER_MAX_IMAGE_SIZE的地图降采样后渲染。
+    渲染在线程池中执行，不阻塞其他请求。
     """
-    # 设置图像大小和分辨率
-    dpi = 100
-    figsize = (grid_map.width / dpi * 3, grid_map.height / dpi * 3)
-    
-    # 创建图像
-    fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-    
-    # 绘制地图网格
-    if request.show_grid:
-        # 准备地图数据
-        grid_data = np.zeros((grid_map.height, grid_map.width, 3))
-        
-        # 设置地图颜色：白色-可通行，黑色-障碍物
-        for y in range(grid_map.height):
-            for x in range(grid_map.width):
-                if grid_map.is_obstacle(x, y):
-                    grid_data[y, x] = [0, 0, 0]  # 黑色-障碍物
-                else:
-                    # 如果是地形地图，使用不同颜色表示不同地形
-                    if isinstance(grid_map, TerrainMap):
-                        terrain_type = grid_map.terrain_type[y, x]
-                        if terrain_type == 0:
-                            grid_data[y, x] = [1, 1, 1]  # 白色-平地
-                        elif terrain_type == 1:
-                            grid_data[y, x] = [0.6, 0.3, 0.1]  # 棕色-山地
-                        elif terrain_type == 2:
-                            grid_data[y, x] = [0.2, 0.5, 0.8]  # 蓝色-水域
-                        else:
-                            grid_data[y, x] = [0.8, 0.8, 0.6]  # 其他地形
-                    else:
-                        grid_data[y, x] = [1, 1, 1]  # 白色-可通行
-        
-        # 绘制地图
-        ax.imshow(grid_data, origin='upper')
-    
-    # 绘制探索节点
-    if request.show_explored and request.explored:
-        explored_x = [point["x"] for point in request.explored]
-        explored_y = [point["y"] for point in request.explored]
-        ax.scatter(explored_x, explored_y, color='lightblue', marker='o', alpha=0.5, s=10)
-    
-    # 绘制路径
-    if request.show_path and request.path:
-        path_x = [point["x"] for point in request.path]
-        path_y = [point["y"] for point in request.path]
-        ax.plot(path_x, path_y, color='red', linewidth=2)
-        
-        # 起点和终点标记
-        if path_x and path_y:
-            ax.scatter(path_x[0], path_y[0], color='green', marker='o', s=100)
-            ax.scatter(path_x[-1], path_y[-1], color='blue', marker='*', s=100)
-    
-    # 设置坐标轴
-    ax.set_xticks(np.arange(-0.5, grid_map.width, 1), minor=True)
-    ax.set_yticks(np.arange(-0.5, grid_map.height, 1), minor=True)
-    ax.grid(which='minor', color='gray', linestyle='-', linewidth=0.5, alpha=0.2)
-    ax.tick_params(which='both', bottom=False, left=False, labelbottom=False, labelleft=False)
-    
-    # 保存图像到内存
-    buf = io.BytesIO()
-    if request.format == "svg":
-        plt.savefig(buf, format='svg', bbox_inches='tight')
-        mime_type = "image/svg+xml"
-    else:  # default to png
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        mime_type = "image/png"
-    
-    plt.close(fig)
-    buf.seek(0)
-    
-    # 返回图像
-    return Response(content=buf.getvalue(), media_type=mime_type)
+    if request.format not in ("png", "svg"):
+        raise HTTPException(status_code=400, detail="format只支持png或svg")
+    if request.profile:
+        check_profile_request(request.profile_mode)
+        future = offload.submit(read_map, map_id, profile_render, map_id, grid_map, request,
+                                max_workers=config.SEARCH_WORKERS)
+    else:
+        future = offload.submit(read_map, map_id, render_image, map_id, grid_map, request,
+                                max_workers=config.SEARCH_WORKERS)
+    try:
+        content, media_type, *profile_id = await offload.await_future(future, http_request.is_disconnected)
+    except offload.ClientDisconnected:
+        raise HTTPException(status_code=499, detail="客户端已断开连接")
+    headers = {"X-Profile-Id": profile_id[0]} if profile_id else None
+    return Response(content=content, media_type=media_type, headers=headers)
 
-@router.get("/metrics")
-async def get_metrics(grid_map: GridMap = Depends(get_current_map)):
+# 统计地图指标时每次读取的行数，分块地图的图层按行带读入，不一次载入整张图层
+METRICS_BAND_ROWS = 1024
+
+def compute_map_metrics(grid_map: GridMap) -> Dict[str, Any]:
     """
-    获取地图统计指标
+    统计障碍物和各类地形的格子数
+
+    按METRICS_BAND_ROWS行一带用np.count_nonzero和np.bincount计数，
+    内存占用与地图大小无关，分块地图的内存映射图层也只按带换入。
     """
-    # 计算地图中的障碍物比例
     obstacle_count = 0
-    terrain_stats = {}
-    
-    for y in range(grid_map.height):
-        for x in range(grid_map.width):
-            if grid_map.is_obstacle(x, y):
-                obstacle_count += 1
-            
-            # 如果是地形地图，统计各类地形
-            if isinstance(grid_map, TerrainMap):
-                terrain_type = grid_map.terrain_type[y, x]
-                if not terrain_stats.get(terrain_type):
-                    terrain_stats[terrain_type] = 0
-                terrain_stats[terrain_type] += 1
+    terrain_counts = np.zeros(0, dtype=np.int64)
+    is_terrain = isinstance(grid_map, TerrainMap)
+    for y0 in range(0, grid_map.height, METRICS_BAND_ROWS):
+        y1 = min(y0 + METRICS_BAND_ROWS, grid_map.height)
+        obstacle_count += int(np.count_nonzero(grid_map.grid[y0:y1]))
+        
+        # 如果是地形地图，统计各类地形
+        if is_terrain:
+            band_counts = np.bincount(np.asarray(grid_map.terrain_type[y0:y1]).ravel())
+            if len(band_counts) > len(terrain_counts):
+                terrain_counts = np.pad(terrain_counts, (0, len(band_counts) - len(terrain_counts)))
+            terrain_counts[:len(band_counts)] += band_counts
     
     total_cells = grid_map.width * grid_map.height
     
@@ -134,7 +138,22 @@ async def get_metrics(grid_map: GridMap = Depends(get_current_map)):
     }
     
     # 如果是地形地图，添加地形统计
-    if isinstance(grid_map, TerrainMap):
-        result["terrain_stats"] = {str(k): {"count": v, "ratio": v/total_cells} for k, v in terrain_stats.items()}
+    if is_terrain:
+        result["terrain_stats"] = {str(k): {"count": int(v), "ratio": int(v) / total_cells}
+                                   for k, v in enumerate(terrain_counts) if v}
     
-    return result 
\ No newline at end of file
+    return result
+
+@router.get("/metrics")
+async def get_metrics(http_request: Request, map_id: str = Depends(get_map_id),
+                      grid_map: GridMap = Depends(get_current_map)):
+    """
+    获取地图统计指标
+
+    统计在线程池中执行，大地图上也不阻塞其他请求。
+    """
+    future = offload.submit(read_map, map_id, compute_map_metrics, grid_map, max_workers=config.SEARCH_WORKERS)
+    try:
+        return await offload.await_future(future, http_request.is_disconnected)
+    except offload.ClientDisconnected:
+        raise HTTPException(status_code=499, detail="客户端已断开连接")
@@ -1,6 +1,6 @@
-import heapq
 import math
-from typing import List, Tuple, Callable, Set, Dict, Any
+from typing import Tuple, Callable
+from astar_path_planning.app.utils.search_engine import best_first_search
 
 def euclidean_distance(p1: Tuple[int, int], p2: Tuple[int, int]) -> float:
     """
@@ -57,70 +57,5 @@ def astar_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int],
     返回:
         如果找到路径，返回(路径, 已探索节点集合)；否则返回(None, 已探索节点集合)
     """
-    # 初始化open和closed集合
-    open_set = []  # 优先队列
-    closed_set = set()  # 已访问节点集合
-    
-    # g, h, f值字典
-    g_score = {start: 0}
-    f_score = {start: heuristic_func(start, goal)}
-    
-    # 添加起点到open集合
-    heapq.heappush(open_set, (f_score[start], start))
-    
-    # 用于重建路径的父节点字典
-    came_from = {}
-    
-    # 记录已探索的节点
-    explored_nodes = set()
-    
-    while open_set:
-        # 获取f值最小的节点
-        _, current = heapq.heappop(open_set)
-        
-        # 记录已探索节点
-        explored_nodes.add(current)
-        
-        # 如果到达目标
-        if current == goal:
-            # 重建路径
-            path = []
-            while current in came_from:
-                path.append(current)
-                current = came_from[current]
-            
-            path.append(start)
-            path.reverse()
-            return path, list(explored_nodes)
-        
-        # 将当前节点添加到closed集合
-        closed_set.add(current)
-        
-        # 获取邻居节点
-        neighbors = grid_map.get_neighbors(current[0], current[1])
-        
-        # 对每个邻居进行处理
-        for neighbor in neighbors:
-            # 如果邻居在closed集合中，跳过
-            if neighbor in closed_set:
-                continue
-            
-            # 计算通过当前节点到达邻居的g值
-            tentative_g = g_score[current] + grid_map.get_movement_cost(
-                current[0], current[1], neighbor[0], neighbor[1])
-            
-            # 如果邻居不在open集合中，或者找到了更好的路径
-            if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                # 更新父节点
-                came_from[neighbor] = current
-                
-                # 更新g和f值
-                g_score[neighbor] = tentative_g
-                f_score[neighbor] = g_score[neighbor] + heuristic_func(neighbor, goal)
-                
-                # 如果邻居不在open集合中，添加它
-                if neighbor not in [item[1] for item in open_set]:
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
-    
-    # 如果没有找到路径
-    return None, list(explored_nodes) 
\ No newline at end of file
+    return best_first_search(grid_map, start, goal,
+                             lambda x, y: heuristic_func((x, y), goal))
@@ -0,0 +1,187 @@
+import atexit
+import math
+import os
+import pickle
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Tuple, Dict, Any, Optional
+from astar_path_planning.app.utils.planning import run_budgeted_search, postprocess_path, compute_path_metrics, is_any_angle
+from astar_path_planning.app.utils.search_engine import SearchBudget, SearchStats
+
+# 每个工作进程最多缓存的地图版本数量
+_WORKER_MAP_CACHE = 2
+# 主进程最多保留的已发布地图文件数量
+_MAX_PUBLISHED_MAPS = 4
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+_published: Dict[int, str] = {}  # 地图版本号 -> 序列化文件路径
+
+# 工作进程内的地图缓存：地图版本号 -> 地图对象
+_worker_maps: Dict[int, Any] = {}
+
+
+def get_executor(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """获取（必要时创建）批量查询使用的进程池"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None:
+            _executor_workers = max_workers or os.cpu_count() or 1
+            _executor = ProcessPoolExecutor(max_workers=_executor_workers)
+        return _executor
+
+
+def shutdown():
+    """关闭进程池并删除已发布的地图文件"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        for path in _published.values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        _published.clear()
+
+
+atexit.register(shutdown)
+
+
+def publish_map(grid_map) -> str:
+    """
+    把地图序列化到本地临时文件，同一版本只写一次
+
+    工作进程按版本号从文件加载地图并缓存，地图不需要随每个查询重复传输。
+
+    返回:
+        序列化文件路径
+    """
+    with _executor_lock:
+        path = _published.get(grid_map.version)
+        if path is not None:
+            return path
+
+        # 先计算边代价张量，工作进程加载后即可直接搜索（分块地图没有稠密张量，只传输目录信息）
+        if grid_map.has_edge_costs:
+            grid_map.get_edge_costs()
+        fd, tmp_path = tempfile.mkstemp(prefix="astar_map_", suffix=".pkl")
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(grid_map, f, protocol=pickle.HIGHEST_PROTOCOL)
+        _published[grid_map.version] = tmp_path
+
+        # 清理旧版本的地图文件
+        while len(_published) > _MAX_PUBLISHED_MAPS:
+            oldest = min(_published)
+            try:
+                os.remove(_published.pop(oldest))
+            except OSError:
+                pass
+        return tmp_path
+
+
+def _load_worker_map(map_path: str, version: int):
+    """在工作进程中按版本号加载地图，已加载的版本直接复用"""
+    grid_map = _worker_maps.get(version)
+    if grid_map is None:
+        with open(map_path, 'rb') as f:
+            grid_map = pickle.load(f)
+        if len(_worker_maps) >= _WORKER_MAP_CACHE:
+            _worker_maps.pop(min(_worker_maps))
+        _worker_maps[version] = grid_map
+    return grid_map
+
+
+def solve_queries(grid_map, queries: List[Tuple[int, Tuple[int, int], Tuple[int, int]]],
+                  options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    依次求解一组查询
+
+    参数:
+        grid_map: 栅格地图对象
+        queries: [(请求序号, 起点, 终点), ...]
+        options: algorithm, heuristic, smooth, check_collision, include_explored，
+                 可选的max_nodes、timeout为每个查询的搜索预算
+
+    返回:
+        每个查询的结果字典
+    """
+    results = []
+    for index, start, goal in queries:
+        start_time = time.perf_counter()
+        budget = SearchBudget(options.get("max_nodes", 0), options.get("timeout", 0.0))
+        path, explored, status = run_budgeted_search(grid_map, start, goal, options["algorithm"],
+                                                     options["heuristic"], budget)
+        if path is not None:
+            path = postprocess_path(grid_map, path, options["smooth"], options["check_collision"],
+                                    any_angle=is_any_angle(options["algorithm"], grid_map))
+            path_length, path_cost = compute_path_metrics(grid_map, path)
+        else:
+            path_length, path_cost = 0.0, float('inf')
+        results.append({
+            "index": index,
+            "path": path or [],
+            "explored": explored if options["include_explored"] else [],
+            "path_length": path_length,
+            "path_cost": path_cost,
+            "nodes_explored": len(explored),
+            "computation_time": time.perf_counter() - start_time,
+            "status": status
+        })
+    return results
+
+
+def _solve_chunk(map_path: str, version: int, queries, options) -> List[Dict[str, Any]]:
+    """工作进程入口"""
+    return solve_queries(_load_worker_map(map_path, version), queries, options)
+
+
+def _solve_budgeted(map_path: str, version: int, start, goal, algorithm: str, heuristic: str,
+                    max_nodes: int, timeout: float, collect_stats: bool = False):
+    """工作进程入口：在预算内求解单个查询，返回(路径, 已探索节点, status, 插桩计数器或None)"""
+    budget = SearchBudget(max_nodes, timeout)
+    stats = SearchStats() if collect_stats else None
+    return run_budgeted_search(_load_worker_map(map_path, version), start, goal, algorithm, heuristic,
+                               budget, stats) + (stats,)
+
+
+def submit_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int], algorithm: str, heuristic: str,
+                  budget: SearchBudget, max_workers: Optional[int] = None, collect_stats: bool = False) -> Future:
+    """
+    把单个查询提交到进程池，结果为(路径, 已探索节点, status, 插桩计数器)
+
+    预算的节点数和时间上限在工作进程中生效；工作进程无法感知budget.cancel()，
+    已开始的搜索会运行到结束或预算用尽。collect_stats为False时插桩计数器为None。
+    """
+    executor = get_executor(max_workers)
+    map_path = publish_map(grid_map)
+    return executor.submit(_solve_budgeted, map_path, grid_map.version, start, goal, algorithm, heuristic,
+                           budget.max_nodes, budget.timeout, collect_stats)
+
+
+def submit_batch(grid_map, queries: List[Tuple[Tuple[int, int], Tuple[int, int]]],
+                 options: Dict[str, Any], max_workers: Optional[int] = None) -> List[Future]:
+    """
+    把一批查询分块提交到进程池
+
+    参数:
+        grid_map: 栅格地图对象
+        queries: [(起点, 终点), ...]
+        options: 算法选项，见solve_queries
+        max_workers: 进程池大小，默认为CPU核数
+
+    返回:
+        Future列表，每个Future的结果是一块查询的结果列表
+    """
+    executor = get_executor(max_workers)
+    map_path = publish_map(grid_map)
+    indexed = [(i, start, goal) for i, (start, goal) in enumerate(queries)]
+
+    # 每个进程分到若干块，兼顾负载均衡和提交开销
+    chunk_size = max(1, math.ceil(len(indexed) / (_executor_workers * 4)))
+    return [executor.submit(_solve_chunk, map_path, grid_map.version, indexed[i:i + chunk_size], options)
+            for i in range(0, len(indexed), chunk_size)]
@@ -0,0 +1,137 @@
+from typing import Tuple, Callable
+from astar_path_planning.app.utils.search_engine import (
+    acquire_buffers, release_buffers, make_successor_func, make_predecessor_func, reconstruct_path,
+    current_budget, current_stats, heap_functions, ExploredNodes, INF, STATE_NEW, STATE_OPEN, STATE_CLOSED
+)
+
+
+def _pop_stale(open_heap, state, heappop):
+    """弹出堆顶已扩展过的过期条目"""
+    while open_heap and state[open_heap[0][1]] == STATE_CLOSED:
+        heappop(open_heap)
+
+
+def bidirectional_astar_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int],
+                               heuristic_func: Callable[[Tuple[int, int], Tuple[int, int]], float]):
+    """
+    双向A*搜索算法，同时从起点正向搜索、从终点反向搜索
+
+    反向搜索沿前驱扩展，边代价按"前驱 -> 当前节点"方向计算。
+    两侧使用平均势函数 p(n) = (h(n, goal) - h(start, n)) / 2，正向键值为 g + p，
+    反向键值为 g - p，二者在一致的启发函数下都保持一致性。
+    两侧相遇时记录最优连接代价mu，当两侧open集合最小键值之和不小于mu时停止，
+    此时不存在经过未扩展节点的更短路径。
+    搜索预算用尽时，已找到的连接路径（不一定最优）记录为预算的部分结果。
+
+    参数:
+        grid_map: 栅格地图对象
+        start: 起点坐标(x, y)
+        goal: 终点坐标(x, y)
+        heuristic_func: 启发函数
+
+    返回:
+        如果找到路径，返回(路径, 已探索节点列表)；否则返回(None, 已探索节点列表)
+    """
+    width = grid_map.width
+    size = width * grid_map.height
+    start_idx = start[1] * width + start[0]
+    goal_idx = goal[1] * width + goal[0]
+    if start_idx == goal_idx:
+        return [start], [start]
+
+    successors = make_successor_func(grid_map)
+    predecessors = make_predecessor_func(grid_map)
+    stats = current_stats()
+    heappush, heappop = heap_functions(stats)
+    if stats is not None:
+        successors = stats.count_neighbors(successors)
+        predecessors = stats.count_neighbors(predecessors)
+
+    def forward_h(idx: int) -> float:
+        node = (idx % width, idx // width)
+        return (heuristic_func(node, goal) - heuristic_func(start, node)) * 0.5
+
+    def backward_h(idx: int) -> float:
+        return -forward_h(idx)
+
+    forward = acquire_buffers(size)
+    backward = acquire_buffers(size)
+    explored = []
+    try:
+        for buffers, root in ((forward, start_idx), (backward, goal_idx)):
+            buffers.g_score[root] = 0.0
+            buffers.state[root] = STATE_OPEN
+            buffers.touched.append(root)
+        forward_open = [(forward_h(start_idx), start_idx)]
+        backward_open = [(backward_h(goal_idx), goal_idx)]
+
+        best_cost = INF  # 当前找到的最短连接代价mu
+        meeting = -1
+        budget = current_budget()
+        next_check = budget.next_check(0) if budget is not None else -1
+        interrupted = False
+
+        while True:
+            _pop_stale(forward_open, forward.state, heappop)
+            _pop_stale(backward_open, backward.state, heappop)
+            if not forward_open or not backward_open:
+                break
+            if forward_open[0][0] + backward_open[0][0] >= best_cost:
+                break
+
+            # 优先扩展open集合较小的一侧，使两侧搜索规模保持平衡
+            if len(forward_open) <= len(backward_open):
+                this, other, open_heap, expand, h = forward, backward, forward_open, successors, forward_h
+            else:
+                this, other, open_heap, expand, h = backward, forward, backward_open, predecessors, backward_h
+
+            _, current = heappop(open_heap)
+            g_score, parent, state, touched = this.g_score, this.parent, this.state, this.touched
+            other_g = other.g_score
+            state[current] = STATE_CLOSED
+            explored.append(current)
+
+            current_g = g_score[current]
+            for neighbor, cost in expand(current):
+                if state[neighbor] == STATE_CLOSED:
+                    continue
+
+                tentative_g = current_g + cost
+                if tentative_g < g_score[neighbor]:
+                    if state[neighbor] == STATE_NEW:
+                        state[neighbor] = STATE_OPEN
+                        touched.append(neighbor)
+                    g_score[neighbor] = tentative_g
+                    parent[neighbor] = current
+                    heappush(open_heap, (tentative_g + h(neighbor), neighbor))
+
+                    # 邻居已被另一侧到达，更新最优连接
+                    if tentative_g + other_g[neighbor] < best_cost:
+                        best_cost = tentative_g + other_g[neighbor]
+                        meeting = neighbor
+
+            if len(explored) == next_check:
+                if budget.exhausted(len(explored)):
+                    interrupted = True
+                    break
+                next_check = budget.next_check(len(explored))
+
+        explored_points = ExploredNodes(explored, width)
+        if meeting == -1:
+            return None, explored_points
+
+        # 正向部分：起点 -> 相遇点；反向部分：相遇点 -> 终点
+        path = reconstruct_path(forward.parent, meeting, width)
+        idx = backward.parent[meeting]
+        while idx != -1:
+            path.append((idx % width, idx // width))
+            idx = backward.parent[idx]
+        if interrupted:
+            budget.partial_path = path
+            return None, explored_points
+        return path, explored_points
+    finally:
+        if stats is not None:
+            stats.expansions += len(explored)
+        release_buffers(forward)
+        release_buffers(backward)
@@ -0,0 +1,113 @@
+import heapq
+from typing import List, Tuple, Optional
+import numpy as np
+from astar_path_planning.app.models.grid_map import DIRECTIONS
+from astar_path_planning.app.utils.search_engine import make_predecessor_func, current_budget, INF
+
+# (dx, dy) -> 方向编号，编号与DIRECTIONS的顺序一致
+_DIRECTION_INDEX = {direction: d for d, direction in enumerate(DIRECTIONS)}
+
+
+class CostField:
+    """
+    以某个终点为根的代价场
+
+    cost:      (height, width) float32数组，每个格子到终点的最小代价，不可达为inf
+    direction: (height, width) int8数组，每个格子沿最短路径下一步的方向编号
+               （对应DIRECTIONS），终点和不可达格子为-1
+    """
+
+    def __init__(self, goal: Tuple[int, int], version: int, cost: np.ndarray, direction: np.ndarray):
+        self.goal = goal
+        self.version = version
+        self.cost = cost
+        self.direction = direction
+        self.height, self.width = cost.shape
+
+    def is_reachable(self, x: int, y: int) -> bool:
+        """判断格子是否能到达终点"""
+        return bool(np.isfinite(self.cost[y, x]))
+
+    def path_from(self, start: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        """
+        沿方向场从起点走到终点，耗时只与路径长度有关
+
+        返回:
+            路径坐标列表，起点不可达时返回None
+        """
+        x, y = start
+        if not self.is_reachable(x, y):
+            return None
+        direction = self.direction
+        path = [(x, y)]
+        for _ in range(self.width * self.height):
+            d = int(direction[y, x])
+            if d < 0:
+                return path
+            dx, dy = DIRECTIONS[d]
+            x += dx
+            y += dy
+            path.append((x, y))
+        return None
+
+
+def compute_cost_field(grid_map, goal: Tuple[int, int]) -> Optional[CostField]:
+    """
+    从终点出发反向运行Dijkstra，得到所有格子到终点的代价场
+
+    反向搜索沿前驱扩展，边代价按"前驱 -> 当前节点"方向计算，
+    与get_movement_cost的代价模型一致，因此代价场给出的路径与A*的最优路径代价相同。
+    当前线程激活了搜索预算时按已确定代价的格子数检查预算。
+
+    参数:
+        grid_map: 栅格地图对象
+        goal: 终点坐标(x, y)
+
+    返回:
+        CostField对象；预算用尽时代价场不完整，返回None，原因记录在预算的status中
+    """
+    width, height = grid_map.width, grid_map.height
+    size = width * height
+    predecessors = make_predecessor_func(grid_map)
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    cost = [INF] * size
+    direction = [-1] * size
+    closed = bytearray(size)
+
+    goal_idx = goal[1] * width + goal[0]
+    cost[goal_idx] = 0.0
+    open_heap = [(0.0, goal_idx)]
+    budget = current_budget()
+    next_check = budget.next_check(0) if budget is not None else -1
+    settled = 0
+
+    while open_heap:
+        current_cost, current = heappop(open_heap)
+        if closed[current]:
+            continue
+        closed[current] = 1
+        settled += 1
+        if settled == next_check:
+            if budget.exhausted(settled):
+                return None
+            next_check = budget.next_check(settled)
+
+        cy, cx = divmod(current, width)
+        for pred, step_cost in predecessors(current):
+            if closed[pred]:
+                continue
+            tentative = current_cost + step_cost
+            if tentative < cost[pred]:
+                cost[pred] = tentative
+                py, px = divmod(pred, width)
+                direction[pred] = _DIRECTION_INDEX[(cx - px, cy - py)]
+                heappush(open_heap, (tentative, pred))
+
+    return CostField(
+        goal,
+        grid_map.version,
+        np.array(cost, dtype=np.float32).reshape(height, width),
+        np.array(direction, dtype=np.int8).reshape(height, width)
+    )
@@ -0,0 +1,387 @@
+import heapq
+import threading
+from typing import List, Tuple, Callable, Dict, Set, Optional
+import numpy as np
+from astar_path_planning.app.models.grid_map import DIRECTIONS
+from astar_path_planning.app.utils.search_engine import (
+    make_successor_func, make_predecessor_func, best_first_search, ExploredNodes, INF
+)
+
+# 默认的分块边长（格子数）
+DEFAULT_CLUSTER_SIZE = 16
+# 边界上跨簇边数不少于该值时，在两端各设一个入口
+_LONG_ENTRANCE = 6
+
+
+def _find(parent: Dict[int, int], i: int) -> int:
+    """并查集查找（路径减半）"""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _components(cells: Set[int], width: int) -> Dict[int, int]:
+    """
+    按八邻接把一组可通行格子划分为连通分量
+
+    返回:
+        格子索引 -> 分量代表元
+    """
+    parent = {idx: idx for idx in cells}
+    for idx in cells:
+        y, x = divmod(idx, width)
+        for dx, dy in DIRECTIONS:
+            nx = x + dx
+            if 0 <= nx < width:
+                other = idx + dy * width + dx
+                if other in parent:
+                    root_a, root_b = _find(parent, idx), _find(parent, other)
+                    if root_a != root_b:
+                        parent[root_a] = root_b
+    return {idx: _find(parent, idx) for idx in cells}
+
+
+class HierarchicalPlanner:
+    """
+    分层路径规划器（HPA*）
+
+    地图被划分为若干簇：固定边长的分块，地图带有zones时再按区域细分。
+    相邻簇之间的每段连通边界选出一对入口格子作为抽象节点，并预先计算同一簇内
+    入口之间的最短距离。查询时先在很小的抽象图上搜索，再只在抽象路径经过的簇内
+    做格子级A*细化。
+
+    地图修改后，根据地图记录的修改区域只重算受影响的簇。
+    """
+
+    def __init__(self, grid_map, cluster_size: int = DEFAULT_CLUSTER_SIZE, use_zones: bool = True):
+        """
+        初始化规划器并构建抽象图
+
+        参数:
+            grid_map: 栅格地图对象
+            cluster_size: 分块边长
+            use_zones: 地图带有zones数组时是否按区域细分簇
+        """
+        self.grid_map = grid_map
+        self.cluster_size = cluster_size
+        self.use_zones = use_zones
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def _compute_labels(self) -> np.ndarray:
+        """计算每个格子所属的簇编号"""
+        width, height = self.grid_map.width, self.grid_map.height
+        size = self.cluster_size
+        tiles_x = -(-width // size)
+        tiles_y = -(-height // size)
+        ys, xs = np.indices((height, width))
+        labels = (ys // size) * tiles_x + xs // size
+        zones = getattr(self.grid_map, 'zones', None)
+        if self.use_zones and zones is not None:
+            # 区域编号乘以分块数量，保证(区域, 分块)组合唯一且不随其他格子的区域变化
+            labels = labels + zones.astype(np.int64) * (tiles_x * tiles_y)
+        return labels.astype(np.int64)
+
+    def rebuild(self):
+        """从头构建整个抽象图"""
+        grid_map = self.grid_map
+        self.labels = self._compute_labels()
+        self._label_flat = self.labels.ravel().tolist()
+        # 入口：(簇a, 簇b) -> [(a中的格子, b中的格子), ...]，其中a < b
+        self.entrances: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        self._scan_entrances(0, 0, grid_map.width, grid_map.height, None)
+        self._build_inter_edges()
+        # 簇内边：簇 -> {入口: [(同簇入口, 最短距离), ...]}
+        successors = make_successor_func(grid_map)
+        self.intra: Dict[int, Dict[int, List[Tuple[int, float]]]] = {
+            cluster: self._intra_edges(cluster, nodes, successors) for cluster, nodes in self.cluster_nodes.items()
+        }
+        self.version = grid_map.version
+
+    def _scan_entrances(self, x0: int, y0: int, x1: int, y1: int, clusters: Optional[Set[int]]):
+        """
+        在区域[x0, x1) x [y0, y1)内查找簇之间的入口
+
+        参数:
+            clusters: 只保留涉及这些簇的入口，为None时保留全部
+        """
+        grid_map = self.grid_map
+        width, height = grid_map.width, grid_map.height
+        labels = self.labels
+        sub_labels = labels[y0:y1, x0:x1]
+        sub_mask = grid_map.neighbor_mask[y0:y1, x0:x1]
+        # 障碍物格子也带有邻居掩码，需要单独排除
+        sub_free = ~grid_map.grid[y0:y1, x0:x1]
+        ys, xs = np.mgrid[y0:y1, x0:x1]
+
+        # 收集所有跨簇的边，只保留从编号较小的簇指向编号较大的簇的方向
+        crossings = []
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            passable = ((sub_mask >> d) & 1).astype(bool) & sub_free
+            nx = np.clip(xs + dx, 0, width - 1)
+            ny = np.clip(ys + dy, 0, height - 1)
+            selected = passable & (sub_labels < labels[ny, nx])
+            crossings.append(np.stack([(ys * width + xs)[selected], (ny * width + nx)[selected]], axis=1))
+        crossings = np.concatenate(crossings).tolist()
+
+        label_flat = self._label_flat
+        by_pair: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for p, q in crossings:
+            key = (label_flat[p], label_flat[q])
+            if clusters is not None and key[0] not in clusters and key[1] not in clusters:
+                continue
+            by_pair.setdefault(key, []).append((p, q))
+
+        for key, edges in by_pair.items():
+            # 两侧边界格子各自在簇内连通，每对相邻的边界分量选一条中间的边作为入口，
+            # 较长的边界改为两端各选一条，减少绕行
+            side_a = _components({p for p, _ in edges}, width)
+            side_b = _components({q for _, q in edges}, width)
+            groups: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+            for p, q in edges:
+                groups.setdefault((side_a[p], side_b[q]), []).append((p, q))
+            pairs = []
+            for group in groups.values():
+                group.sort()
+                if len(group) >= _LONG_ENTRANCE:
+                    pairs.extend((group[0], group[-1]))
+                else:
+                    pairs.append(group[len(group) // 2])
+            self.entrances[key] = pairs
+
+    def _build_inter_edges(self):
+        """根据入口生成簇间边，并统计每个簇的入口节点"""
+        width = self.grid_map.width
+        get_movement_cost = self.grid_map.get_movement_cost
+        self.inter: Dict[int, List[Tuple[int, float]]] = {}
+        self.cluster_nodes: Dict[int, Set[int]] = {}
+        for (a, b), pairs in self.entrances.items():
+            for p, q in pairs:
+                py, px = divmod(p, width)
+                qy, qx = divmod(q, width)
+                self.inter.setdefault(p, []).append((q, get_movement_cost(px, py, qx, qy)))
+                self.inter.setdefault(q, []).append((p, get_movement_cost(qx, qy, px, py)))
+                self.cluster_nodes.setdefault(a, set()).add(p)
+                self.cluster_nodes.setdefault(b, set()).add(q)
+
+    @staticmethod
+    def _cluster_dijkstra(source: int, cluster: int, targets: Set[int], expand,
+                          label_flat: List[int]) -> Dict[int, float]:
+        """
+        在簇内从source出发运行Dijkstra，直到所有targets都确定距离
+
+        参数:
+            expand: 后继函数（正向）或前驱函数（反向，得到targets到source的距离）
+            label_flat: 按一维索引排列的簇编号
+
+        返回:
+            可达的目标 -> 距离
+        """
+        dist = {source: 0.0}
+        closed = set()
+        found = {}
+        remaining = len(targets)
+        open_heap = [(0.0, source)]
+        while open_heap and remaining:
+            current_dist, current = heapq.heappop(open_heap)
+            if current in closed:
+                continue
+            closed.add(current)
+            if current in targets:
+                found[current] = current_dist
+                remaining -= 1
+            for neighbor, cost in expand(current):
+                if label_flat[neighbor] != cluster or neighbor in closed:
+                    continue
+                tentative = current_dist + cost
+                if tentative < dist.get(neighbor, INF):
+                    dist[neighbor] = tentative
+                    heapq.heappush(open_heap, (tentative, neighbor))
+        return found
+
+    def _intra_edges(self, cluster: int, nodes: Set[int], successors) -> Dict[int, List[Tuple[int, float]]]:
+        """计算簇内每对入口之间的最短距离"""
+        edges = {}
+        for node in nodes:
+            distances = self._cluster_dijkstra(node, cluster, nodes - {node}, successors, self._label_flat)
+            edges[node] = list(distances.items())
+        return edges
+
+    def update(self):
+        """
+        根据地图的修改记录，只重算受影响的簇
+
+        labels、_label_flat、cluster_nodes、inter、intra都换成新对象而不原地修改，
+        已取得旧对象引用的搜索（见search）不受影响。
+        """
+        grid_map = self.grid_map
+        regions = grid_map.dirty_regions_since(self.version)
+        if regions is None:
+            self.rebuild()
+            return
+        if not regions:
+            return
+
+        width, height = grid_map.width, grid_map.height
+        old_labels = self.labels
+        self.labels = self._compute_labels()
+        self._label_flat = self.labels.ravel().tolist()
+
+        # 修改区域外扩一格：格子的可通行性变化会影响相邻格子的边
+        touched = set()
+        for x0, y0, x1, y1 in regions:
+            window = (slice(max(y0 - 1, 0), min(y1 + 1, height)), slice(max(x0 - 1, 0), min(x1 + 1, width)))
+            touched.update(np.unique(old_labels[window]).tolist())
+            touched.update(np.unique(self.labels[window]).tolist())
+
+        # 受影响簇的所有入口都在这些簇的包围盒外扩一格的范围内
+        ys, xs = np.nonzero(np.isin(self.labels, list(touched)))
+        old_nodes = self.cluster_nodes
+        self.entrances = {key: pairs for key, pairs in self.entrances.items()
+                          if key[0] not in touched and key[1] not in touched}
+        if len(ys):
+            self._scan_entrances(max(int(xs.min()) - 1, 0), max(int(ys.min()) - 1, 0),
+                                 min(int(xs.max()) + 2, width), min(int(ys.max()) + 2, height), touched)
+        self._build_inter_edges()
+
+        # 受影响的簇，以及入口集合因此发生变化的相邻簇，需要重算簇内边
+        successors = make_successor_func(grid_map)
+        intra = dict(self.intra)
+        for cluster in set(old_nodes) | set(self.cluster_nodes):
+            nodes = self.cluster_nodes.get(cluster)
+            if nodes is None:
+                intra.pop(cluster, None)
+            elif cluster in touched or nodes != old_nodes.get(cluster):
+                intra[cluster] = self._intra_edges(cluster, nodes, successors)
+        self.intra = intra
+        self.version = grid_map.version
+
+    def search(self, start: Tuple[int, int], goal: Tuple[int, int],
+               heuristic_func: Callable[[Tuple[int, int], Tuple[int, int]], float], grid_map=None):
+        """
+        先在抽象图上搜索，再在经过的簇内细化为格子路径
+
+        参数:
+            grid_map: 同一张地图的另一个快照，不为None时先把抽象图同步到该快照
+
+        返回:
+            如果找到路径，返回(路径, 已探索节点列表)；否则返回(None, 已探索节点列表)
+        """
+        # 锁只保护抽象图的同步；取得各部分的引用后在锁外搜索，update()不会原地修改它们
+        with self._lock:
+            stale = grid_map is not None and grid_map is not self.grid_map and grid_map.version < self.version
+            if not stale:
+                if grid_map is not None:
+                    self.grid_map = grid_map
+                self.update()
+                grid_map = self.grid_map
+                label_flat, cluster_nodes, inter, intra = self._label_flat, self.cluster_nodes, self.inter, self.intra
+        if stale:
+            # 比抽象图更旧的快照：单独构建，不把共享的抽象图退回旧版本
+            planner = HierarchicalPlanner(grid_map, self.cluster_size, self.use_zones)
+            return planner.search(start, goal, heuristic_func)
+
+        width = grid_map.width
+        start_idx = start[1] * width + start[0]
+        goal_idx = goal[1] * width + goal[0]
+        if start_idx == goal_idx:
+            return [start], [start]
+
+        successors = make_successor_func(grid_map)
+        start_cluster = label_flat[start_idx]
+        goal_cluster = label_flat[goal_idx]
+
+        # 把起点和终点临时接入抽象图
+        start_targets = set(cluster_nodes.get(start_cluster, ()))
+        if goal_cluster == start_cluster:
+            start_targets.add(goal_idx)
+        start_edges = self._cluster_dijkstra(start_idx, start_cluster, start_targets, successors, label_flat)
+        goal_edges = self._cluster_dijkstra(goal_idx, goal_cluster, set(cluster_nodes.get(goal_cluster, ())),
+                                            make_predecessor_func(grid_map), label_flat)
+
+        def neighbors(node: int) -> List[Tuple[int, float]]:
+            if node == start_idx:
+                edges = list(start_edges.items())
+            else:
+                edges = list(intra.get(label_flat[node], {}).get(node, ()))
+            edges.extend(inter.get(node, ()))
+            if node in goal_edges:
+                edges.append((goal_idx, goal_edges[node]))
+            return edges
+
+        def h(idx: int) -> float:
+            return heuristic_func((idx % width, idx // width), goal)
+
+        # 抽象图上的A*
+        g_score = {start_idx: 0.0}
+        parent = {start_idx: -1}
+        closed = set()
+        open_heap = [(h(start_idx), start_idx)]
+        abstract_explored = []
+        while open_heap:
+            _, current = heapq.heappop(open_heap)
+            if current in closed:
+                continue
+            closed.add(current)
+            abstract_explored.append(current)
+            if current == goal_idx:
+                break
+            for neighbor, cost in neighbors(current):
+                tentative = g_score[current] + cost
+                if neighbor not in closed and tentative < g_score.get(neighbor, INF):
+                    g_score[neighbor] = tentative
+                    parent[neighbor] = current
+                    heapq.heappush(open_heap, (tentative + h(neighbor), neighbor))
+
+        if goal_idx not in closed:
+            return None, ExploredNodes(abstract_explored, width)
+
+        # 只在抽象路径经过的簇内做格子级搜索
+        corridor = set()
+        node = goal_idx
+        while node != -1:
+            corridor.add(label_flat[node])
+            node = parent[node]
+
+        def corridor_successors(idx: int) -> List[Tuple[int, float]]:
+            return [(n, c) for n, c in successors(idx) if label_flat[n] in corridor]
+
+        path, explored = best_first_search(grid_map, start, goal, lambda x, y: heuristic_func((x, y), goal),
+                                           successors=corridor_successors)
+        return path, ExploredNodes(abstract_explored, width) + explored
+
+
+_planners_lock = threading.Lock()
+
+
+def get_planner(grid_map) -> HierarchicalPlanner:
+    """
+    获取（必要时创建）地图对应的分层规划器
+
+    规划器保存在地图的derived_state()中，同一张地图的所有快照共用一个，
+    地图对象被释放后随之释放。
+    """
+    with _planners_lock:
+        state = grid_map.derived_state()
+        planner = state.get("hpa")
+        if planner is None:
+            planner = state["hpa"] = HierarchicalPlanner(grid_map)
+        return planner
+
+
+def hierarchical_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int],
+                        heuristic_func: Callable[[Tuple[int, int], Tuple[int, int]], float]):
+    """
+    分层A*搜索，抽象图按地图缓存，地图修改后只重算受影响的簇
+
+    参数:
+        grid_map: 栅格地图对象
+        start: 起点坐标(x, y)
+        goal: 终点坐标(x, y)
+        heuristic_func: 启发函数
+
+    返回:
+        如果找到路径，返回(路径, 已探索节点列表)；否则返回(None, 已探索节点列表)
+    """
+    return get_planner(grid_map).search(start, goal, heuristic_func, grid_map)
@@ -0,0 +1,206 @@
+import heapq
+import threading
+import time
+from typing import List, Tuple, Callable, Iterable, Optional
+from astar_path_planning.app.models.grid_map import DIRECTIONS
+from astar_path_planning.app.utils.search_engine import (
+    make_successor_func, make_predecessor_func, current_budget, ExploredNodes, INF
+)
+
+
+class LPAStarPlanner:
+    """
+    增量式路径规划器（LPA*，即起点固定时的D* Lite）
+
+    规划器在多次调用之间保留每个格子的g值和rhs值。地图局部修改后，
+    只需把变化的格子告诉规划器，它会只修复受影响的那部分搜索树，
+    而不是从头重新搜索。
+
+    g(s):   当前认定的起点到s的代价
+    rhs(s): 根据前驱的g值一步前瞻得到的代价，g != rhs 的节点为"不一致"节点，需要重新处理
+
+    规划器在多个请求之间共享，规划和重新规划应持有lock。
+    """
+
+    def __init__(self, grid_map, start: Tuple[int, int], goal: Tuple[int, int],
+                 heuristic_func: Callable[[Tuple[int, int], Tuple[int, int]], float]):
+        """
+        初始化规划器
+
+        参数:
+            grid_map: 栅格地图对象
+            start: 起点坐标(x, y)
+            goal: 终点坐标(x, y)
+            heuristic_func: 启发函数（需要满足一致性）
+        """
+        self.start = start
+        self.goal = goal
+        self.heuristic_func = heuristic_func
+        self.created_at = time.time()
+        self.lock = threading.Lock()
+        self.reset(grid_map)
+
+    def reset(self, grid_map):
+        """丢弃所有搜索状态，在grid_map上重新开始"""
+        self.grid_map = grid_map
+        self.map_version = grid_map.version  # 规划器已同步到的地图版本
+        self.width = grid_map.width
+        size = grid_map.width * grid_map.height
+        self.g = [INF] * size
+        self.rhs = [INF] * size
+        self.start_idx = self.start[1] * self.width + self.start[0]
+        self.goal_idx = self.goal[1] * self.width + self.goal[0]
+        self.rhs[self.start_idx] = 0.0
+        self.open_heap = [(self._calculate_key(self.start_idx), self.start_idx)]
+
+    def _h(self, idx: int) -> float:
+        return self.heuristic_func((idx % self.width, idx // self.width), self.goal)
+
+    def _calculate_key(self, idx: int) -> Tuple[float, float]:
+        k2 = min(self.g[idx], self.rhs[idx])
+        return (k2 + self._h(idx), k2)
+
+    def _update_vertex(self, idx: int, predecessors):
+        """根据前驱重新计算rhs，不一致时放入open集合"""
+        if idx != self.start_idx:
+            g = self.g
+            best = INF
+            for pred, cost in predecessors(idx):
+                candidate = g[pred] + cost
+                if candidate < best:
+                    best = candidate
+            self.rhs[idx] = best
+        if self.g[idx] != self.rhs[idx]:
+            heapq.heappush(self.open_heap, (self._calculate_key(idx), idx))
+
+    def _top_key(self):
+        """清理堆顶的过期条目，返回有效的最小键值；open集合为空时返回None"""
+        open_heap = self.open_heap
+        while open_heap:
+            key, idx = open_heap[0]
+            if self.g[idx] == self.rhs[idx]:
+                heapq.heappop(open_heap)  # 节点已一致，不再属于open集合
+                continue
+            current_key = self._calculate_key(idx)
+            if current_key != key:
+                heapq.heapreplace(open_heap, (current_key, idx))
+                continue
+            return key
+        return None
+
+    def update_cells(self, cells: Iterable[Tuple[int, int]]):
+        """
+        通知规划器这些格子发生了变化（障碍物或代价）
+
+        以变化格子为终点的边和以它为起点的边都可能改变，
+        因此需要更新格子本身及其八个邻居的rhs值。
+        """
+        predecessors = make_predecessor_func(self.grid_map)
+        width, height = self.grid_map.width, self.grid_map.height
+        affected = set()
+        for x, y in cells:
+            for dx, dy in DIRECTIONS + [(0, 0)]:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    affected.add(ny * width + nx)
+        for idx in affected:
+            self._update_vertex(idx, predecessors)
+
+    def compute_shortest_path(self):
+        """
+        处理不一致节点，直到终点的代价确定
+
+        当前线程激活了搜索预算时按预算检查，预算用尽时提前结束并返回None路径，原因记录在预算的status中；
+        尚未处理的不一致节点保留在open集合中，下次调用时继续处理。
+
+        返回:
+            (路径, 本次处理过的节点列表)，不可达时路径为None
+        """
+        successors = make_successor_func(self.grid_map)
+        predecessors = make_predecessor_func(self.grid_map)
+        g, rhs = self.g, self.rhs
+        goal_idx = self.goal_idx
+        width = self.width
+        explored = []
+        budget = current_budget()
+        next_check = budget.next_check(0) if budget is not None else -1
+
+        while True:
+            top_key = self._top_key()
+            if top_key is None:
+                break
+            if top_key >= self._calculate_key(goal_idx) and g[goal_idx] == rhs[goal_idx]:
+                break
+
+            _, current = heapq.heappop(self.open_heap)
+            explored.append(current)
+            if g[current] > rhs[current]:
+                # 过一致：代价降低，直接放宽后继的rhs
+                g[current] = rhs[current]
+                current_g = g[current]
+                for neighbor, cost in successors(current):
+                    if current_g + cost < rhs[neighbor] and neighbor != self.start_idx:
+                        rhs[neighbor] = current_g + cost
+                        heapq.heappush(self.open_heap, (self._calculate_key(neighbor), neighbor))
+            else:
+                # 欠一致：代价升高，重新计算自身和后继的rhs
+                g[current] = INF
+                self._update_vertex(current, predecessors)
+                for neighbor, _ in successors(current):
+                    self._update_vertex(neighbor, predecessors)
+
+            if len(explored) == next_check:
+                if budget.exhausted(len(explored)):
+                    return None, ExploredNodes(explored, width)
+                next_check = budget.next_check(len(explored))
+
+        return self.extract_path(predecessors), ExploredNodes(explored, width)
+
+    def extract_path(self, predecessors=None) -> Optional[List[Tuple[int, int]]]:
+        """从终点沿使 g(前驱) + c(前驱, 当前) 最小的前驱回溯到起点"""
+        if self.g[self.goal_idx] == INF:
+            return None
+        if predecessors is None:
+            predecessors = make_predecessor_func(self.grid_map)
+
+        width = self.width
+        g = self.g
+        path = [self.goal]
+        idx = self.goal_idx
+        for _ in range(len(g)):
+            if idx == self.start_idx:
+                path.reverse()
+                return path
+            best, best_cost = -1, INF
+            for pred, cost in predecessors(idx):
+                if g[pred] + cost < best_cost:
+                    best, best_cost = pred, g[pred] + cost
+            if best == -1:
+                return None
+            idx = best
+            path.append((idx % width, idx // width))
+        return None
+
+    def replan(self, changed_cells: Optional[Iterable[Tuple[int, int]]] = None):
+        """
+        根据变化的格子修复搜索树并返回新路径
+
+        参数:
+            changed_cells: 自上次规划以来发生变化的格子坐标；为None时
+                           根据地图记录的修改区域自动确定
+
+        返回:
+            (路径, 本次处理过的节点列表)，不可达时路径为None
+        """
+        if changed_cells is None:
+            regions = self.grid_map.dirty_regions_since(self.map_version)
+            if regions is None:
+                # 修改记录已丢失，只能从头规划
+                self.reset(self.grid_map)
+                changed_cells = ()
+            else:
+                changed_cells = {(x, y) for x0, y0, x1, y1 in regions
+                                 for y in range(y0, y1) for x in range(x0, x1)}
+        self.update_cells(changed_cells)
+        self.map_version = self.grid_map.version
+        return self.compute_shortest_path()
@@ -0,0 +1,203 @@
+import math
+from typing import List, Tuple, Callable
+from astar_path_planning.app.utils.search_engine import (
+    acquire_buffers, release_buffers, current_budget, current_stats, heap_functions,
+    STATE_NEW, STATE_OPEN, STATE_CLOSED
+)
+
+SQRT2 = math.sqrt(2)
+
+
+def _sign(v: int) -> int:
+    return (v > 0) - (v < 0)
+
+
+def _expand_jump_path(jump_points: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """把跳点序列展开为相邻格子组成的完整路径"""
+    path = [jump_points[0]]
+    for (x2, y2) in jump_points[1:]:
+        x, y = path[-1]
+        dx, dy = _sign(x2 - x), _sign(y2 - y)
+        while (x, y) != (x2, y2):
+            x += dx
+            y += dy
+            path.append((x, y))
+    return path
+
+
+def jump_point_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int],
+                      heuristic_func: Callable[[Tuple[int, int], Tuple[int, int]], float]):
+    """
+    跳点搜索(Jump Point Search)算法，仅适用于所有可通行格子代价一致的地图
+
+    对称路径上的中间节点会被跳过，只有跳点进入open集合，
+    因此在开阔区域中扩展的节点数远少于A*，而路径代价相同。
+    邻居模型与GridMap.get_neighbors一致：八方向移动，对角移动不要求两侧格子可通行。
+
+    参数:
+        grid_map: 栅格地图对象
+        start: 起点坐标(x, y)
+        goal: 终点坐标(x, y)
+        heuristic_func: 启发函数
+
+    返回:
+        如果找到路径，返回(路径, 已扩展的跳点列表)；否则返回(None, 已扩展的跳点列表)
+
+    异常:
+        ValueError: 地图的地形代价不一致
+    """
+    if not grid_map.has_uniform_cost():
+        raise ValueError("跳点搜索要求所有可通行格子的代价一致")
+
+    width, height = grid_map.width, grid_map.height
+    # 在地图四周加一圈障碍物，省去边界判断
+    stride = width + 2
+    blocked = [True] * (stride * (height + 2))
+    grid_rows = grid_map.grid.tolist()
+    for y in range(height):
+        offset = (y + 1) * stride + 1
+        blocked[offset:offset + width] = grid_rows[y]
+
+    def to_index(x: int, y: int) -> int:
+        return (y + 1) * stride + x + 1
+
+    def to_point(p: int) -> Tuple[int, int]:
+        y, x = divmod(p, stride)
+        return x - 1, y - 1
+
+    start_idx = to_index(*start)
+    goal_idx = to_index(*goal)
+
+    def jump_straight(p: int, step: int, side: int) -> int:
+        """沿水平或竖直方向跳跃，side为垂直方向的偏移，返回跳点索引或-1"""
+        while True:
+            p += step
+            if blocked[p]:
+                return -1
+            if p == goal_idx:
+                return p
+            # 侧面是障碍物而斜前方可通行时，出现强制邻居
+            if (blocked[p + side] and not blocked[p + side + step]) or \
+               (blocked[p - side] and not blocked[p - side + step]):
+                return p
+
+    def jump_diagonal(p: int, dx: int, dy: int) -> int:
+        """沿对角方向跳跃，返回跳点索引或-1"""
+        step_x = dx
+        step_y = dy * stride
+        step = step_x + step_y
+        while True:
+            p += step
+            if blocked[p]:
+                return -1
+            if p == goal_idx:
+                return p
+            if (blocked[p - step_x] and not blocked[p - step_x + step_y]) or \
+               (blocked[p - step_y] and not blocked[p + step_x - step_y]):
+                return p
+            # 水平或竖直方向上能找到跳点，则当前节点也是跳点
+            if jump_straight(p, step_x, stride) != -1 or jump_straight(p, step_y, 1) != -1:
+                return p
+
+    def pruned_directions(p: int, parent_p: int) -> List[Tuple[int, int]]:
+        """根据来向裁剪需要继续搜索的方向"""
+        if parent_p == -1:
+            return [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                    if (dx or dy) and not blocked[p + dx + dy * stride]]
+
+        x, y = to_point(p)
+        px, py = to_point(parent_p)
+        dx, dy = _sign(x - px), _sign(y - py)
+        directions = []
+        if dx and dy:
+            if not blocked[p + dy * stride]:
+                directions.append((0, dy))
+            if not blocked[p + dx]:
+                directions.append((dx, 0))
+            if not blocked[p + dx + dy * stride]:
+                directions.append((dx, dy))
+            if blocked[p - dx] and not blocked[p - dx + dy * stride]:
+                directions.append((-dx, dy))
+            if blocked[p - dy * stride] and not blocked[p + dx - dy * stride]:
+                directions.append((dx, -dy))
+        elif dx:
+            if not blocked[p + dx]:
+                directions.append((dx, 0))
+            for side in (1, -1):
+                if blocked[p + side * stride] and not blocked[p + dx + side * stride]:
+                    directions.append((dx, side))
+        else:
+            if not blocked[p + dy * stride]:
+                directions.append((0, dy))
+            for side in (1, -1):
+                if blocked[p + side] and not blocked[p + side + dy * stride]:
+                    directions.append((side, dy))
+        return directions
+
+    stats = current_stats()
+    heappush, heappop = heap_functions(stats)
+    buffers = acquire_buffers(len(blocked))
+    explored = []
+    try:
+        g_score = buffers.g_score
+        parent = buffers.parent
+        state = buffers.state
+        touched = buffers.touched
+
+        g_score[start_idx] = 0.0
+        state[start_idx] = STATE_OPEN
+        touched.append(start_idx)
+        open_heap = [(heuristic_func(start, goal), start_idx)]
+        budget = current_budget()
+        next_check = budget.next_check(0) if budget is not None else -1
+
+        while open_heap:
+            _, current = heappop(open_heap)
+            if state[current] == STATE_CLOSED:
+                continue
+            state[current] = STATE_CLOSED
+            explored.append(current)
+
+            if current == goal_idx:
+                jump_points = []
+                p = current
+                while p != -1:
+                    jump_points.append(to_point(p))
+                    p = parent[p]
+                jump_points.reverse()
+                return _expand_jump_path(jump_points), [to_point(p) for p in explored]
+
+            current_g = g_score[current]
+            for dx, dy in pruned_directions(current, parent[current]):
+                if dx and dy:
+                    jump = jump_diagonal(current, dx, dy)
+                elif dx:
+                    jump = jump_straight(current, dx, stride)
+                else:
+                    jump = jump_straight(current, dy * stride, 1)
+                if jump == -1 or state[jump] == STATE_CLOSED:
+                    continue
+
+                # 跳点与当前节点位于同一直线或对角线上，用八方向距离计算代价
+                jx, jy = to_point(jump)
+                cx, cy = to_point(current)
+                ddx, ddy = abs(jx - cx), abs(jy - cy)
+                tentative_g = current_g + max(ddx, ddy) + (SQRT2 - 1) * min(ddx, ddy)
+                if tentative_g < g_score[jump]:
+                    if state[jump] == STATE_NEW:
+                        state[jump] = STATE_OPEN
+                        touched.append(jump)
+                    g_score[jump] = tentative_g
+                    parent[jump] = current
+                    heappush(open_heap, (tentative_g + heuristic_func((jx, jy), goal), jump))
+
+            if len(explored) == next_check:
+                if budget.exhausted(len(explored)):
+                    break
+                next_check = budget.next_check(len(explored))
+
+        return None, [to_point(p) for p in explored]
+    finally:
+        if stats is not None:
+            stats.expansions += len(explored)
+        release_buffers(buffers)
@@ -0,0 +1,296 @@
+import heapq
+import math
+import threading
+from typing import List, Optional, Tuple
+import numpy as np
+from astar_path_planning.app.utils.astar import euclidean_distance
+from astar_path_planning.app.utils.search_engine import make_successor_func, make_predecessor_func, INF
+
+# 默认的地标数量
+DEFAULT_LANDMARKS = 8
+# 每条地图谱系最多保留的地图版本数（较旧的快照和最新地图可能同时在使用）
+_MAX_CACHED_VERSIONS = 2
+
+
+def _dijkstra(size: int, source: int, neighbors) -> np.ndarray:
+    """
+    从source出发运行Dijkstra
+
+    参数:
+        size: 格子总数
+        source: 起点的一维索引
+        neighbors: 邻居函数，make_successor_func得到正向距离，make_predecessor_func得到到source的距离
+
+    返回:
+        长度为size的float64数组，不可达为inf
+    """
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+    dist = [INF] * size
+    closed = bytearray(size)
+    dist[source] = 0.0
+    open_heap = [(0.0, source)]
+    while open_heap:
+        current_dist, current = heappop(open_heap)
+        if closed[current]:
+            continue
+        closed[current] = 1
+        for neighbor, cost in neighbors(current):
+            if closed[neighbor]:
+                continue
+            tentative = current_dist + cost
+            if tentative < dist[neighbor]:
+                dist[neighbor] = tentative
+                heappush(open_heap, (tentative, neighbor))
+    return np.array(dist, dtype=np.float64)
+
+
+class LandmarkTables:
+    """
+    ALT（A*, Landmarks, Triangle inequality）启发函数的预处理结果
+
+    forward[k, v]为地标k到格子v的最短距离，backward[k, v]为格子v到地标k的最短距离。
+    由三角不等式，任意两点u、w之间的最短距离满足
+        d(u, w) >= forward[k, w] - forward[k, u]
+        d(u, w) >= backward[k, u] - backward[k, w]
+    对所有地标取最大值即为可采纳且一致的下界。移动代价只取决于目标格子，一般不对称，
+    所以两个方向分别计算；地形代价均匀时两者相同，只计算一次。
+    地标离两点都很远时这个下界可能比几何距离还松，因此再与"八方向距离 * 最小地形代价"取最大值。
+    """
+
+    def __init__(self, width: int, height: int, version: int, landmarks: List[int],
+                 forward: np.ndarray, backward: np.ndarray, min_cost: float = 0.0):
+        self.width = width
+        self.height = height
+        self.version = version
+        self.landmarks = landmarks
+        self.forward = forward
+        self.backward = backward
+        self.min_cost = min_cost
+        ys, xs = np.divmod(np.arange(width * height), width)
+        self._xs = xs
+        self._ys = ys
+
+    @property
+    def nbytes(self) -> int:
+        if self.backward is self.forward:
+            return self.forward.nbytes
+        return self.forward.nbytes + self.backward.nbytes
+
+    @staticmethod
+    def _combine(*bounds: np.ndarray) -> List[float]:
+        """
+        对各地标的下界取最大值
+
+        两个距离都为inf（格子和终点都与地标不连通）时得到nan，这样的地标不提供信息；
+        结果为inf表示两点之间不连通。
+        """
+        with np.errstate(invalid='ignore'):
+            value = np.fmax.reduce(np.concatenate(bounds), axis=0)
+        value = np.where(np.isnan(value) | (value < 0), 0.0, value)
+        return value.tolist()
+
+    def _geometric(self, idx: int) -> np.ndarray:
+        """所有格子与idx之间的八方向距离乘以最小地形代价，形状为(1, 格子数)"""
+        dx = np.abs(self._xs - idx % self.width)
+        dy = np.abs(self._ys - idx // self.width)
+        octile = np.maximum(dx, dy) + (math.sqrt(2) - 1) * np.minimum(dx, dy)
+        return (octile * self.min_cost)[np.newaxis]
+
+    def bounds_to(self, goal: int) -> List[float]:
+        """所有格子到goal的最短距离下界，按一维索引排列"""
+        with np.errstate(invalid='ignore'):
+            return self._combine(self.forward[:, goal:goal + 1] - self.forward,
+                                 self.backward - self.backward[:, goal:goal + 1],
+                                 self._geometric(goal))
+
+    def bounds_from(self, source: int) -> List[float]:
+        """source到所有格子的最短距离下界，按一维索引排列"""
+        with np.errstate(invalid='ignore'):
+            return self._combine(self.forward - self.forward[:, source:source + 1],
+                                 self.backward[:, source:source + 1] - self.backward,
+                                 self._geometric(source))
+
+
+def build_landmarks(grid_map, count: int = DEFAULT_LANDMARKS, seed: int = 0) -> Optional[LandmarkTables]:
+    """
+    选取地标并计算距离表
+
+    第一个地标是离一个随机可通行格子最远的格子，之后每次选取到已选地标的最短距离中
+    最小值最大的格子（与所有已选地标都不连通的格子优先，使每个连通区域都有地标）。
+    选取所用的距离就是距离表本身，不需要额外的搜索。
+
+    参数:
+        grid_map: 栅格地图对象
+        count: 地标数量
+        seed: 选取第一个地标的随机种子
+
+    返回:
+        LandmarkTables，地图上没有可通行格子时返回None
+    """
+    width, height = grid_map.width, grid_map.height
+    size = width * height
+    free = ~np.asarray(grid_map.grid).reshape(-1)
+    free_cells = np.flatnonzero(free)
+    if len(free_cells) == 0:
+        return None
+
+    successors = make_successor_func(grid_map)
+    # 代价均匀时移动代价对称，到地标的距离与从地标出发的距离相同
+    symmetric = grid_map.has_uniform_cost()
+    predecessors = None if symmetric else make_predecessor_func(grid_map)
+
+    rng = np.random.default_rng(seed)
+    origin = int(free_cells[rng.integers(len(free_cells))])
+    ys, xs = np.divmod(free_cells, width)
+    ox, oy = origin % width, origin // width
+    first = int(free_cells[np.argmax((xs - ox) ** 2 + (ys - oy) ** 2)])
+
+    landmarks = []
+    forward_rows, backward_rows = [], []
+    nearest = np.full(size, INF)  # 每个格子到已选地标的最小距离
+    candidate = first
+    for _ in range(min(count, len(free_cells))):
+        landmarks.append(candidate)
+        row = _dijkstra(size, candidate, successors)
+        forward_rows.append(row)
+        if not symmetric:
+            backward_rows.append(_dijkstra(size, candidate, predecessors))
+        np.minimum(nearest, row, out=nearest)
+
+        # 已选地标和障碍物不再参与选取；与所有地标都不连通的格子距离为inf，最先被选中
+        score = np.where(free, nearest, -1.0)
+        score[landmarks] = -1.0
+        candidate = int(np.argmax(score))
+        if score[candidate] <= 0:
+            break
+
+    forward = np.vstack(forward_rows)
+    backward = forward if symmetric else np.vstack(backward_rows)
+    # 每一步的代价不小于步长乘以目标格子的地形代价，可通行格子的最小代价给出几何下界
+    min_cost = float(np.asarray(grid_map.cost_map).reshape(-1)[free].min())
+    return LandmarkTables(width, height, grid_map.version, landmarks, forward, backward, min_cost)
+
+
+class _LandmarkCache:
+    """
+    一张地图（及其所有快照）的地标距离表缓存
+
+    距离表在后台线程中计算，不占用请求的搜索预算，也不随客户端断开而中止。
+    同一时间只有一个计算在进行；计算期间有新的请求时只保留最新版本的那个，当前计算结束后接着计算。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}  # (地图版本, 地标数量) -> LandmarkTables，没有可通行格子时为None
+        self.pending = None  # 等待计算的(地图快照, 地标数量)
+        self.building = False
+
+    def request(self, grid_map, count: int) -> Tuple[Optional[LandmarkTables], bool]:
+        """
+        返回:
+            (距离表, 是否已计算)；尚未计算时安排后台计算并返回(None, False)
+        """
+        key = (grid_map.version, count)
+        with self.lock:
+            if key in self.tables:
+                return self.tables[key], True
+            # 较旧的快照不覆盖已在等待的较新版本
+            if self.pending is None or self.pending[0].version <= grid_map.version:
+                self.pending = (grid_map, count)
+            if not self.building:
+                self.building = True
+                threading.Thread(target=self._run, name="astar-landmarks", daemon=True).start()
+        return None, False
+
+    def _run(self):
+        """后台线程：依次计算等待中的距离表，直到没有新的请求"""
+        try:
+            while True:
+                with self.lock:
+                    if self.pending is None:
+                        self.building = False
+                        return
+                    grid_map, count = self.pending
+                    self.pending = None
+                    key = (grid_map.version, count)
+                    if key in self.tables:
+                        continue
+                tables = build_landmarks(grid_map, count)
+                with self.lock:
+                    self.tables[key] = tables
+                    while len(self.tables) > _MAX_CACHED_VERSIONS:
+                        del self.tables[min(self.tables)]
+        except BaseException:
+            with self.lock:
+                self.building = False
+            raise
+
+
+_landmarks_lock = threading.Lock()
+
+
+def get_landmarks(grid_map, count: int = DEFAULT_LANDMARKS) -> Optional[LandmarkTables]:
+    """
+    获取地图当前版本的地标距离表
+
+    距离表按地图版本保存在derived_state()中，同一版本的所有快照共用；
+    地图修改后距离不再是下界，需要对新版本重新计算。计算需要对每个地标运行整图Dijkstra，
+    在后台进行（见_LandmarkCache），不计入调用方的搜索预算。
+
+    返回:
+        LandmarkTables；距离表尚未算好或地图上没有可通行格子时返回None
+    """
+    with _landmarks_lock:
+        state = grid_map.derived_state()
+        cache = state.get("alt")
+        if cache is None:
+            cache = state["alt"] = _LandmarkCache()
+    tables, _ = cache.request(grid_map, count)
+    return tables
+
+
+class LandmarkHeuristic:
+    """
+    基于地标距离表的启发函数h(p1, p2)
+
+    每次搜索创建一个实例。第一次以某个终点调用时，用NumPy对所有地标取最大值，
+    一次求出所有格子到该终点的下界，之后每次调用只是一次列表查找。
+    双向A*还会以固定的起点调用h(start, node)，同样整体求出一次。
+    """
+
+    def __init__(self, tables: LandmarkTables):
+        self.tables = tables
+        self.width = tables.width
+        self._target: Optional[Tuple[int, int]] = None
+        self._to: List[float] = []
+        self._source: Optional[Tuple[int, int]] = None
+        self._from: List[float] = []
+
+    def __call__(self, p1: Tuple[int, int], p2: Tuple[int, int]) -> float:
+        if p2 == self._target:
+            return self._to[p1[1] * self.width + p1[0]]
+        if p1 == self._source:
+            return self._from[p2[1] * self.width + p2[0]]
+        if self._target is not None and self._source is None:
+            # 终点已确定而起点固定、终点变化（双向A*的反向势函数）
+            self._source = p1
+            self._from = self.tables.bounds_from(p1[1] * self.width + p1[0])
+            return self._from[p2[1] * self.width + p2[0]]
+        self._target = p2
+        self._to = self.tables.bounds_to(p2[1] * self.width + p2[0])
+        return self._to[p1[1] * self.width + p1[0]]
+
+
+def landmark_heuristic(grid_map, count: int = DEFAULT_LANDMARKS):
+    """
+    构造地图的ALT启发函数，地标距离表按地图版本缓存
+
+    返回:
+        启发函数h(p1, p2)；距离表还在后台计算（地图刚创建或刚修改）或地图上没有可通行格子时
+        返回欧几里得距离
+    """
+    tables = get_landmarks(grid_map, count)
+    if tables is None:
+        return euclidean_distance
+    return LandmarkHeuristic(tables)
@@ -0,0 +1,158 @@
+import json
+import struct
+import zlib
+from typing import Dict, Any, Iterator, Optional
+import numpy as np
+from astar_path_planning.app.models.grid_map import TerrainMap
+
+# 二进制地图格式的媒体类型，也可通过Accept请求头选择该格式
+MAP_MEDIA_TYPE = "application/x-astar-map"
+
+MAGIC = b"AMAP"
+FORMAT_VERSION = 1
+
+# 数据段：(名称, 元素类型)，按此顺序依次存放
+#   obstacles: 障碍物位图，按 y*width+x 顺序，每字节8个格子，低位在前
+#   terrain:   uint8地形类型
+#   cost:      float32小端地形代价
+SECTIONS = (("obstacles", "bits"), ("terrain", "uint8"), ("cost", "float32"))
+
+
+# 编码时每次读取的行数（8的倍数，使每一带的障碍物位图正好占整数个字节）
+ENCODE_BAND_ROWS = 256
+
+
+def map_arrays(grid_map, y0: int = 0, y1: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    获取地图第y0到y1行（不含）的障碍物、地形类型和代价数组
+
+    分块地图的图层是内存映射文件，只读取并转换请求的行，不会把整张图层载入内存。
+
+    返回:
+        {"obstacles": bool数组, "terrain": uint8数组, "cost": float32数组}，形状均为(y1-y0, width)
+    """
+    y1 = grid_map.height if y1 is None else min(y1, grid_map.height)
+    if isinstance(grid_map, TerrainMap):
+        terrain = np.asarray(grid_map.terrain_type[y0:y1]).astype(np.uint8)
+    else:
+        terrain = np.zeros((y1 - y0, grid_map.width), dtype=np.uint8)
+    return {
+        "obstacles": np.asarray(grid_map.grid[y0:y1]),
+        "terrain": terrain,
+        "cost": np.asarray(grid_map.cost_map[y0:y1]).astype(np.float32)
+    }
+
+
+def _encode_section(arrays: Dict[str, np.ndarray], name: str) -> bytes:
+    """把一带数组编码为数据段的一部分"""
+    if name == "obstacles":
+        return np.packbits(arrays["obstacles"].ravel(), bitorder='little').tobytes()
+    if name == "terrain":
+        return arrays["terrain"].tobytes()
+    return arrays["cost"].astype('<f4').tobytes()
+
+
+def _section_lengths(grid_map) -> Dict[str, int]:
+    """各数据段在未压缩负载中的字节数"""
+    size = grid_map.width * grid_map.height
+    return {"obstacles": (size + 7) // 8, "terrain": size, "cost": 4 * size}
+
+
+def _header(grid_map, map_type: str, compress: bool) -> bytes:
+    """魔数、头部长度和JSON头部"""
+    lengths = _section_lengths(grid_map)
+    sections = []
+    offset = 0
+    for name, dtype in SECTIONS:
+        sections.append({"name": name, "dtype": dtype, "offset": offset, "length": lengths[name]})
+        offset += lengths[name]
+
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "width": grid_map.width,
+        "height": grid_map.height,
+        "map_type": map_type,
+        "version": grid_map.version,
+        "compression": "zlib" if compress else "none",
+        "sections": sections
+    }, separators=(",", ":")).encode("utf-8")
+    return MAGIC + struct.pack("<I", len(header)) + header
+
+
+def iter_encode_map(grid_map, map_type: str, compress: bool = False) -> Iterator[bytes]:
+    """
+    按行带逐块生成encode_map的输出，用于流式响应
+
+    每个数据段按ENCODE_BAND_ROWS行一带依次读取和编码，内存占用与地图大小无关，
+    分块大地图的内存映射图层也只按带换入。compress为True时用流式zlib压缩。
+    地图在生成过程中被修改时，输出可能混合修改前后的内容，调用方应传入快照。
+    """
+    yield _header(grid_map, map_type, compress)
+    compressor = zlib.compressobj(6) if compress else None
+    for name, _ in SECTIONS:
+        for y0 in range(0, grid_map.height, ENCODE_BAND_ROWS):
+            chunk = _encode_section(map_arrays(grid_map, y0, y0 + ENCODE_BAND_ROWS), name)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def encoded_length(grid_map, map_type: str) -> int:
+    """不压缩时编码结果的总字节数，流式响应据此设置Content-Length"""
+    return len(_header(grid_map, map_type, False)) + sum(_section_lengths(grid_map).values())
+
+
+def encode_map(grid_map, map_type: str, compress: bool = False) -> bytes:
+    """
+    把地图编码为紧凑的二进制格式
+
+    布局：4字节魔数"AMAP"，4字节小端uint32头部长度，UTF-8 JSON头部，
+    然后是各数据段依次拼接的负载（compress为True时整体用zlib压缩）。
+    头部记录地图尺寸、类型、版本号、压缩方式以及每个数据段在未压缩负载中的偏移和长度。
+    大地图应使用iter_encode_map流式输出，避免整个编码结果驻留内存。
+
+    参数:
+        grid_map: 栅格地图对象
+        map_type: 地图类型名称
+        compress: 是否用zlib压缩负载
+
+    返回:
+        编码后的字节串
+    """
+    return b"".join(iter_encode_map(grid_map, map_type, compress))
+
+
+def decode_map(data: bytes) -> Dict[str, Any]:
+    """
+    解码encode_map生成的二进制数据
+
+    返回:
+        头部字典，另外包含"obstacles"、"terrain"、"cost"三个(height, width)数组
+
+    异常:
+        ValueError: 数据格式不正确
+    """
+    if data[:4] != MAGIC:
+        raise ValueError("不是有效的地图数据")
+    header_length, = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8:8 + header_length].decode("utf-8"))
+    payload = data[8 + header_length:]
+    if header["compression"] == "zlib":
+        payload = zlib.decompress(payload)
+
+    shape = (header["height"], header["width"])
+    size = shape[0] * shape[1]
+    result = dict(header)
+    for section in header["sections"]:
+        raw = payload[section["offset"]:section["offset"] + section["length"]]
+        if section["dtype"] == "bits":
+            values = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), count=size, bitorder='little').astype(bool)
+        elif section["dtype"] == "uint8":
+            values = np.frombuffer(raw, dtype=np.uint8)
+        else:
+            values = np.frombuffer(raw, dtype='<f4')
+        result[section["name"]] = values.reshape(shape)
+    return result
@@ -1,124 +1,122 @@
 import numpy as np
-import random
 import math
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Union
 from astar_path_planning.app.models.grid_map import GridMap, TerrainMap
+from astar_path_planning.app.models.advanced_map import AdvancedMap
+from astar_path_planning.app.models.tiled_map import TiledMap
 
-def generate_random_obstacles(grid_map: GridMap, obstacle_density: float = 0.3, seed: Optional[int] = None):
+# 随机障碍物按行分批生成，大地图不需要一次性分配整张地图的随机数数组
+_OBSTACLE_BAND_ROWS = 1024
+
+def make_rng(seed: Optional[Union[int, np.random.Generator]] = None) -> np.random.Generator:
+    """
+    获取随机数生成器
+    
+    参数:
+        seed: 整数种子、已有的Generator（直接返回，便于多个生成步骤共享同一随机序列）或None（使用系统熵）
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+def generate_random_obstacles(grid_map: GridMap, obstacle_density: float = 0.3,
+                              seed: Optional[Union[int, np.random.Generator]] = None):
     """
     在地图中随机生成障碍物
     
     参数:
         grid_map: 栅格地图对象
         obstacle_density: 障碍物密度，范围[0, 1]
-        seed: 随机种子，为None时使用系统时间
+        seed: 随机种子或Generator，为None时使用系统熵
     """
-    if seed is not None:
-        np.random.seed(seed)
-    
-    # 随机生成障碍物
-    for y in range(grid_map.height):
-        for x in range(grid_map.width):
-            if np.random.random() < obstacle_density:
-                grid_map.set_obstacle(x, y)
+    rng = make_rng(seed)
+    for y0 in range(0, grid_map.height, _OBSTACLE_BAND_ROWS):
+        rows = min(_OBSTACLE_BAND_ROWS, grid_map.height - y0)
+        grid_map.set_obstacles(rng.random((rows, grid_map.width)) < obstacle_density, 0, y0)
 
-def generate_maze(grid_map: GridMap, seed: Optional[int] = None):
+def generate_maze(grid_map: GridMap, seed: Optional[Union[int, np.random.Generator]] = None):
     """
     使用深度优先搜索算法生成迷宫
     
+    用显式栈代替递归，大地图也不会超过递归深度限制。
+    
     参数:
         grid_map: 栅格地图对象
-        seed: 随机种子，为None时使用系统时间
+        seed: 随机种子或Generator，为None时使用系统熵
     """
-    if seed is not None:
-        random.seed(seed)
-    
-    # 初始化所有单元格为墙（障碍物）
-    for y in range(grid_map.height):
-        for x in range(grid_map.width):
-            grid_map.set_obstacle(x, y)
+    rng = make_rng(seed)
     
     # 获取地图尺寸
     width, height = grid_map.width, grid_map.height
+    directions = [(0, -2), (2, 0), (0, 2), (-2, 0)]  # 上、右、下、左
     
-    # 使用深度优先搜索生成迷宫
-    def carve_passages_from(cx: int, cy: int, visited: set):
-        directions = [(0, -2), (2, 0), (0, 2), (-2, 0)]  # 上、右、下、左
-        random.shuffle(directions)
-        
-        for dx, dy in directions:
-            nx, ny = cx + dx, cy + dy
-            if (0 <= nx < width and 0 <= ny < height and 
-                (nx, ny) not in visited):
-                visited.add((nx, ny))
-                grid_map.clear_obstacle(nx, ny)
-                grid_map.clear_obstacle(cx + dx//2, cy + dy//2)  # 清除中间的墙
-                carve_passages_from(nx, ny, visited)
+    # 在数组上开凿通道，最后一次性写入地图
+    passages = np.zeros((height, width), dtype=bool)
+    visited = np.zeros((height, width), dtype=bool)
+    
+    def shuffled_directions():
+        return iter([directions[i] for i in rng.permutation(4)])
     
     # 选择起点并开始生成
     start_x, start_y = 1, 1
-    visited = {(start_x, start_y)}
-    grid_map.clear_obstacle(start_x, start_y)
-    carve_passages_from(start_x, start_y, visited)
+    if grid_map.is_valid(start_x, start_y):
+        visited[start_y, start_x] = True
+        passages[start_y, start_x] = True
+    
+    # 栈中保存(格子坐标, 尚未尝试的方向)，与递归版本的访问顺序相同
+    stack = [(start_x, start_y, shuffled_directions())]
+    while stack:
+        cx, cy, remaining = stack[-1]
+        for dx, dy in remaining:
+            nx, ny = cx + dx, cy + dy
+            if 0 <= nx < width and 0 <= ny < height and not visited[ny, nx]:
+                visited[ny, nx] = True
+                passages[ny, nx] = True
+                passages[cy + dy // 2, cx + dx // 2] = True  # 清除中间的墙
+                stack.append((nx, ny, shuffled_directions()))
+                break
+        else:
+            stack.pop()
+    
+    # 初始化所有单元格为墙（障碍物），再清除通道
+    grid_map.set_obstacles(np.ones((height, width), dtype=bool))
+    grid_map.clear_obstacles(passages)
 
-def generate_complex_terrain(terrain_map: TerrainMap, seed: Optional[int] = None):
+def generate_complex_terrain(terrain_map: TerrainMap, seed: Optional[Union[int, np.random.Generator]] = None):
     """
     生成具有不同地形类型的复杂地形地图
     
     参数:
         terrain_map: 地形地图对象
-        seed: 随机种子，为None时使用系统时间
-    """
-    if seed is not None:
-        np.random.seed(seed)
-    
-    # 地形类型及其代价（限制最大值为10.0）
-    terrain_types = {
-        0: 1.0,    # 平地
-        1: min(2.0, 10.0),    # 山地
-        2: min(3.0, 10.0)     # 水域
-    }
-    
-    # 使用柏林噪声或简单随机生成不同的地形区域
-    # 这里使用简化版本，使用随机生成
-    
-    # 先随机放置一些种子点
-    seeds = []
-    for terrain_type in range(3):  # 3种地形类型
-        num_seeds = np.random.randint(3, 10)  # 每种地形随机生成3-10个种子点
-        for _ in range(num_seeds):
-            x = np.random.randint(0, terrain_map.width)
-            y = np.random.randint(0, terrain_map.height)
-            seeds.append((x, y, terrain_type))
-    
-    # 对每个点，找到最近的种子点并设置为对应的地形类型
-    for y in range(terrain_map.height):
-        for x in range(terrain_map.width):
-            # 计算到每个种子点的距离，选择最近的
-            min_dist = None
-            terrain = 0  # 默认为平地
-            
-            for seed_x, seed_y, seed_terrain in seeds:
-                # 使用曼哈顿距离
-                dist = abs(x - seed_x) + abs(y - seed_y)
-                if min_dist is None or dist < min_dist:
-                    min_dist = dist
-                    terrain = seed_terrain
-            
-            # 设置地形类型和代价（确保代价在有效范围内）
-            try:
-                cost = min(float(terrain_types[terrain]), 10.0)  # 限制最大代价为10.0
-                if not math.isinf(cost) and not math.isnan(cost):
-                    terrain_map.set_terrain(x, y, terrain, cost)
-                else:
-                    # 如果代价无效，使用默认值
-                    terrain_map.set_terrain(x, y, 0, 1.0)
-            except (ValueError, TypeError):
-                # 如果转换失败，使用默认值
-                terrain_map.set_terrain(x, y, 0, 1.0)
+        seed: 随机种子或Generator，为None时使用系统熵
+    """
+    rng = make_rng(seed)
+    width, height = terrain_map.width, terrain_map.height
+    
+    # 地形类型及其代价：平地、山地、水域
+    terrain_costs = [1.0, 2.0, 3.0]
+    
+    # 先随机放置一些种子点，每种地形随机生成3-9个
+    seed_x, seed_y, seed_terrain = [], [], []
+    for terrain_type in range(len(terrain_costs)):
+        num_seeds = int(rng.integers(3, 10))
+        seed_x.append(rng.integers(0, width, num_seeds))
+        seed_y.append(rng.integers(0, height, num_seeds))
+        seed_terrain.append(np.full(num_seeds, terrain_type))
+    seed_x = np.concatenate(seed_x)
+    seed_y = np.concatenate(seed_y)
+    seed_terrain = np.concatenate(seed_terrain)
+    
+    # 曼哈顿距离的Voronoi划分：每个格子取最近的种子点（距离相同时取靠前的种子点）
+    distance = (np.abs(np.arange(width)[None, None, :] - seed_x[:, None, None]) +
+                np.abs(np.arange(height)[None, :, None] - seed_y[:, None, None]))
+    terrain = seed_terrain[np.argmin(distance, axis=0)]
+    
+    for terrain_type, cost in enumerate(terrain_costs):
+        terrain_map.set_terrain_region(terrain == terrain_type, terrain_type, cost)
     
     # 随机生成一些障碍物
-    generate_random_obstacles(terrain_map, obstacle_density=0.1, seed=seed)
+    generate_random_obstacles(terrain_map, obstacle_density=0.1, seed=rng)
 
 def generate_u_shape_obstacle(grid_map: GridMap, center_x: int, center_y: int, size: int):
     """
@@ -184,7 +182,8 @@ def generate_radial_obstacles(grid_map: GridMap, center_x: int, center_y: int, n
             if grid_map.is_valid(x, y):
                 grid_map.set_obstacle(x, y)
 
-def initialize_test_environment(width: int, height: int, map_type: str = "simple") -> GridMap:
+def initialize_test_environment(width: int, height: int, map_type: str = "simple",
+                                seed: Optional[Union[int, np.random.Generator]] = None) -> GridMap:
     """
     初始化测试环境，创建指定类型的地图
     
@@ -193,25 +192,23 @@ def initialize_test_environment(width: int, height: int, map_type: str = "simple
         height: 地图高度
         map_type: 地图类型，可选值: "simple"(随机障碍物), "maze"(迷宫), "complex"(复杂地形),
                            "advanced"(高级地图，包含动态障碍物和环境因素)
+        seed: 随机种子或Generator，相同种子生成相同的地图；为None时使用系统熵
     
     返回:
         grid_map: 创建的地图对象
     """
+    rng = make_rng(seed)
+    
     if map_type == "advanced":
         # 创建高级地图
         grid_map = AdvancedMap(width, height)
         # 添加动态障碍物
         grid_map.add_dynamic_obstacle(width//4, height//4, 'linear', {'amplitude': 5, 'frequency': 0.5})
         grid_map.add_dynamic_obstacle(width//2, height//2, 'circular', {'radius': 3, 'frequency': 0.3})
-        # 设置地形和环境
-        for y in range(height):
-            for x in range(width):
-                # 设置随机高度
-                elevation = np.random.uniform(0, 5)
-                grid_map.set_elevation(x, y, elevation)
-                # 设置区域
-                zone = (x // (width//3)) + (y // (height//3)) * 3
-                grid_map.set_zone(x, y, zone)
+        # 设置随机高度和3x3的区域划分
+        grid_map.set_elevation_map(rng.uniform(0, 5, (height, width)))
+        ys, xs = np.indices((height, width))
+        grid_map.set_zone_map(xs // max(width // 3, 1) + (ys // max(height // 3, 1)) * 3)
         # 设置天气和光照
         grid_map.set_weather('rain')
         grid_map.set_light_level(0.7)
@@ -219,7 +216,7 @@ def initialize_test_environment(width: int, height: int, map_type: str = "simple
     elif map_type == "complex":
         # 创建地形地图
         grid_map = TerrainMap(width, height)
-        generate_complex_terrain(grid_map)
+        generate_complex_terrain(grid_map, seed=rng)
         # 添加螺旋和放射状障碍物
         generate_spiral_obstacles(grid_map, width//3, height//3, min(width, height)//4)
         generate_radial_obstacles(grid_map, 2*width//3, 2*height//3, 8, min(width, height)//5)
@@ -230,17 +227,57 @@ def initialize_test_environment(width: int, height: int, map_type: str = "simple
         
         if map_type == "maze":
             # 生成迷宫
-            generate_maze(grid_map)
+            generate_maze(grid_map, seed=rng)
         else:  # simple
-            # 生成随机障碍物
-            generate_random_obstacles(grid_map, obstacle_density=0.2)
-            
-            # 添加一些U形障碍物
-            num_u_shapes = random.randint(1, 3)
-            for _ in range(num_u_shapes):
-                center_x = random.randint(width//4, 3*width//4)
-                center_y = random.randint(height//4, 3*height//4)
-                size = random.randint(5, min(15, width//5, height//5))
-                generate_u_shape_obstacle(grid_map, center_x, center_y, size)
+            generate_simple_obstacles(grid_map, seed=rng)
+    
+    return grid_map
+
+def generate_simple_obstacles(grid_map: GridMap, seed: Optional[Union[int, np.random.Generator]] = None):
+    """
+    生成"simple"类型地图的障碍物：随机障碍物加上几个U形障碍物
     
+    参数:
+        grid_map: 栅格地图对象
+        seed: 随机种子或Generator，为None时使用系统熵
+    """
+    rng = make_rng(seed)
+    width, height = grid_map.width, grid_map.height
+    
+    # 生成随机障碍物
+    generate_random_obstacles(grid_map, obstacle_density=0.2, seed=rng)
+    
+    # 添加一些U形障碍物（放不下时generate_u_shape_obstacle会跳过）
+    num_u_shapes = int(rng.integers(1, 4))
+    for _ in range(num_u_shapes):
+        center_x = int(rng.integers(width//4, 3*width//4 + 1))
+        center_y = int(rng.integers(height//4, 3*height//4 + 1))
+        size = int(rng.integers(5, max(5, min(15, width//5, height//5)) + 1))
+        generate_u_shape_obstacle(grid_map, center_x, center_y, size)
+
+def initialize_tiled_environment(width: int, height: int, map_type: str = "simple",
+                                 seed: Optional[Union[int, np.random.Generator]] = None,
+                                 directory: Optional[str] = None, **kwargs) -> TiledMap:
+    """
+    创建分块存储的大地图
+    
+    参数:
+        width: 地图宽度
+        height: 地图高度
+        map_type: 地图类型，可选值: "simple"(随机障碍物), "empty"(空白地图)
+        seed: 随机种子或Generator，为None时使用系统熵
+        directory: 地图目录，为None时使用临时目录
+        **kwargs: 传给TiledMap.create的其他参数(tile_size, cache_tiles)
+    
+    返回:
+        grid_map: 创建的地图对象
+    
+    异常:
+        ValueError: 地图类型不支持分块存储
+    """
+    if map_type not in ("simple", "empty"):
+        raise ValueError(f"分块地图不支持{map_type}类型")
+    grid_map = TiledMap.create(width, height, directory=directory, **kwargs)
+    if map_type == "simple":
+        generate_simple_obstacles(grid_map, seed=seed)
     return grid_map
\ No newline at end of file
@@ -0,0 +1,271 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 未指定地图ID的请求使用的地图
+DEFAULT_MAP_ID = "default"
+
+# 地图ID只允许字母、数字、下划线和连字符
+_MAP_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def is_valid_map_id(map_id: str) -> bool:
+    """检查地图ID是否合法"""
+    return bool(_MAP_ID_PATTERN.match(map_id or ""))
+
+
+class _ReadWriteLock:
+    """
+    读写锁：多个读者可以同时持有，写者等待所有读者离开
+
+    有写者等待时新的读者也等待，持续的读取不会使写者饿死；因此读者不能嵌套获取读锁。
+    获取和释放可以在不同的线程中进行。
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class _Entry:
+    """注册表中的一张地图"""
+
+    __slots__ = ("grid_map", "map_type", "lock", "readers", "snapshot", "created_at", "last_access")
+
+    def __init__(self, grid_map, map_type: str):
+        self.grid_map = grid_map
+        self.map_type = map_type
+        self.lock = threading.RLock()
+        self.readers = _ReadWriteLock()  # 快照不隔离修改的地图上，读取与修改互斥
+        self.snapshot = None  # 与当前版本对应的快照，多个请求共用
+        self.created_at = time.time()
+        self.last_access = time.monotonic()
+
+
+class MapRegistry:
+    """
+    按地图ID管理多张地图的注册表
+
+    读取地图的请求拿到写时复制的快照（GridMap.snapshot），修改地图的请求通过edit()
+    在地图的锁内进行，修改前地图换用数组副本，正在进行的搜索始终读到一致的内容。
+    快照不与修改隔离的地图（isolated_snapshots为False，如分块地图）改由读写锁保证一致：
+    读取在reading()内进行，edit()等待进行中的读取结束。
+    地图总内存超过预算或数量超过上限时，淘汰最久未访问的地图。
+    """
+
+    def __init__(self, max_maps: int = 32, memory_budget: int = 0,
+                 on_remove: Optional[Callable[[str], None]] = None):
+        """
+        初始化注册表
+
+        参数:
+            max_maps: 最多保留的地图数量，为0时不限制
+            memory_budget: 所有地图数组的总字节数上限，为0时不限制
+            on_remove: 地图被删除或淘汰后以on_remove(map_id)的形式调用
+        """
+        self.max_maps = max_maps
+        self.memory_budget = memory_budget
+        self.on_remove = on_remove
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _entry(self, map_id: str) -> _Entry:
+        """查找地图并标记为最近使用，调用方须持有self._lock"""
+        entry = self._entries.get(map_id)
+        if entry is None:
+            raise KeyError(map_id)
+        entry.last_access = time.monotonic()
+        self._entries.move_to_end(map_id)
+        return entry
+
+    def __contains__(self, map_id: str) -> bool:
+        with self._lock:
+            return map_id in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def put(self, grid_map, map_type: str, map_id: Optional[str] = None) -> str:
+        """
+        注册地图，已存在的同ID地图被替换
+
+        参数:
+            grid_map: 地图对象
+            map_type: 地图类型（用于列表显示和响应）
+            map_id: 地图ID，为None时生成新的ID
+
+        返回:
+            地图ID
+        """
+        if map_id is None:
+            map_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[map_id] = _Entry(grid_map, map_type)
+            self._entries.move_to_end(map_id)
+            evicted = self._evict(keep=map_id)
+        self._notify_removed(evicted)
+        return map_id
+
+    def get(self, map_id: str):
+        """
+        获取地图对象本身（修改地图应使用edit()）
+
+        异常:
+            KeyError: 地图不存在
+        """
+        with self._lock:
+            return self._entry(map_id).grid_map
+
+    def map_type(self, map_id: str) -> str:
+        """获取注册地图时记录的地图类型"""
+        with self._lock:
+            return self._entry(map_id).map_type
+
+    def snapshot(self, map_id: str):
+        """
+        获取地图当前版本的只读快照，同一版本的快照只创建一次
+
+        异常:
+            KeyError: 地图不存在
+        """
+        with self._lock:
+            entry = self._entry(map_id)
+        with entry.lock:
+            snap = entry.snapshot
+            if snap is None or snap.version != entry.grid_map.version:
+                snap = entry.snapshot = entry.grid_map.snapshot()
+            return snap
+
+    @contextmanager
+    def reading(self, map_id: str) -> Iterator[None]:
+        """
+        在读锁内读取地图的快照
+
+        只对快照不隔离修改的地图加锁，期间该地图的edit()等待；其他地图和不存在的地图不加锁。
+        读锁不能嵌套获取。
+        """
+        with self._lock:
+            entry = self._entries.get(map_id)
+        if entry is None or entry.grid_map.isolated_snapshots:
+            yield
+            return
+        with entry.readers.read():
+            yield
+
+    @contextmanager
+    def edit(self, map_id: str) -> Iterator[Any]:
+        """
+        在地图的锁内修改地图
+
+        进入时如果数组仍被快照共享，先换用私有副本（写时复制）；快照不隔离修改的地图
+        先等待reading()中进行的读取结束。同一张地图的修改依次进行，不同地图之间互不阻塞。
+
+        异常:
+            KeyError: 地图不存在
+        """
+        with self._lock:
+            entry = self._entry(map_id)
+        with ExitStack() as stack:
+            if not entry.grid_map.isolated_snapshots:
+                stack.enter_context(entry.readers.write())
+            stack.enter_context(entry.lock)
+            grid_map = entry.grid_map
+            grid_map.unshare()
+            entry.snapshot = None
+            yield grid_map
+
+    def delete(self, map_id: str) -> bool:
+        """删除地图，返回地图是否存在"""
+        with self._lock:
+            removed = self._entries.pop(map_id, None) is not None
+        if removed:
+            self._notify_removed([map_id])
+        return removed
+
+    def list_maps(self) -> List[Dict[str, Any]]:
+        """按最近访问顺序（最新在前）列出所有地图的信息"""
+        now = time.monotonic()
+        with self._lock:
+            items = list(self._entries.items())
+        return [{
+            "map_id": map_id,
+            "width": entry.grid_map.width,
+            "height": entry.grid_map.height,
+            "map_type": entry.map_type,
+            "version": entry.grid_map.version,
+            "nbytes": entry.grid_map.nbytes(),
+            "created_at": entry.created_at,
+            "idle_seconds": now - entry.last_access,
+        } for map_id, entry in reversed(items)]
+
+    def memory_usage(self) -> int:
+        """所有地图数组占用的总字节数"""
+        with self._lock:
+            return sum(entry.grid_map.nbytes() for entry in self._entries.values())
+
+    def _evict(self, keep: str) -> List[str]:
+        """
+        按最久未访问的顺序淘汰地图，直到满足数量和内存上限，调用方须持有self._lock
+
+        刚注册的地图（keep）不会被淘汰；快照仍在使用中的地图被淘汰后，
+        正在进行的搜索不受影响。
+
+        返回:
+            被淘汰的地图ID列表
+        """
+        evicted = []
+        total = sum(entry.grid_map.nbytes() for entry in self._entries.values()) if self.memory_budget > 0 else 0
+        for map_id in list(self._entries):
+            over_count = self.max_maps > 0 and len(self._entries) > self.max_maps
+            over_memory = self.memory_budget > 0 and total > self.memory_budget
+            if not over_count and not over_memory:
+                break
+            if map_id == keep:
+                continue
+            entry = self._entries.pop(map_id)
+            total -= entry.grid_map.nbytes() if self.memory_budget > 0 else 0
+            evicted.append(map_id)
+            self.evictions += 1
+        return evicted
+
+    def _notify_removed(self, map_ids: List[str]):
+        if self.on_remove is not None:
+            for map_id in map_ids:
+                self.on_remove(map_id)
@@ -0,0 +1,250 @@
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 延迟直方图的默认桶上限（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 扩展节点数直方图的桶上限
+NODE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    """转义标签值中的反斜杠、双引号和换行"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    """按标签值分组的指标，子类实现具体的取值方式"""
+
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """
+        把标签转换为按labelnames排列的元组
+
+        异常:
+            ValueError: 标签名与定义不一致
+        """
+        if len(labels) != len(self.labelnames) or any(name not in labels for name in self.labelnames):
+            raise ValueError(f"指标{self.name}需要标签{self.labelnames}，实际为{tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        """按Prometheus文本格式输出的样本行"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    TYPE = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """
+    累积分桶直方图
+
+    每组标签保存各桶的计数、观测值之和与总数，输出为name_bucket{le="..."}、name_sum和name_count。
+    """
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry is not None else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        bucket_labels = self.labelnames + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(bucket_labels, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，render()输出所有指标的Prometheus文本格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """
+        注册指标
+
+        异常:
+            ValueError: 同名指标已注册
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标{metric.name}已注册")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# 应用的指标
+REGISTRY = MetricsRegistry()
+
+http_request_duration = REGISTRY.histogram(
+    "astar_http_request_duration_seconds", "HTTP请求处理时间", ("method", "route", "status"))
+search_duration = REGISTRY.histogram(
+    "astar_search_duration_seconds", "路径搜索时间（不含后处理和序列化）", ("algorithm",))
+search_nodes = REGISTRY.histogram(
+    "astar_search_nodes_explored", "每次路径搜索扩展的节点数", ("algorithm",), buckets=NODE_BUCKETS)
+search_results = REGISTRY.counter(
+    "astar_search_results_total", "路径搜索次数，按结束原因统计", ("algorithm", "status"))
+search_operations = REGISTRY.counter(
+    "astar_search_operations_total", "启用插桩的搜索中的堆操作、邻居评估和函数调用次数", ("algorithm", "operation"))
+postprocess_duration = REGISTRY.histogram(
+    "astar_postprocess_duration_seconds", "路径后处理各步骤的耗时", ("step",))
+render_duration = REGISTRY.histogram(
+    "astar_render_duration_seconds", "地图渲染时间", ("format",))
+
+
+def observe_search(algorithm: str, status: str, duration: float, nodes_explored: int, stats=None):
+    """
+    记录一次路径搜索
+
+    参数:
+        algorithm: 算法ID
+        status: 搜索结束的原因
+        duration: 搜索耗时（秒）
+        nodes_explored: 扩展的节点数
+        stats: 搜索的插桩计数器（SearchStats），为None时只记录耗时和节点数
+    """
+    search_duration.observe(duration, algorithm=algorithm)
+    search_nodes.observe(nodes_explored, algorithm=algorithm)
+    search_results.inc(algorithm=algorithm, status=status)
+    if stats is not None:
+        counts = stats.as_dict()
+        for operation, value in counts.items():
+            if operation != "timings":
+                search_operations.inc(value, algorithm=algorithm, operation=operation)
+
+
+def observe_postprocess(stats):
+    """把插桩计数器中记录的后处理耗时计入直方图"""
+    for step, duration in stats.timings.items():
+        postprocess_duration.observe(duration, step=step)
+
+
+class MetricsMiddleware:
+    """
+    记录每个HTTP请求的处理时间
+
+    使用纯ASGI中间件而不是BaseHTTPMiddleware，不影响流式响应和request.is_disconnected()。
+    路由标签取匹配到的路由模板（如/grid/maps/{map_id}），未匹配的请求记为unmatched，
+    避免路径参数产生无限多的标签组合。
+    """
+
+    def __init__(self, app, histogram: Optional[Histogram] = None):
+        self.app = app
+        self.histogram = histogram or http_request_duration
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.histogram.observe(time.perf_counter() - start_time, method=scope["method"],
+                                   route=getattr(route, "path", "unmatched"), status=str(status_code))
@@ -0,0 +1,94 @@
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+# 等待执行器结果时检查客户端连接状态的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.1
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class ClientDisconnected(Exception):
+    """等待执行器结果期间客户端断开了连接"""
+
+
+def get_executor(max_workers: int = 4) -> ThreadPoolExecutor:
+    """获取（必要时创建）搜索和渲染使用的线程池"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="astar-worker")
+        return _executor
+
+
+def shutdown():
+    """关闭线程池，未开始的任务被取消"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+atexit.register(shutdown)
+
+
+def submit(func: Callable, *args, max_workers: int = 4) -> Future:
+    """把CPU密集的调用提交到线程池"""
+    return get_executor(max_workers).submit(func, *args)
+
+
+async def await_future(future: Future, is_disconnected: Callable[[], Awaitable[bool]],
+                       on_disconnect: Optional[Callable[[], None]] = None) -> Any:
+    """
+    在事件循环中等待执行器任务完成，期间定期检查客户端是否已断开
+
+    参数:
+        future: 执行器返回的Future
+        is_disconnected: 检查客户端连接的协程函数（如Request.is_disconnected）
+        on_disconnect: 客户端断开时调用，用于通知已开始的任务提前结束（如SearchBudget.cancel）
+
+    返回:
+        任务的结果
+
+    异常:
+        ClientDisconnected: 客户端在任务完成前断开了连接，尚未开始的任务会被取消
+    """
+    wrapped = asyncio.wrap_future(future)
+    while True:
+        done, _ = await asyncio.wait({wrapped}, timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            return wrapped.result()
+        if await is_disconnected():
+            # 取消包装的Future会同时取消尚未开始的执行器任务
+            wrapped.cancel()
+            if on_disconnect is not None:
+                on_disconnect()
+            raise ClientDisconnected()
+
+
+async def await_all(futures: Iterable[Future], is_disconnected: Callable[[], Awaitable[bool]]) -> List[Any]:
+    """
+    等待多个执行器任务全部完成，期间定期检查客户端是否已断开
+
+    返回:
+        按futures顺序排列的结果列表
+
+    异常:
+        ClientDisconnected: 客户端在任务全部完成前断开了连接，尚未开始的任务都会被取消
+    """
+    futures = list(futures)
+    wrapped = [asyncio.wrap_future(future) for future in futures]
+    pending = set(wrapped)
+    while pending:
+        _, pending = await asyncio.wait(pending, timeout=DISCONNECT_POLL_INTERVAL)
+        if pending and await is_disconnected():
+            for future in futures:
+                future.cancel()
+            for future in pending:
+                future.cancel()
+            raise ClientDisconnected()
+    return [future.result() for future in wrapped]
@@ -0,0 +1,94 @@
+import base64
+from typing import List, Tuple, Optional, Iterable
+import numpy as np
+from astar_path_planning.app.models.grid_map import DIRECTIONS
+from astar_path_planning.app.utils.search_engine import ExploredNodes
+
+# (dx, dy) -> 方向编号字符，编号与DIRECTIONS和/path/field/directions一致
+_CHAIN_CODES = {direction: str(d) for d, direction in enumerate(DIRECTIONS)}
+
+
+def encode_chain(path: List[Tuple[int, int]]) -> Optional[str]:
+    """
+    把路径编码为链码：从起点出发每一步的方向编号（'0'-'7'）组成的字符串
+
+    参数:
+        path: 路径坐标列表
+
+    返回:
+        链码字符串；路径为空，或相邻两点不是八邻域中的一步（平滑后的路径可能出现）时返回None
+    """
+    if not path:
+        return None
+    codes = []
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        code = _CHAIN_CODES.get((x2 - x1, y2 - y1))
+        if code is None:
+            return None
+        codes.append(code)
+    return "".join(codes)
+
+
+def decode_chain(start: Tuple[int, int], chain: str) -> List[Tuple[int, int]]:
+    """从起点和链码还原路径坐标列表"""
+    x, y = start
+    path = [(x, y)]
+    for code in chain:
+        dx, dy = DIRECTIONS[int(code)]
+        x += dx
+        y += dy
+        path.append((x, y))
+    return path
+
+
+def explored_coordinates(explored: Iterable[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把已探索节点转换为(xs, ys)两个整数数组
+
+    参数:
+        explored: ExploredNodes或坐标列表
+    """
+    if isinstance(explored, ExploredNodes):
+        return explored.coordinates()
+    points = np.asarray(list(explored), dtype=np.intp).reshape(-1, 2)
+    return points[:, 0], points[:, 1]
+
+
+def points_json_size(xs: np.ndarray, ys: np.ndarray) -> int:
+    """坐标列表按[{"x":..,"y":..}, ...]紧凑序列化后的字节数，用于和位图比较大小（坐标非负）"""
+    values = np.concatenate([xs, ys])
+    digits = int((np.floor(np.log10(np.maximum(values, 1))) + 1).sum())
+    # 每个点 {"x":,"y":} 共11个字符，点之间一个逗号，外层一对方括号
+    return 12 * len(xs) + digits + 1
+
+
+def encode_explored_bitmap(xs: np.ndarray, ys: np.ndarray) -> Optional[Tuple[str, Tuple[int, int, int, int]]]:
+    """
+    把已探索节点编码为外接矩形内的base64位图
+
+    位图只覆盖已探索节点的外接矩形，按 (y-y0)*w+(x-x0) 顺序每字节8个格子、低位在前
+    （与二进制地图格式的障碍物位图相同），大小为 ceil(w*h/8) 字节，与地图尺寸无关。扩展顺序不保留。
+    节点稀疏地分布在大范围内时位图可能比坐标列表还大，这时不分配位图，直接返回None。
+
+    参数:
+        xs, ys: 已探索节点的坐标数组（见explored_coordinates），不能为空
+
+    返回:
+        (base64位图, (x0, y0, w, h))；位图的JSON不比坐标列表小时返回None
+    """
+    x0, y0 = int(xs.min()), int(ys.min())
+    w, h = int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1
+    # base64编码后的长度，外加约40字节的外接矩形字段
+    nbytes = (w * h + 7) // 8
+    if 4 * ((nbytes + 2) // 3) + 40 >= points_json_size(xs, ys):
+        return None
+    mask = np.zeros(w * h, dtype=bool)
+    mask[(ys - y0) * w + (xs - x0)] = True
+    bits = np.packbits(mask, bitorder='little')
+    return base64.b64encode(bits.tobytes()).decode("ascii"), (x0, y0, w, h)
+
+
+def decode_explored_bitmap(data: str, width: int, height: int) -> np.ndarray:
+    """解码encode_explored_bitmap生成的位图，width、height为外接矩形的尺寸，返回(height, width)的bool数组"""
+    bits = np.frombuffer(base64.b64decode(data), dtype=np.uint8)
+    return np.unpackbits(bits, count=width * height, bitorder='little').astype(bool).reshape(height, width)
@@ -0,0 +1,198 @@
+from contextlib import nullcontext
+from typing import List, Tuple, Callable, Dict, Optional, Iterator
+from astar_path_planning.app.utils.astar import astar_search, euclidean_distance, manhattan_distance, diagonal_distance
+from astar_path_planning.app.utils.improved_astar import adaptive_astar_search, adaptive_heuristic, smooth_path, check_and_fix_collision
+from astar_path_planning.app.utils.jps import jump_point_search
+from astar_path_planning.app.utils.bidirectional_astar import bidirectional_astar_search
+from astar_path_planning.app.utils.hierarchical import hierarchical_search
+from astar_path_planning.app.utils.landmarks import landmark_heuristic
+from astar_path_planning.app.utils.theta_star import theta_star_search, segment_cost
+from astar_path_planning.app.utils.search_engine import (
+    iter_best_first_search, current_stats, SearchProgress, SearchBudget, SearchStats
+)
+from astar_path_planning.app.models.tiled_map import TiledMap
+
+# 可用的启发函数：id -> (函数, 显示名称)
+HEURISTICS: Dict[str, Tuple[Callable, str]] = {
+    "euclidean": (euclidean_distance, "欧几里得距离"),
+    "manhattan": (manhattan_distance, "曼哈顿距离"),
+    "diagonal": (diagonal_distance, "对角线距离")
+}
+
+# 需要按地图预处理的启发函数：id -> (以地图构造启发函数的函数, 显示名称)
+# 分块地图没有整图稠密数组，使用这些启发函数时回退到欧几里得距离
+MAP_HEURISTICS: Dict[str, Tuple[Callable, str]] = {
+    "alt": (landmark_heuristic, "ALT地标启发(预处理)")
+}
+
+# 可用的路径规划算法：id -> (函数, 显示名称)
+ALGORITHMS: Dict[str, Tuple[Callable, str]] = {
+    "astar": (astar_search, "A*算法"),
+    "adaptive_astar": (adaptive_astar_search, "自适应A*算法"),
+    "jps": (jump_point_search, "跳点搜索(JPS)"),
+    "bidirectional_astar": (bidirectional_astar_search, "双向A*算法"),
+    "hpa": (hierarchical_search, "分层A*(HPA*)"),
+    "theta_star": (theta_star_search, "Theta*任意角度")
+}
+
+# 直接输出任意角度路点的搜索函数，路径不需要也不应该再做平滑和碰撞修正
+ANY_ANGLE_SEARCHES = (theta_star_search,)
+
+# 基于best_first_search、可以分批输出搜索进度的算法：id -> 构造节点启发函数h(x, y)的函数
+STREAMING_ALGORITHMS: Dict[str, Callable] = {
+    "astar": lambda grid_map, start, goal, heuristic_func: (lambda x, y: heuristic_func((x, y), goal)),
+    "adaptive_astar": adaptive_heuristic
+}
+
+def get_heuristic(heuristic_name: str, grid_map=None):
+    """
+    根据名称获取启发函数，未知名称默认使用欧几里得距离
+
+    参数:
+        heuristic_name: 启发函数名称
+        grid_map: 栅格地图对象；MAP_HEURISTICS中的启发函数据此构造，
+                  为None或为分块地图时回退到欧几里得距离
+    """
+    if heuristic_name in MAP_HEURISTICS:
+        if grid_map is None or isinstance(grid_map, TiledMap):
+            return euclidean_distance
+        return MAP_HEURISTICS[heuristic_name][0](grid_map)
+    return HEURISTICS.get(heuristic_name, HEURISTICS["euclidean"])[0]
+
+def heuristic_names() -> Dict[str, str]:
+    """所有可选启发函数的id -> 显示名称"""
+    names = {heuristic_id: name for heuristic_id, (_, name) in HEURISTICS.items()}
+    names.update((heuristic_id, name) for heuristic_id, (_, name) in MAP_HEURISTICS.items())
+    return names
+
+def get_algorithm(algorithm_name: str, grid_map=None):
+    """
+    根据名称获取路径规划算法，未知名称默认使用标准A*
+
+    参数:
+        algorithm_name: 算法名称
+        grid_map: 栅格地图对象；跳点搜索在代价不均匀的地图上回退到A*，
+                  需要整图稠密数组的分层A*在分块地图上回退到A*，
+                  读取边代价张量的Theta*在没有该张量的地图上回退到A*
+    """
+    if algorithm_name == "jps" and grid_map is not None and not grid_map.has_uniform_cost():
+        return astar_search
+    if algorithm_name == "hpa" and isinstance(grid_map, TiledMap):
+        return astar_search
+    if algorithm_name == "theta_star" and grid_map is not None and not grid_map.has_edge_costs:
+        return astar_search
+    return ALGORITHMS.get(algorithm_name, ALGORITHMS["astar"])[0]
+
+def run_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int],
+               algorithm: str = "astar", heuristic: str = "euclidean"):
+    """
+    按名称选择算法和启发函数进行路径规划
+
+    当前线程激活了插桩计数器时，启发函数的调用次数计入heuristic_calls。
+
+    返回:
+        (路径, 已探索节点列表)，未找到路径时路径为None
+    """
+    search = get_algorithm(algorithm, grid_map)
+    heuristic_func = get_heuristic(heuristic, grid_map)
+    stats = current_stats()
+    if stats is not None:
+        heuristic_func = stats.count_calls(heuristic_func, "heuristic_calls")
+    return search(grid_map, start, goal, heuristic_func)
+
+def run_budgeted_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int], algorithm: str = "astar",
+                        heuristic: str = "euclidean", budget: Optional[SearchBudget] = None,
+                        stats: Optional[SearchStats] = None):
+    """
+    在搜索预算内进行路径规划
+
+    预算用尽时返回算法记录的部分路径（可能为None），status说明搜索结束的原因。
+    指定stats时搜索的插桩计数累加到stats中。
+
+    返回:
+        (路径, 已探索节点列表, status)
+    """
+    if budget is None:
+        budget = SearchBudget()
+    with budget, (stats if stats is not None else nullcontext()):
+        path, explored = run_search(grid_map, start, goal, algorithm, heuristic)
+    if path is None:
+        path = budget.partial_path
+    return path, explored, budget.status
+
+def iter_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int], algorithm: str = "astar",
+                heuristic: str = "euclidean", chunk_size: int = 1000, frontier_limit: int = 0,
+                budget: Optional[SearchBudget] = None) -> Iterator[SearchProgress]:
+    """
+    按名称选择算法进行分批输出的路径规划，参数含义见iter_best_first_search
+
+    回退到A*的算法（如代价不均匀地图上的跳点搜索）按A*输出。
+
+    异常:
+        ValueError: 算法不支持分批输出
+    """
+    if get_algorithm(algorithm, grid_map) is astar_search:
+        algorithm = "astar"
+    make_heuristic = STREAMING_ALGORITHMS.get(algorithm)
+    if make_heuristic is None:
+        supported = "、".join(STREAMING_ALGORITHMS)
+        raise ValueError(f"算法{algorithm}不支持流式输出，只支持{supported}")
+    node_heuristic = make_heuristic(grid_map, start, goal, get_heuristic(heuristic, grid_map))
+    if budget is not None:
+        budget.start()
+    return iter_best_first_search(grid_map, start, goal, node_heuristic,
+                                  chunk_size=chunk_size, frontier_limit=frontier_limit, budget=budget)
+
+def _timed(stats: Optional[SearchStats], name: str):
+    """stats不为None时对with块计时，否则什么也不做"""
+    return stats.timer(name) if stats is not None else nullcontext()
+
+def is_any_angle(algorithm_name: str, grid_map=None) -> bool:
+    """算法在该地图上是否直接输出任意角度路点（回退到A*时不是）"""
+    return get_algorithm(algorithm_name, grid_map) in ANY_ANGLE_SEARCHES
+
+def postprocess_path(grid_map, path: List[Tuple[int, int]], smooth: bool = False,
+                     check_collision: bool = False, stats: Optional[SearchStats] = None,
+                     any_angle: bool = False) -> List[Tuple[int, int]]:
+    """
+    对路径进行平滑和碰撞修正，指定stats时各步骤的耗时记录到stats.timings
+
+    any_angle为True（路径来自Theta*等任意角度算法，见is_any_angle）时原样返回：
+    路点之间的直线段已经检查过视线，平滑和碰撞修正按相邻格子处理，反而会破坏路径。
+    """
+    if any_angle:
+        return path
+
+    # 如果需要路径平滑
+    if smooth and len(path) > 2:
+        with _timed(stats, "smooth_path"):
+            path = smooth_path(grid_map, path)
+
+    # 如果需要碰撞检查
+    if check_collision:
+        with _timed(stats, "check_and_fix_collision"):
+            path = check_and_fix_collision(grid_map, path)
+
+    return path
+
+def compute_path_metrics(grid_map, path: List[Tuple[int, int]]) -> Tuple[float, float]:
+    """
+    计算路径长度和代价
+
+    相邻格子之间的代价为get_movement_cost；不相邻的路点（任意角度路径、平滑后的路径）之间
+    按直线段计算，见theta_star.segment_costs，直线经过障碍物时代价为inf。
+    """
+    path_length = 0.0
+    path_cost = 0.0
+
+    for i in range(1, len(path)):
+        x1, y1 = path[i-1]
+        x2, y2 = path[i]
+        segment_length = euclidean_distance((x1, y1), (x2, y2))
+        path_length += segment_length
+        if abs(x2 - x1) <= 1 and abs(y2 - y1) <= 1:
+            path_cost += grid_map.get_movement_cost(x1, y1, x2, y2)
+        else:
+            path_cost += segment_cost(grid_map, (x1, y1), (x2, y2))
+
+    return path_length, path_cost
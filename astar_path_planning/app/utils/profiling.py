@@ -0,0 +1,188 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+# 性能分析方式：deterministic（cProfile，记录每次函数调用）或 sampling（定时采样调用栈，开销小但有统计误差）
+PROFILE_MODES = ("deterministic", "sampling")
+# 采样间隔（秒）；受GIL切换间隔限制，CPU密集的线程实际采样频率可能更低
+SAMPLE_INTERVAL = 0.001
+
+# 包根目录，报告中的文件路径相对它显示
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Python 3.12起同一时刻只能有一个cProfile处于启用状态，确定性分析依次进行
+_deterministic_lock = threading.Lock()
+
+# 采样期间缩短GIL切换间隔，否则CPU密集的线程每5ms才让出一次GIL，采样线程拿不到足够的样本
+_switch_lock = threading.Lock()
+_active_samplers = 0
+_saved_switch_interval = 0.0
+
+
+def _location(filename: str, lineno: int) -> str:
+    """函数的源码位置，包内文件显示相对路径"""
+    if filename.startswith(_PACKAGE_ROOT):
+        filename = os.path.relpath(filename, os.path.dirname(_PACKAGE_ROOT))
+    elif os.path.sep in filename:
+        filename = os.path.basename(filename)
+    return f"{filename}:{lineno}" if lineno else filename
+
+
+class SamplingProfiler:
+    """
+    采样分析器：后台线程定时读取被分析线程的调用栈
+
+    每个样本中位于栈顶的函数计入自身时间，栈上出现的每个函数计入累计时间，
+    时间按样本比例分摊总耗时估算。不修改被分析的代码，适合分析很慢的请求。
+    采样期间进程的GIL切换间隔缩短为采样间隔，其他线程的调度会稍微频繁一些。
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter = Counter()  # (文件, 行号, 函数名) -> 位于栈顶的样本数
+        self.total_counts: Counter = Counter()  # (文件, 行号, 函数名) -> 出现在栈上的样本数
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        global _active_samplers, _saved_switch_interval
+        with _switch_lock:
+            if _active_samplers == 0:
+                _saved_switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(self.interval, _saved_switch_interval))
+            _active_samplers += 1
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, name="astar-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_samplers
+        self._stop.set()
+        self._sampler.join()
+        with _switch_lock:
+            _active_samplers -= 1
+            if _active_samplers == 0:
+                sys.setswitchinterval(_saved_switch_interval)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            # 被分析的线程已结束调用、正在等待采样线程退出时不再采样
+            if frame is None or self._stop.is_set():
+                continue
+            seen = set()
+            leaf = True
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                if leaf:
+                    self.self_counts[key] += 1
+                    leaf = False
+                if key not in seen:
+                    seen.add(key)
+                    self.total_counts[key] += 1
+                frame = frame.f_back
+            self.samples += 1
+
+    def functions(self, total_time: float) -> List[Dict[str, Any]]:
+        """按自身时间从高到低排列的函数统计"""
+        scale = total_time / self.samples if self.samples else 0.0
+        return [{
+            "function": key[2],
+            "location": _location(key[0], key[1]),
+            "calls": None,
+            "self_time": self.self_counts.get(key, 0) * scale,
+            "cumulative_time": count * scale,
+        } for key, count in self.total_counts.items()]
+
+
+def _deterministic_functions(profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+    """把cProfile的结果转换为函数统计"""
+    stats = pstats.Stats(profiler)
+    return [{
+        "function": name,
+        "location": _location(filename, lineno),
+        "calls": calls,
+        "self_time": self_time,
+        "cumulative_time": cumulative_time,
+    } for (filename, lineno, name), (_, calls, self_time, cumulative_time, _) in stats.stats.items()]
+
+
+def run_profiled(func: Callable, *args, mode: str = "deterministic", top: int = 25,
+                 output_dir: str = "") -> Tuple[Any, Dict[str, Any]]:
+    """
+    在当前线程中调用func(*args)并进行性能分析
+
+    参数:
+        func: 被分析的函数
+        mode: 分析方式，见PROFILE_MODES
+        top: 报告中保留的函数数量（按自身时间排序）
+        output_dir: 不为空时把完整结果写入该目录：确定性分析写<报告ID>.prof（可用pstats或snakeviz查看），
+                    采样分析写<报告ID>.txt（全部函数的估算时间）
+
+    返回:
+        (func的返回值, 报告字典)；报告包括profile_id、mode、total_time、samples（采样分析的样本数）、
+        functions（按自身时间排序的热点函数）和file（写入的文件路径）
+
+    异常:
+        ValueError: 未知的分析方式
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"未知的性能分析方式{mode}，只支持{'、'.join(PROFILE_MODES)}")
+
+    profile_id = uuid.uuid4().hex
+    samples = None
+    if mode == "deterministic":
+        profiler = cProfile.Profile()
+        with _deterministic_lock:
+            start_time = time.perf_counter()
+            profiler.enable()
+            try:
+                result = func(*args)
+            finally:
+                profiler.disable()
+                total_time = time.perf_counter() - start_time
+        functions = _deterministic_functions(profiler)
+    else:
+        sampler = SamplingProfiler()
+        start_time = time.perf_counter()
+        with sampler:
+            result = func(*args)
+        total_time = time.perf_counter() - start_time
+        functions = sampler.functions(total_time)
+        samples = sampler.samples
+
+    functions.sort(key=lambda f: (f["self_time"], f["cumulative_time"]), reverse=True)
+    file_path = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        if mode == "deterministic":
+            file_path = os.path.join(output_dir, f"{profile_id}.prof")
+            profiler.dump_stats(file_path)
+        else:
+            file_path = os.path.join(output_dir, f"{profile_id}.txt")
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(f"# samples={samples} total_time={total_time:.6f}\n")
+                for entry in functions:
+                    f.write(f"{entry['self_time']:.6f}\t{entry['cumulative_time']:.6f}\t"
+                            f"{entry['function']}\t{entry['location']}\n")
+
+    report = {
+        "profile_id": profile_id,
+        "mode": mode,
+        "total_time": total_time,
+        "samples": samples,
+        "functions": functions[:top],
+        "file": file_path,
+    }
+    return result, report
@@ -0,0 +1,212 @@
+import io
+import math
+import struct
+import zlib
+from typing import Optional, Tuple
+import numpy as np
+from matplotlib.figure import Figure
+from astar_path_planning.app.models.grid_map import TerrainMap
+
+# 地形颜色查找表：地形类型 -> RGB，超出范围的地形类型使用最后一项
+TERRAIN_PALETTE = np.array([
+    [255, 255, 255],  # 白色-平地
+    [153, 76, 25],    # 棕色-山地
+    [51, 127, 204],   # 蓝色-水域
+    [204, 204, 153],  # 其他地形
+], dtype=np.uint8)
+OBSTACLE_COLOR = np.array([0, 0, 0], dtype=np.uint8)
+FREE_COLOR = np.array([255, 255, 255], dtype=np.uint8)
+
+EXPLORED_COLOR = np.array([173, 216, 230], dtype=np.float32)  # lightblue
+EXPLORED_ALPHA = 0.5
+GRID_LINE_COLOR = np.array([128, 128, 128], dtype=np.float32)
+GRID_LINE_ALPHA = 0.2
+PATH_COLOR = np.array([255, 0, 0], dtype=np.uint8)
+START_COLOR = np.array([0, 128, 0], dtype=np.uint8)
+GOAL_COLOR = np.array([0, 0, 255], dtype=np.uint8)
+
+# PNG输出的目标边长（像素），用于确定每个格子放大的倍数
+TARGET_IMAGE_SIZE = 800
+MAX_CELL_PIXELS = 16
+# 每个格子至少放大到这么多像素才绘制网格线
+MIN_GRID_LINE_PIXELS = 4
+# SVG中超过该尺寸的地图不绘制逐格子网格线
+MAX_SVG_GRID_LINES = 200
+
+
+def sample_step(width: int, height: int, max_image_size: int) -> int:
+    """
+    计算渲染时的采样步长，地图边长超过max_image_size时每隔step个格子取一个
+
+    返回:
+        采样步长，不需要降采样时为1
+    """
+    return max(1, math.ceil(max(width, height) / max_image_size))
+
+
+def cell_scale(width: int, height: int) -> int:
+    """PNG输出中每个（采样后的）格子放大的像素数"""
+    return max(1, min(MAX_CELL_PIXELS, TARGET_IMAGE_SIZE // max(width, height)))
+
+
+def render_base(grid_map, step: int = 1, show_map: bool = True) -> np.ndarray:
+    """
+    用查找表一次性生成地图底图，每个采样格子对应一个像素
+
+    参数:
+        grid_map: 栅格地图对象（分块地图只读取采样到的行列）
+        step: 采样步长
+        show_map: 为False时返回全白底图
+
+    返回:
+        (ceil(height/step), ceil(width/step), 3) 的uint8 RGB数组
+    """
+    obstacles = np.asarray(grid_map.grid[::step, ::step])
+    if not show_map:
+        return np.broadcast_to(FREE_COLOR, obstacles.shape + (3,)).copy()
+    if isinstance(grid_map, TerrainMap):
+        terrain = np.asarray(grid_map.terrain_type[::step, ::step])
+        image = TERRAIN_PALETTE[np.clip(terrain, 0, len(TERRAIN_PALETTE) - 1)]
+    else:
+        image = np.broadcast_to(FREE_COLOR, obstacles.shape + (3,)).copy()
+    image[obstacles] = OBSTACLE_COLOR
+    return image
+
+
+def _overlay_explored(image: np.ndarray, explored: Optional[np.ndarray], step: int) -> np.ndarray:
+    """在采样格子分辨率上把探索过的格子与浅蓝色混合"""
+    if explored is None or len(explored) == 0:
+        return image
+    height, width = image.shape[:2]
+    mask = np.zeros((height, width), dtype=bool)
+    xs = np.clip(explored[:, 0] // step, 0, width - 1)
+    ys = np.clip(explored[:, 1] // step, 0, height - 1)
+    mask[ys, xs] = True
+    blended = image.copy()
+    blended[mask] = (image[mask] * (1 - EXPLORED_ALPHA) + EXPLORED_COLOR * EXPLORED_ALPHA).astype(np.uint8)
+    return blended
+
+
+def _draw_grid_lines(image: np.ndarray, scale: int):
+    """在每个格子的左边和上边绘制半透明网格线"""
+    for lines in (image[::scale, :], image[:, ::scale]):
+        lines[...] = (lines * (1 - GRID_LINE_ALPHA) + GRID_LINE_COLOR * GRID_LINE_ALPHA).astype(np.uint8)
+
+
+def _stamp(image: np.ndarray, px: np.ndarray, py: np.ndarray, radius: int, color: np.ndarray, round_shape: bool):
+    """以每个(px, py)为中心绘制边长2*radius+1的方块（或圆点）"""
+    height, width = image.shape[:2]
+    for oy in range(-radius, radius + 1):
+        for ox in range(-radius, radius + 1):
+            if round_shape and ox * ox + oy * oy > radius * radius:
+                continue
+            xs = px + ox
+            ys = py + oy
+            inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            image[ys[inside], xs[inside]] = color
+
+
+def _draw_path(image: np.ndarray, path: np.ndarray, step: int, scale: int):
+    """把路径画成经过格子中心的折线，并标记起点和终点"""
+    # 格子中心的像素坐标
+    centers = (path / step + 0.5) * scale
+    segments = []
+    for (x1, y1), (x2, y2) in zip(centers[:-1], centers[1:]):
+        samples = int(math.ceil(max(abs(x2 - x1), abs(y2 - y1)))) + 1
+        t = np.linspace(0.0, 1.0, samples)
+        segments.append(np.stack([x1 + (x2 - x1) * t, y1 + (y2 - y1) * t], axis=1))
+    if segments:
+        points = np.rint(np.concatenate(segments)).astype(np.intp)
+        _stamp(image, points[:, 0], points[:, 1], max(1, scale // 4), PATH_COLOR, False)
+
+    ends = np.rint(centers[[0, -1]]).astype(np.intp)
+    radius = max(2, scale // 2)
+    _stamp(image, ends[:1, 0], ends[:1, 1], radius, START_COLOR, True)
+    _stamp(image, ends[1:, 0], ends[1:, 1], radius, GOAL_COLOR, True)
+
+
+def compose_image(base: np.ndarray, step: int, path: Optional[np.ndarray] = None,
+                  explored: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    在底图上叠加探索节点和路径，生成最终的RGB图像
+
+    参数:
+        base: render_base生成的底图（不会被修改）
+        step: 底图的采样步长
+        path: 路径坐标(N, 2)数组，为None时不绘制
+        explored: 探索节点坐标(M, 2)数组，为None时不绘制
+
+    返回:
+        放大后的uint8 RGB数组
+    """
+    height, width = base.shape[:2]
+    scale = cell_scale(width, height)
+    cells = _overlay_explored(base, explored, step)
+    image = np.repeat(np.repeat(cells, scale, axis=0), scale, axis=1)
+    if scale >= MIN_GRID_LINE_PIXELS:
+        _draw_grid_lines(image, scale)
+    if path is not None and len(path) > 0:
+        _draw_path(image, path, step, scale)
+    return image
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+
+def encode_png(image: np.ndarray, level: int = 1) -> bytes:
+    """
+    把(height, width, 3)的uint8数组直接编码为PNG，不经过matplotlib
+
+    每行使用无过滤（filter type 0），整体用zlib压缩。
+    地图图像大面积同色，最低压缩级别已能压缩得很小，而编码速度快数倍。
+    """
+    height, width = image.shape[:2]
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = np.ascontiguousarray(image, dtype=np.uint8).reshape(height, width * 3)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)  # 8位RGB
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(rows.tobytes(), level)) + _png_chunk(b"IEND", b""))
+
+
+def render_svg(base: np.ndarray, step: int, size: Tuple[int, int], path: Optional[np.ndarray] = None,
+               explored: Optional[np.ndarray] = None) -> bytes:
+    """
+    用matplotlib生成矢量SVG，底图作为图像嵌入，路径和探索节点为矢量图形
+
+    直接创建Figure对象而不使用pyplot，不依赖全局状态，可在多线程中使用。
+
+    参数:
+        base: render_base生成的底图
+        step: 底图的采样步长
+        size: 地图尺寸(width, height)
+    """
+    width, height = size
+    dpi = 100
+    fig = Figure(figsize=(min(width, TARGET_IMAGE_SIZE) / dpi * 3, min(height, TARGET_IMAGE_SIZE) / dpi * 3), dpi=dpi)
+    ax = fig.add_subplot()
+
+    # 底图像素覆盖step个格子，extent使坐标轴仍以格子为单位
+    ax.imshow(base, origin='upper', interpolation='nearest',
+              extent=(-0.5, base.shape[1] * step - 0.5, base.shape[0] * step - 0.5, -0.5))
+    ax.set_xlim(-0.5, width - 0.5)
+    ax.set_ylim(height - 0.5, -0.5)
+
+    if explored is not None and len(explored) > 0:
+        ax.scatter(explored[:, 0], explored[:, 1], color='lightblue', marker='o', alpha=0.5, s=10)
+
+    if path is not None and len(path) > 0:
+        ax.plot(path[:, 0], path[:, 1], color='red', linewidth=2)
+        ax.scatter(path[0, 0], path[0, 1], color='green', marker='o', s=100)
+        ax.scatter(path[-1, 0], path[-1, 1], color='blue', marker='*', s=100)
+
+    if max(width, height) <= MAX_SVG_GRID_LINES:
+        ax.set_xticks(np.arange(-0.5, width, 1), minor=True)
+        ax.set_yticks(np.arange(-0.5, height, 1), minor=True)
+        ax.grid(which='minor', color='gray', linestyle='-', linewidth=0.5, alpha=0.2)
+    ax.tick_params(which='both', bottom=False, left=False, labelbottom=False, labelleft=False)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='svg', bbox_inches='tight')
+    return buf.getvalue()
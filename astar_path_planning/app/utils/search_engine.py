@@ -0,0 +1,629 @@
+import heapq
+import threading
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager
+from typing import List, Tuple, Callable, Optional, Iterator, Dict, Any
+import numpy as np
+from astar_path_planning.app.models.grid_map import DIRECTIONS, MASK_DIRECTIONS
+
+# 节点在open/closed中的状态
+STATE_NEW = 0      # 尚未访问
+STATE_OPEN = 1     # 在open集合中
+STATE_CLOSED = 2   # 已扩展（closed集合）
+
+INF = float('inf')
+
+# 格子总数超过该值时改用按需分配的稀疏缓冲区（分块大地图），不再预分配整张地图的数组
+SPARSE_BUFFER_THRESHOLD = 1 << 22
+
+# 每个线程最多缓存的不同地图尺寸数量
+_MAX_POOLED_SIZES = 4
+# 每种尺寸最多缓存的缓冲区数量（双向搜索需要同时持有两份）
+_MAX_POOLED_PER_SIZE = 2
+
+# 搜索结束的原因
+STATUS_COMPLETE = "complete"      # 正常结束：找到路径或确认不可达
+STATUS_NODE_LIMIT = "node_limit"  # 扩展节点数达到上限
+STATUS_TIMEOUT = "timeout"        # 超过时间上限
+STATUS_CANCELLED = "cancelled"    # 被调用方取消（如客户端断开连接）
+
+# 搜索核心每扩展这么多节点检查一次预算
+BUDGET_CHECK_INTERVAL = 256
+
+_local = threading.local()
+
+
+class SearchBudget:
+    """
+    单次搜索的资源预算：扩展节点数上限、墙钟时间上限和取消标志
+
+    用 with budget: 在当前线程激活后，该线程中运行的搜索核心每隔BUDGET_CHECK_INTERVAL个节点检查一次预算，
+    超出预算或被取消时提前结束，返回(None, 已探索节点)，并在status中记录原因。
+    A*核心还会把到已扩展节点中离终点最近（启发值最小）的节点的路径记录在partial_path中。
+    cancel()可以从其他线程调用。
+    """
+
+    def __init__(self, max_nodes: int = 0, timeout: float = 0.0):
+        """
+        参数:
+            max_nodes: 最多扩展的节点数，为0时不限制
+            timeout: 时间上限（秒），为0时不限制，从激活时开始计时
+        """
+        self.max_nodes = max_nodes
+        self.timeout = timeout
+        self.deadline = None
+        self.status = STATUS_COMPLETE
+        self.partial_path: Optional[List[Tuple[int, int]]] = None
+        self.cancelled = False
+
+    def start(self):
+        """开始计时"""
+        if self.deadline is None and self.timeout > 0:
+            self.deadline = time.monotonic() + self.timeout
+
+    def cancel(self):
+        """请求停止搜索"""
+        self.cancelled = True
+
+    def __enter__(self):
+        self.start()
+        self._previous = getattr(_local, 'budget', None)
+        _local.budget = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.budget = self._previous
+
+    def next_check(self, nodes_explored: int) -> int:
+        """下一次检查预算时的扩展节点数"""
+        next_check = nodes_explored + BUDGET_CHECK_INTERVAL
+        if nodes_explored < self.max_nodes < next_check:
+            return self.max_nodes
+        return next_check
+
+    def exhausted(self, nodes_explored: int) -> bool:
+        """检查预算，超出预算或被取消时记录原因并返回True"""
+        if self.cancelled:
+            self.status = STATUS_CANCELLED
+        elif self.max_nodes and nodes_explored >= self.max_nodes:
+            self.status = STATUS_NODE_LIMIT
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            self.status = STATUS_TIMEOUT
+        else:
+            return False
+        return True
+
+
+def current_budget() -> Optional[SearchBudget]:
+    """当前线程激活的搜索预算，没有时返回None"""
+    return getattr(_local, 'budget', None)
+
+
+class SearchStats:
+    """
+    搜索插桩计数器：堆操作、节点扩展、邻居评估和代价函数调用次数，以及后处理各步骤的耗时
+
+    用 with stats: 在当前线程激活后，该线程中开始的搜索把计数累加到这里。
+    计数通过在搜索开始时把heapq函数、后继函数和代价函数替换为计数版本实现，
+    没有激活时搜索核心使用原始函数，循环中没有任何额外判断。
+
+    heap_pops中包含惰性删除的过期条目，stale_pops = heap_pops - expansions。
+    跳点搜索的跳跃过程和分层A*抽象图上的搜索不计入邻居评估。
+    """
+
+    COUNTERS = ("heap_pushes", "heap_pops", "expansions", "neighbor_evaluations", "cost_calls", "heuristic_calls")
+
+    def __init__(self):
+        self.heap_pushes = 0
+        self.heap_pops = 0
+        self.expansions = 0
+        self.neighbor_evaluations = 0
+        self.cost_calls = 0
+        self.heuristic_calls = 0
+        self.timings: Dict[str, float] = {}  # 步骤名称 -> 累计耗时（秒）
+
+    @property
+    def stale_pops(self) -> int:
+        """弹出后因节点已扩展而被跳过的过期堆条目数"""
+        return max(self.heap_pops - self.expansions, 0)
+
+    def __enter__(self):
+        self._previous = getattr(_local, 'stats', None)
+        _local.stats = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.stats = self._previous
+
+    def heap_functions(self):
+        """返回计数版本的(heappush, heappop)"""
+        push, pop = heapq.heappush, heapq.heappop
+
+        def counted_push(heap, item):
+            self.heap_pushes += 1
+            push(heap, item)
+
+        def counted_pop(heap):
+            self.heap_pops += 1
+            return pop(heap)
+
+        return counted_push, counted_pop
+
+    def count_neighbors(self, successors: Callable[[int], List[Tuple[int, float]]]):
+        """返回统计邻居评估次数的后继函数"""
+        def counted(idx: int) -> List[Tuple[int, float]]:
+            result = successors(idx)
+            self.neighbor_evaluations += len(result)
+            return result
+        return counted
+
+    def count_calls(self, func: Callable, counter: str) -> Callable:
+        """返回每次调用时把计数器counter加一的函数"""
+        def counted(*args):
+            setattr(self, counter, getattr(self, counter) + 1)
+            return func(*args)
+        return counted
+
+    @contextmanager
+    def timer(self, name: str):
+        """把with块的耗时累加到timings[name]"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为可序列化的字典"""
+        result = {name: getattr(self, name) for name in self.COUNTERS}
+        result["stale_pops"] = self.stale_pops
+        result["timings"] = dict(self.timings)
+        return result
+
+
+def current_stats() -> Optional[SearchStats]:
+    """当前线程激活的插桩计数器，没有时返回None"""
+    return getattr(_local, 'stats', None)
+
+
+def heap_functions(stats: Optional[SearchStats]):
+    """搜索使用的(heappush, heappop)：未启用插桩时为heapq的原始函数"""
+    if stats is None:
+        return heapq.heappush, heapq.heappop
+    return stats.heap_functions()
+
+
+class SearchBuffers:
+    """
+    搜索状态缓冲区
+
+    所有状态都保存在按 y*width+x 索引的扁平数组中：
+        g_score: 起点到节点的代价
+        parent:  父节点索引，-1表示无父节点
+        state:   节点状态（STATE_NEW / STATE_OPEN / STATE_CLOSED），
+                 open集合的成员判断只需一次数组访问，不再扫描整个堆
+        touched: 本次搜索修改过的索引，用于在归还时只重置被修改的部分
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.g_score = [INF] * size
+        self.parent = [-1] * size
+        self.state = bytearray(size)
+        self.touched: List[int] = []
+
+    def reset(self):
+        """只重置本次搜索修改过的索引"""
+        g_score = self.g_score
+        parent = self.parent
+        state = self.state
+        for idx in self.touched:
+            g_score[idx] = INF
+            parent[idx] = -1
+            state[idx] = STATE_NEW
+        self.touched = []
+
+
+class _DefaultDict(dict):
+    """读取不存在的键时返回默认值但不插入，行为上等同于填满默认值的数组"""
+
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+
+class SparseSearchBuffers:
+    """
+    大地图使用的稀疏搜索缓冲区
+
+    与SearchBuffers接口相同，g_score、parent、state只保存搜索实际访问过的节点，
+    内存占用与探索范围成正比，而不是与地图大小成正比。
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.g_score = _DefaultDict(INF)
+        self.parent = _DefaultDict(-1)
+        self.state = _DefaultDict(STATE_NEW)
+        self.touched: List[int] = []
+
+    def reset(self):
+        self.g_score.clear()
+        self.parent.clear()
+        self.state.clear()
+        self.touched = []
+
+
+class ExploredNodes(Sequence):
+    """
+    按扩展顺序排列的已探索节点
+
+    内部只保存扁平索引，按需转换为(x, y)坐标，用法与坐标列表相同。
+    不需要逐个坐标的调用方（如只统计数量或生成位图）可以跳过转换。
+    """
+
+    __slots__ = ("indices", "width")
+
+    def __init__(self, indices: List[int], width: int):
+        self.indices = indices
+        self.width = width
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return ExploredNodes(self.indices[i], self.width)
+        return divmod(self.indices[i], self.width)[::-1]
+
+    def __iter__(self):
+        width = self.width
+        for idx in self.indices:
+            yield idx % width, idx // width
+
+    def __eq__(self, other):
+        if isinstance(other, ExploredNodes):
+            return self.width == other.width and self.indices == other.indices
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __add__(self, other):
+        if isinstance(other, ExploredNodes) and other.width == self.width:
+            return ExploredNodes(self.indices + other.indices, self.width)
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self) -> str:
+        return f"ExploredNodes({list(self)!r})"
+
+    def coordinates(self) -> Tuple[np.ndarray, np.ndarray]:
+        """转换为(xs, ys)两个整数数组，不逐个生成坐标元组"""
+        ys, xs = np.divmod(np.asarray(self.indices, dtype=np.intp), self.width)
+        return xs, ys
+
+
+def acquire_buffers(size: int) -> SearchBuffers:
+    """
+    获取指定尺寸的搜索缓冲区，同一线程内相同尺寸的地图会复用已分配的缓冲区
+
+    参数:
+        size: 地图格子总数(width * height)
+
+    返回:
+        处于初始状态的SearchBuffers；格子总数超过SPARSE_BUFFER_THRESHOLD时返回SparseSearchBuffers
+    """
+    if size > SPARSE_BUFFER_THRESHOLD:
+        return SparseSearchBuffers(size)
+    pool = getattr(_local, 'pool', None)
+    if pool is not None:
+        free = pool.get(size)
+        if free:
+            return free.pop()
+    return SearchBuffers(size)
+
+
+def release_buffers(buffers: SearchBuffers):
+    """重置并归还搜索缓冲区，供后续同尺寸查询复用"""
+    buffers.reset()
+    if isinstance(buffers, SparseSearchBuffers):
+        return
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = {}
+    free = pool.get(buffers.size)
+    if free is None:
+        if len(pool) >= _MAX_POOLED_SIZES:
+            pool.clear()
+        free = pool[buffers.size] = []
+    if len(free) < _MAX_POOLED_PER_SIZE:
+        free.append(buffers)
+
+
+def make_successor_func(grid_map) -> Callable[[int], List[Tuple[int, float]]]:
+    """
+    构造后继函数，返回 successors(idx) -> [(邻居索引, 移动代价), ...]
+
+    地图提供neighbor_mask时直接通过方向查找表读取邻居，has_edge_costs为True时
+    直接从边代价张量读取代价，否则退回到地图的get_neighbors和get_movement_cost接口。
+
+    参数:
+        grid_map: 栅格地图对象
+    """
+    width = grid_map.width
+    get_neighbors = grid_map.get_neighbors
+    get_movement_cost = grid_map.get_movement_cost
+    stats = current_stats()
+    if stats is not None:
+        get_movement_cost = stats.count_calls(get_movement_cost, "cost_calls")
+
+    neighbor_mask = getattr(grid_map, 'neighbor_mask', None)
+    if neighbor_mask is not None and getattr(grid_map, 'has_edge_costs', False):
+        mask_item = neighbor_mask.item
+        # 代价直接从边代价张量读取，不再逐边调用get_movement_cost
+        cost_item = grid_map.get_edge_costs().item
+        offsets = [dy * width + dx for dx, dy in DIRECTIONS]
+        mask_steps = [[(offsets[d], d) for d in directions] for directions in MASK_DIRECTIONS]
+
+        def successors(idx: int) -> List[Tuple[int, float]]:
+            base = idx * 8
+            return [(idx + offset, cost_item(base + d)) for offset, d in mask_steps[mask_item(idx)]]
+
+        return successors
+
+    if neighbor_mask is not None:
+        mask_item = neighbor_mask.item
+        # 每个方向编号对应的(索引偏移, dx, dy)
+        steps = [(dy * width + dx, dx, dy) for dx, dy in DIRECTIONS]
+        mask_steps = [[steps[d] for d in directions] for directions in MASK_DIRECTIONS]
+
+        def successors(idx: int) -> List[Tuple[int, float]]:
+            y, x = divmod(idx, width)
+            return [(idx + offset, get_movement_cost(x, y, x + dx, y + dy))
+                    for offset, dx, dy in mask_steps[mask_item(idx)]]
+
+        return successors
+
+    def successors(idx: int) -> List[Tuple[int, float]]:
+        y, x = divmod(idx, width)
+        return [(ny * width + nx, get_movement_cost(x, y, nx, ny))
+                for nx, ny in get_neighbors(x, y)]
+
+    return successors
+
+
+def make_predecessor_func(grid_map) -> Callable[[int], List[Tuple[int, float]]]:
+    """
+    构造前驱函数，返回 predecessors(idx) -> [(前驱索引, 从前驱移动到idx的代价), ...]
+
+    用于从终点出发的反向搜索。TerrainMap等地图的代价取决于目标格子，
+    因此反向边的代价必须按"前驱 -> idx"的方向计算，而不是简单对调。
+
+    参数:
+        grid_map: 栅格地图对象
+    """
+    width = grid_map.width
+    get_neighbors = grid_map.get_neighbors
+    get_movement_cost = grid_map.get_movement_cost
+    stats = current_stats()
+    if stats is not None:
+        get_movement_cost = stats.count_calls(get_movement_cost, "cost_calls")
+
+    neighbor_mask = getattr(grid_map, 'neighbor_mask', None)
+    if neighbor_mask is not None and getattr(grid_map, 'has_edge_costs', False):
+        mask_item = neighbor_mask.item
+        cost_item = grid_map.get_edge_costs().item
+        # 前驱沿相反方向(7 - d)移动一步到达idx
+        offsets = [dy * width + dx for dx, dy in DIRECTIONS]
+        mask_steps = [[(offsets[d], offsets[d] * 8 + 7 - d) for d in directions]
+                      for directions in MASK_DIRECTIONS]
+
+        def predecessors(idx: int) -> List[Tuple[int, float]]:
+            base = idx * 8
+            return [(idx + offset, cost_item(base + cost_offset))
+                    for offset, cost_offset in mask_steps[mask_item(idx)]]
+
+        return predecessors
+
+    # 邻居关系是对称的：可通行格子的邻居也以它为邻居
+    def predecessors(idx: int) -> List[Tuple[int, float]]:
+        y, x = divmod(idx, width)
+        return [(ny * width + nx, get_movement_cost(nx, ny, x, y))
+                for nx, ny in get_neighbors(x, y)]
+
+    return predecessors
+
+
+def reconstruct_path(parent, goal_idx: int, width: int) -> List[Tuple[int, int]]:
+    """根据父节点数组重建从起点到goal_idx的路径"""
+    path = []
+    idx = goal_idx
+    while idx != -1:
+        path.append((idx % width, idx // width))
+        idx = parent[idx]
+    path.reverse()
+    return path
+
+
+class SearchProgress:
+    """
+    流式搜索中每一批的输出
+
+    explored:       本批新扩展的节点（ExploredNodes）
+    frontier:       open集合中f值最小的若干节点[(x, y, f), ...]
+    open_size:      open堆中的条目数（包含惰性删除的过期条目）
+    nodes_explored: 到目前为止扩展的节点总数
+    done:           搜索是否已结束
+    path:           搜索结束且找到路径时为路径坐标列表，否则为None
+    """
+
+    __slots__ = ("explored", "frontier", "open_size", "nodes_explored", "done", "path")
+
+    def __init__(self, explored, frontier, open_size, nodes_explored, done=False, path=None):
+        self.explored = explored
+        self.frontier = frontier
+        self.open_size = open_size
+        self.nodes_explored = nodes_explored
+        self.done = done
+        self.path = path
+
+
+def iter_best_first_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int],
+                           heuristic: Callable[[int, int], float],
+                           successors: Optional[Callable[[int], List[Tuple[int, float]]]] = None,
+                           chunk_size: int = 0, frontier_limit: int = 0,
+                           budget: Optional[SearchBudget] = None,
+                           stats: Optional[SearchStats] = None) -> Iterator[SearchProgress]:
+    """
+    基于扁平数组的通用A*搜索核心，以生成器形式分批输出搜索进度
+
+    每扩展chunk_size个节点产出一个SearchProgress，最后一个的done为True并带有路径。
+    生成器被提前关闭时（例如客户端断开连接）搜索随之停止，缓冲区照常归还。
+
+    参数:
+        grid_map: 栅格地图对象
+        start: 起点坐标(x, y)
+        goal: 终点坐标(x, y)
+        heuristic: 启发函数 h(x, y)，返回节点到终点的估计代价（已包含权重）
+        successors: 后继函数，默认为make_successor_func(grid_map)；传入过滤后的函数可把搜索限制在部分区域内
+        chunk_size: 每批扩展的节点数，为0时只在搜索结束时产出一次
+        frontier_limit: 每批附带的open集合节点数上限，为0时不计算
+        budget: 搜索预算，默认使用当前线程激活的预算（生成器可能在不同线程中推进，因此在创建时确定）
+        stats: 插桩计数器，默认使用当前线程激活的计数器
+
+    返回:
+        SearchProgress迭代器
+    """
+    if budget is None:
+        budget = current_budget()
+    if stats is None:
+        stats = current_stats()
+    return _iter_best_first_search(grid_map, start, goal, heuristic, successors, chunk_size, frontier_limit,
+                                   budget, stats)
+
+
+def _iter_best_first_search(grid_map, start, goal, heuristic, successors, chunk_size, frontier_limit, budget, stats):
+    """iter_best_first_search的生成器实现，预算和计数器在调用iter_best_first_search时已确定"""
+    width = grid_map.width
+    if successors is None:
+        successors = make_successor_func(grid_map)
+    if stats is not None:
+        successors = stats.count_neighbors(successors)
+    buffers = acquire_buffers(width * grid_map.height)
+
+    try:
+        g_score = buffers.g_score
+        parent = buffers.parent
+        state = buffers.state
+        touched = buffers.touched
+        heappush, heappop = heap_functions(stats)
+
+        start_idx = start[1] * width + start[0]
+        goal_idx = goal[1] * width + goal[0]
+
+        g_score[start_idx] = 0.0
+        state[start_idx] = STATE_OPEN
+        touched.append(start_idx)
+        open_heap = [(heuristic(start[0], start[1]), start_idx)]
+        batch = []
+        nodes_explored = 0
+        batch_limit = chunk_size if chunk_size > 0 else -1
+        expanded = 0
+        next_check = budget.next_check(0) if budget is not None else -1
+
+        def frontier():
+            if frontier_limit <= 0:
+                return []
+            # 跳过已扩展的过期条目；同一节点可能有多个条目，只保留f值最小的一个
+            best = heapq.nsmallest(frontier_limit * 2, (entry for entry in open_heap if state[entry[1]] == STATE_OPEN))
+            seen = set()
+            nodes = []
+            for f, idx in best:
+                if idx not in seen and len(nodes) < frontier_limit:
+                    seen.add(idx)
+                    nodes.append((idx % width, idx // width, f))
+            return nodes
+
+        while open_heap:
+            _, current = heappop(open_heap)
+
+            # 惰性删除：节点被更优的条目提前扩展过，跳过过期条目
+            if state[current] == STATE_CLOSED:
+                continue
+            state[current] = STATE_CLOSED
+            batch.append(current)
+
+            if current == goal_idx:
+                path = reconstruct_path(parent, goal_idx, width)
+                yield SearchProgress(ExploredNodes(batch, width), [], len(open_heap),
+                                     nodes_explored + len(batch), True, path)
+                return
+
+            current_g = g_score[current]
+            for neighbor, cost in successors(current):
+                if state[neighbor] == STATE_CLOSED:
+                    continue
+
+                tentative_g = current_g + cost
+                if tentative_g < g_score[neighbor]:
+                    if state[neighbor] == STATE_NEW:
+                        state[neighbor] = STATE_OPEN
+                        touched.append(neighbor)
+                    g_score[neighbor] = tentative_g
+                    parent[neighbor] = current
+                    heappush(open_heap, (tentative_g + heuristic(neighbor % width, neighbor // width), neighbor))
+
+            expanded += 1
+            if expanded == next_check:
+                if budget.exhausted(expanded):
+                    # 预算用尽：记录到离终点最近的已扩展节点的路径作为部分结果
+                    closed = [idx for idx in touched if state[idx] == STATE_CLOSED]
+                    nearest = min(closed, key=lambda idx: heuristic(idx % width, idx // width))
+                    budget.partial_path = reconstruct_path(parent, nearest, width)
+                    yield SearchProgress(ExploredNodes(batch, width), [], len(open_heap),
+                                         nodes_explored + len(batch), True, None)
+                    return
+                next_check = budget.next_check(expanded)
+
+            if len(batch) == batch_limit:
+                nodes_explored += len(batch)
+                yield SearchProgress(ExploredNodes(batch, width), frontier(), len(open_heap),
+                                     nodes_explored)
+                batch = []
+
+        yield SearchProgress(ExploredNodes(batch, width), [], 0,
+                             nodes_explored + len(batch), True, None)
+    finally:
+        if stats is not None:
+            stats.expansions += sum(1 for idx in buffers.touched if buffers.state[idx] == STATE_CLOSED)
+        release_buffers(buffers)
+
+
+def best_first_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int],
+                      heuristic: Callable[[int, int], float],
+                      successors: Optional[Callable[[int], List[Tuple[int, float]]]] = None):
+    """
+    基于扁平数组的通用A*搜索核心
+
+    参数:
+        grid_map: 栅格地图对象
+        start: 起点坐标(x, y)
+        goal: 终点坐标(x, y)
+        heuristic: 启发函数 h(x, y)，返回节点到终点的估计代价（已包含权重）
+        successors: 后继函数，默认为make_successor_func(grid_map)；传入过滤后的函数可把搜索限制在部分区域内
+
+    返回:
+        如果找到路径，返回(路径, ExploredNodes)；否则返回(None, ExploredNodes)
+    """
+    # 不分批时生成器只产出一次，包含全部探索节点；迭代到底使生成器正常结束并归还缓冲区
+    for progress in iter_best_first_search(grid_map, start, goal, heuristic, successors):
+        pass
+    return progress.path, progress.explored
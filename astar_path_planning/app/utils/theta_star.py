@@ -0,0 +1,254 @@
+import math
+from typing import Dict, List, Optional, Tuple, Callable
+import numpy as np
+from astar_path_planning.app.models.grid_map import DIRECTIONS
+from astar_path_planning.app.utils.improved_astar import get_line_points
+from astar_path_planning.app.utils.search_engine import (
+    acquire_buffers, release_buffers, make_successor_func, reconstruct_path, current_budget, current_stats,
+    heap_functions, ExploredNodes, STATE_NEW, STATE_OPEN, STATE_CLOSED
+)
+
+SQRT2 = math.sqrt(2)
+
+# 相邻格子的偏移(dx + 1) * 3 + (dy + 1) -> DIRECTIONS中的方向编号
+_OFFSET_DIRECTIONS = np.full(9, -1, dtype=np.intp)
+for _d, (_dx, _dy) in enumerate(DIRECTIONS):
+    _OFFSET_DIRECTIONS[(_dx + 1) * 3 + _dy + 1] = _d
+
+
+def line_cells(x0: int, y0: int, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    用NumPy一次求出从(x0, y0)到多个终点的Bresenham直线经过的格子
+
+    与improved_astar.get_line_points逐点计算的结果相同：沿主轴第k步时，
+    副轴的偏移为ceil(k * 副轴长度 / 主轴长度 - 1/2)，用整数运算避免舍入误差。
+    每条直线上相邻的格子是八方向相邻的，因此视线可通行等价于存在一条对应的栅格路径。
+
+    参数:
+        x0, y0: 起点坐标
+        xs, ys: 终点坐标数组，终点不能与起点重合
+
+    返回:
+        (cx, cy, starts)：所有直线经过的格子（不含起点，含终点）依次拼接的坐标数组，
+        以及每条直线在拼接数组中的起始位置；第i条直线共有max(|dx|, |dy|)个格子
+    """
+    dx = xs - x0
+    dy = ys - y0
+    adx = np.abs(dx)
+    ady = np.abs(dy)
+    steps = np.maximum(adx, ady)
+    starts = np.cumsum(steps) - steps
+
+    line = np.repeat(np.arange(len(steps)), steps)
+    k = np.arange(len(line)) - starts[line] + 1
+    major = steps[line]
+    x_major = (adx > ady)[line]
+    minor_length = np.where(x_major, ady[line], adx[line])
+    minor = -((major - 2 * k * minor_length) // (2 * major))
+    cx = x0 + np.sign(dx)[line] * np.where(x_major, k, minor)
+    cy = y0 + np.sign(dy)[line] * np.where(x_major, minor, k)
+    return cx, cy, starts
+
+
+def _staircase_length(adx, ady):
+    """Bresenham直线对应的八方向折线长度：min(|dx|, |dy|)步对角移动，其余为直线移动"""
+    return np.maximum(adx, ady) + (SQRT2 - 1) * np.minimum(adx, ady)
+
+
+def _line_steps(width: int, dxs: np.ndarray, dys: np.ndarray) -> Tuple[List[np.ndarray], List[float]]:
+    """
+    计算从原点出发、到各相对位移(dx, dy)的直线每一步所用的边
+
+    返回:
+        (steps, scales)：steps[i]为第i条直线各步在边代价张量中的下标减去起点索引 * 8，
+        与起点位置无关；scales[i]为直线长度与八方向折线长度之比
+    """
+    cx, cy, starts = line_cells(0, 0, dxs, dys)
+    # 每一步的出发格子：每条直线的第一步从原点出发，其余从上一个格子出发
+    px = np.empty_like(cx)
+    py = np.empty_like(cy)
+    px[1:] = cx[:-1]
+    py[1:] = cy[:-1]
+    px[starts] = 0
+    py[starts] = 0
+    directions = _OFFSET_DIRECTIONS[(cx - px + 1) * 3 + cy - py + 1]
+    steps = np.split((py * width + px) * 8 + directions, starts[1:])
+    adx, ady = np.abs(dxs), np.abs(dys)
+    scales = np.hypot(adx, ady) / _staircase_length(adx, ady)
+    return steps, scales.tolist()
+
+
+def segment_costs(edge_costs: np.ndarray, width: int, origin: int, targets: List[int],
+                  cache: Optional[Dict[Tuple[int, int], Tuple[np.ndarray, int, float]]] = None) -> List[float]:
+    """
+    批量计算从origin到各目标格子的直线段代价
+
+    沿Bresenham直线逐格移动的代价之和按"直线长度 / 折线长度"缩放，即按直线的实际长度计算
+    同样的地形、高度差等代价；两点相邻时就是get_movement_cost。直线经过障碍物时有一步的代价为inf，
+    结果也为inf，因此代价有限即表示有视线。
+
+    直线经过的边只取决于相对位移，按位移缓存在cache中；所有目标的边代价用一次NumPy下标读取和
+    一次reduceat求和，不逐格调用get_movement_cost。
+
+    参数:
+        edge_costs: 展平的边代价张量（GridMap.get_edge_costs），下标为格子索引 * 8 + 方向编号
+        width: 地图宽度
+        origin: 起点的一维索引
+        targets: 目标格子的一维索引列表，不能包含origin
+        cache: 位移 -> (各步的相对边下标, 步数, 长度缩放系数)，同一宽度的地图可以共用；为None时不缓存
+
+    返回:
+        与targets对应的代价列表
+    """
+    if cache is None:
+        cache = {}
+    y0, x0 = divmod(origin, width)
+    keys = [(target % width - x0, target // width - y0) for target in targets]
+    missing = [key for key in dict.fromkeys(keys) if key not in cache]
+    if missing:
+        dxs, dys = np.array(missing, dtype=np.intp).T
+        steps, scales = _line_steps(width, dxs, dys)
+        for key, key_steps, scale in zip(missing, steps, scales):
+            cache[key] = (key_steps, len(key_steps), scale)
+
+    entries = [cache[key] for key in keys]
+    starts = []
+    offset = 0
+    for _, count, _ in entries:
+        starts.append(offset)
+        offset += count
+    indices = np.concatenate([key_steps for key_steps, _, _ in entries])
+    indices += origin * 8
+    grid_costs = np.add.reduceat(edge_costs[indices], starts).tolist()
+    return [grid_cost * scale for grid_cost, (_, _, scale) in zip(grid_costs, entries)]
+
+
+def segment_cost(grid_map, p1: Tuple[int, int], p2: Tuple[int, int]) -> float:
+    """
+    路径上任意两个路点之间直线段的代价，定义见segment_costs
+
+    没有稠密边代价张量的地图（分块地图）沿get_line_points逐步调用get_movement_cost。
+
+    参数:
+        grid_map: 栅格地图对象
+        p1: 起点(x, y)
+        p2: 终点(x, y)
+
+    返回:
+        直线段代价；直线经过障碍物或超出地图时为inf
+    """
+    if p1 == p2:
+        return 0.0
+    if not (grid_map.is_valid(*p1) and grid_map.is_valid(*p2)):
+        return float('inf')
+    if not grid_map.has_edge_costs:
+        points = get_line_points(p1[0], p1[1], p2[0], p2[1])
+        grid_cost = sum(grid_map.get_movement_cost(x1, y1, x2, y2)
+                        for (x1, y1), (x2, y2) in zip(points[:-1], points[1:]))
+        adx, ady = abs(p2[0] - p1[0]), abs(p2[1] - p1[1])
+        return grid_cost * math.hypot(adx, ady) / float(_staircase_length(adx, ady))
+    width = grid_map.width
+    edge_costs = grid_map.get_edge_costs().reshape(-1)
+    return segment_costs(edge_costs, width, p1[1] * width + p1[0], [p2[1] * width + p2[0]])[0]
+
+
+def theta_star_search(grid_map, start: Tuple[int, int], goal: Tuple[int, int],
+                      heuristic_func: Callable[[Tuple[int, int], Tuple[int, int]], float]):
+    """
+    Theta*任意角度路径规划算法
+
+    与A*相同地按八方向扩展节点，但更新邻居时先检查当前节点的父节点到邻居之间是否有视线，
+    有视线时邻居直接以父节点为父节点，代价按直线段计算（见segment_costs）。
+    路径因此由转折处的路点组成，不局限于45度的倍数，通常比八方向最短路径更短，
+    不再需要smooth_path事后平滑。每次扩展对所有邻居的视线检查用NumPy一次完成。
+
+    路点之间的直线段不保证是最短的任意角度路径（Theta*不是最优算法），
+    但每段直线都只经过可通行格子。
+
+    参数:
+        grid_map: 栅格地图对象
+        start: 起点坐标(x, y)
+        goal: 终点坐标(x, y)
+        heuristic_func: 启发函数
+
+    返回:
+        如果找到路径，返回(路点列表, ExploredNodes)；否则返回(None, ExploredNodes)
+    """
+    width = grid_map.width
+    edge_costs = grid_map.get_edge_costs().reshape(-1)
+    lines = {}  # 直线段的位移 -> 经过的边，见segment_costs
+    successors = make_successor_func(grid_map)
+    stats = current_stats()
+    if stats is not None:
+        successors = stats.count_neighbors(successors)
+    heappush, heappop = heap_functions(stats)
+
+    def h(idx: int) -> float:
+        return heuristic_func((idx % width, idx // width), goal)
+
+    start_idx = start[1] * width + start[0]
+    goal_idx = goal[1] * width + goal[0]
+    buffers = acquire_buffers(width * grid_map.height)
+    explored = []
+    try:
+        g_score = buffers.g_score
+        parent = buffers.parent
+        state = buffers.state
+        touched = buffers.touched
+
+        g_score[start_idx] = 0.0
+        state[start_idx] = STATE_OPEN
+        touched.append(start_idx)
+        open_heap = [(heuristic_func(start, goal), start_idx)]
+        budget = current_budget()
+        next_check = budget.next_check(0) if budget is not None else -1
+
+        while open_heap:
+            _, current = heappop(open_heap)
+            if state[current] == STATE_CLOSED:
+                continue
+            state[current] = STATE_CLOSED
+            explored.append(current)
+
+            if current == goal_idx:
+                return reconstruct_path(parent, goal_idx, width), ExploredNodes(explored, width)
+
+            neighbors = [(neighbor, step_cost) for neighbor, step_cost in successors(current)
+                         if state[neighbor] != STATE_CLOSED]
+            current_parent = parent[current]
+            if neighbors and current_parent != -1:
+                # 父节点到各邻居的视线和直线段代价，没有视线时为inf
+                shortcuts = segment_costs(edge_costs, width, current_parent,
+                                          [neighbor for neighbor, _ in neighbors], lines)
+                parent_g = g_score[current_parent]
+            else:
+                shortcuts = None
+
+            current_g = g_score[current]
+            for i, (neighbor, step_cost) in enumerate(neighbors):
+                tentative_g = current_g + step_cost
+                new_parent = current
+                if shortcuts is not None and parent_g + shortcuts[i] <= tentative_g:
+                    tentative_g = parent_g + shortcuts[i]
+                    new_parent = current_parent
+                if tentative_g < g_score[neighbor]:
+                    if state[neighbor] == STATE_NEW:
+                        state[neighbor] = STATE_OPEN
+                        touched.append(neighbor)
+                    g_score[neighbor] = tentative_g
+                    parent[neighbor] = new_parent
+                    heappush(open_heap, (tentative_g + h(neighbor), neighbor))
+
+            if len(explored) == next_check:
+                if budget.exhausted(len(explored)):
+                    # 预算用尽：记录到离终点最近的已扩展节点的路径作为部分结果
+                    nearest = min(explored, key=h)
+                    budget.partial_path = reconstruct_path(parent, nearest, width)
+                    break
+                next_check = budget.next_check(len(explored))
+
+        return None, ExploredNodes(explored, width)
+    finally:
+        if stats is not None:
+            stats.expansions += len(explored)
+        release_buffers(buffers)
@@ -0,0 +1 @@
+# 路径规划性能基准测试包
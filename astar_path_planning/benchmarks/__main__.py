@@ -0,0 +1,86 @@
+"""
+路径规划基准测试命令行
+
+用法示例:
+    python -m astar_path_planning.benchmarks --sizes 50 100 --output before.json
+    python -m astar_path_planning.benchmarks --sizes 50 100 --output after.json --compare before.json
+"""
+import argparse
+import json
+import sys
+from astar_path_planning.app.utils.planning import ALGORITHMS, heuristic_names
+from astar_path_planning.benchmarks.scenarios import MAP_TYPES, DEFAULT_SIZES, DEFAULT_QUERIES, DEFAULT_SEED, build_corpus
+from astar_path_planning.benchmarks.runner import run_benchmark, summarize, compare
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m astar_path_planning.benchmarks",
+                                     description="在固定种子的场景集合上运行所有路径规划算法并记录性能")
+    parser.add_argument("--map-types", nargs="+", choices=MAP_TYPES, default=list(MAP_TYPES), help="地图类型")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="地图边长")
+    parser.add_argument("--algorithms", nargs="+", choices=list(ALGORITHMS), help="算法，默认全部")
+    parser.add_argument("--heuristics", nargs="+", choices=list(heuristic_names()), help="启发函数，默认全部")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="每张地图的起点/终点对数量")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="场景种子")
+    parser.add_argument("--repeat", type=int, default=3, help="每个查询计时的次数")
+    parser.add_argument("--warmup", type=int, default=1, help="每个查询计时前不计时运行的次数")
+    parser.add_argument("--no-memory", action="store_true", help="不测量内存峰值（tracemalloc）")
+    parser.add_argument("--output", "-o", help="结果JSON文件路径")
+    parser.add_argument("--compare", help="与之对比的基准结果JSON文件")
+    parser.add_argument("--fail-on-quality-change", action="store_true",
+                        help="与基准对比时有路径代价变化则以状态码1退出")
+    parser.add_argument("--quiet", "-q", action="store_true", help="不输出进度")
+    return parser.parse_args(argv)
+
+
+def format_bytes(value):
+    if value is None:
+        return "-"
+    return f"{value / 1024 / 1024:.2f}MB"
+
+
+def print_summary(rows):
+    print(f"{'场景':<28}{'算法':<22}{'启发函数':<12}{'找到':>6}{'时间(ms)':>12}{'扩展节点':>12}{'内存峰值':>12}{'非最优':>8}")
+    for row in rows:
+        print(f"{row['scenario']:<28}{row['algorithm']:<22}{row['heuristic']:<12}"
+              f"{row['found']:>3}/{row['queries']:<2}{row['time'] * 1000:>12.2f}{row['nodes_expanded']:>12}"
+              f"{format_bytes(row['peak_memory']):>12}{row['suboptimal']:>8}")
+
+
+def print_comparison(result):
+    print(f"{'场景':<28}{'算法':<22}{'启发函数':<12}{'加速比':>10}{'节点数比':>10}{'代价变化':>10}")
+    for row in result["rows"]:
+        print(f"{row['scenario']:<28}{row['algorithm']:<22}{row['heuristic']:<12}"
+              f"{row['speedup']:>10.2f}{row['nodes_ratio']:>10.2f}{row['cost_changes']:>10}")
+    if result["missing"]:
+        print(f"基准中有{result['missing']}个查询在本次运行中缺失或起点/终点不同，未参与对比")
+    for change in result["quality_changes"]:
+        print(f"路径代价变化: {change['scenario']} {change['algorithm']} {change['heuristic']} "
+              f"查询{change['query']}: {change['cost_before']} -> {change['cost_after']}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = build_corpus(args.map_types, args.sizes, args.seed, args.queries)
+    progress = None if args.quiet else (lambda message: print(message, file=sys.stderr, flush=True))
+    report = run_benchmark(scenarios, args.algorithms, args.heuristics, repeat=args.repeat,
+                           warmup=args.warmup, measure_memory=not args.no_memory, progress=progress)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    print_summary(summarize(report))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        result = compare(baseline, report)
+        print()
+        print_comparison(result)
+        if args.fail_on_quality_change and result["quality_changes"]:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
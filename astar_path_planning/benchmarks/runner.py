@@ -0,0 +1,215 @@
+import gc
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import List, Dict, Any, Optional, Sequence, Callable
+import numpy as np
+from astar_path_planning.app.utils.planning import ALGORITHMS, heuristic_names, run_search, compute_path_metrics
+from astar_path_planning.benchmarks.scenarios import Scenario
+
+# 结果文件格式版本，字段含义变化时递增
+RESULT_FORMAT = 1
+
+# 路径代价与最优代价的相对误差超过该值时视为非最优
+COST_TOLERANCE = 1e-6
+
+
+def measure_query(grid_map, start, goal, algorithm: str, heuristic: str, repeat: int = 3, warmup: int = 1,
+                  measure_memory: bool = True) -> Dict[str, Any]:
+    """
+    对单个查询计时并记录搜索结果
+
+    先运行warmup次不计时（分层A*的抽象图、ALT的地标距离表、边代价张量等按地图缓存的数据在此时建立），
+    再运行repeat次记录墙钟时间；measure_memory为True时另外在tracemalloc下运行一次记录内存峰值，
+    tracemalloc的开销不计入时间。
+
+    返回:
+        结果字典：times（秒）、time_min、time_median、nodes_expanded、found、path_cost、
+        path_length、path_nodes、peak_memory（字节，不测量时为None）
+    """
+    for _ in range(warmup):
+        run_search(grid_map, start, goal, algorithm, heuristic)
+
+    times = []
+    path, explored = None, []
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        start_time = time.perf_counter()
+        path, explored = run_search(grid_map, start, goal, algorithm, heuristic)
+        times.append(time.perf_counter() - start_time)
+
+    peak_memory = None
+    if measure_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run_search(grid_map, start, goal, algorithm, heuristic)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    if path:
+        path_length, path_cost = compute_path_metrics(grid_map, path)
+    else:
+        path_length, path_cost = 0.0, float('inf')
+    return {
+        "times": times,
+        "time_min": min(times),
+        "time_median": statistics.median(times),
+        "nodes_expanded": len(explored),
+        "found": path is not None,
+        "path_cost": path_cost,
+        "path_length": path_length,
+        "path_nodes": len(path) if path else 0,
+        "peak_memory": peak_memory,
+    }
+
+
+def run_benchmark(scenarios: Sequence[Scenario], algorithms: Optional[Sequence[str]] = None,
+                  heuristics: Optional[Sequence[str]] = None, repeat: int = 3, warmup: int = 1,
+                  measure_memory: bool = True,
+                  progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    在所有场景上运行每种算法和启发函数的组合
+
+    参数:
+        scenarios: 场景列表（见build_corpus）
+        algorithms: 算法ID列表，为None时使用所有已注册的算法
+        heuristics: 启发函数ID列表，为None时使用所有已注册的启发函数
+        repeat: 每个查询计时的次数
+        warmup: 每个查询计时前不计时运行的次数
+        measure_memory: 是否用tracemalloc测量内存峰值
+        progress: 每完成一个(场景, 算法, 启发函数)组合后以progress(说明)的形式调用
+
+    返回:
+        可直接写入JSON的结果字典：meta（运行环境和参数）、scenarios（场景和查询）、
+        results（每个场景、算法、启发函数、查询一条记录）
+    """
+    algorithms = list(algorithms or ALGORITHMS)
+    heuristics = list(heuristics or heuristic_names())
+    results = []
+    for scenario in scenarios:
+        grid_map = scenario.grid_map
+        for algorithm in algorithms:
+            for heuristic in heuristics:
+                for index, (start, goal, optimal_cost) in enumerate(scenario.queries):
+                    record = measure_query(grid_map, start, goal, algorithm, heuristic,
+                                           repeat, warmup, measure_memory)
+                    record.update({
+                        "scenario": scenario.name,
+                        "algorithm": algorithm,
+                        "heuristic": heuristic,
+                        "query": index,
+                        "optimal_cost": optimal_cost,
+                        "cost_ratio": record["path_cost"] / optimal_cost if optimal_cost > 0 else 1.0,
+                    })
+                    results.append(record)
+                if progress is not None:
+                    progress(f"{scenario.name} {algorithm} {heuristic}")
+
+    return {
+        "format": RESULT_FORMAT,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "repeat": repeat,
+            "warmup": warmup,
+            "measure_memory": measure_memory,
+        },
+        "scenarios": [scenario.describe() for scenario in scenarios],
+        "results": results,
+    }
+
+
+def summarize(report: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    按(场景, 算法, 启发函数)汇总结果
+
+    返回:
+        每个组合一行：查询数、找到路径数、中位时间之和、扩展节点数之和、最大内存峰值、
+        非最优路径数和最大代价比
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for record in report["results"]:
+        groups.setdefault((record["scenario"], record["algorithm"], record["heuristic"]), []).append(record)
+
+    rows = []
+    for (scenario, algorithm, heuristic), records in groups.items():
+        peaks = [r["peak_memory"] for r in records if r["peak_memory"] is not None]
+        ratios = [r["cost_ratio"] for r in records if r["found"]]
+        rows.append({
+            "scenario": scenario,
+            "algorithm": algorithm,
+            "heuristic": heuristic,
+            "queries": len(records),
+            "found": sum(r["found"] for r in records),
+            "time": sum(r["time_median"] for r in records),
+            "nodes_expanded": sum(r["nodes_expanded"] for r in records),
+            "peak_memory": max(peaks) if peaks else None,
+            "suboptimal": sum(ratio > 1 + COST_TOLERANCE for ratio in ratios),
+            "max_cost_ratio": max(ratios) if ratios else None,
+        })
+    return rows
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    对比两次运行的结果
+
+    只对比两次都运行过、且起点/终点相同的查询。时间用中位时间之比，
+    路径质量逐查询比较：找到路径的情况或路径代价变化都算作质量变化。
+
+    返回:
+        {"rows": 每个(场景, 算法, 启发函数)组合的speedup、节点数之比和代价变化的查询数,
+         "quality_changes": 路径质量变化的查询列表, "missing": 基准中有而本次没有的组合数}
+    """
+    def index(report):
+        queries = {s["name"]: s["queries"] for s in report["scenarios"]}
+        table = {}
+        for record in report["results"]:
+            query = queries[record["scenario"]][record["query"]]
+            key = (record["scenario"], record["algorithm"], record["heuristic"], record["query"])
+            table[key] = (tuple(query["start"]), tuple(query["goal"]), record)
+        return table
+
+    old, new = index(baseline), index(current)
+    groups: Dict[tuple, Dict[str, float]] = {}
+    quality_changes = []
+    missing = 0
+    for key, (start, goal, before) in old.items():
+        entry = new.get(key)
+        if entry is None or entry[:2] != (start, goal):
+            missing += 1
+            continue
+        after = entry[2]
+        group = groups.setdefault(key[:3], {"time_before": 0.0, "time_after": 0.0, "nodes_before": 0,
+                                            "nodes_after": 0, "cost_changes": 0})
+        group["time_before"] += before["time_median"]
+        group["time_after"] += after["time_median"]
+        group["nodes_before"] += before["nodes_expanded"]
+        group["nodes_after"] += after["nodes_expanded"]
+        same_cost = (before["path_cost"] == after["path_cost"] or
+                     abs(after["path_cost"] - before["path_cost"]) <= COST_TOLERANCE * max(abs(before["path_cost"]), 1.0))
+        if before["found"] != after["found"] or not same_cost:
+            group["cost_changes"] += 1
+            quality_changes.append({
+                "scenario": key[0], "algorithm": key[1], "heuristic": key[2], "query": key[3],
+                "cost_before": before["path_cost"], "cost_after": after["path_cost"],
+            })
+
+    rows = []
+    for (scenario, algorithm, heuristic), group in groups.items():
+        rows.append({
+            "scenario": scenario,
+            "algorithm": algorithm,
+            "heuristic": heuristic,
+            "speedup": group["time_before"] / group["time_after"] if group["time_after"] > 0 else float('inf'),
+            "nodes_ratio": group["nodes_after"] / group["nodes_before"] if group["nodes_before"] else 1.0,
+            "cost_changes": group["cost_changes"],
+        })
+    return {"rows": rows, "quality_changes": quality_changes, "missing": missing}
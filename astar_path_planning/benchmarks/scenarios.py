@@ -0,0 +1,125 @@
+from typing import List, Tuple, Optional, Sequence
+import numpy as np
+from astar_path_planning.app.utils.map_generator import initialize_test_environment, make_rng
+from astar_path_planning.app.utils.cost_field import compute_cost_field
+
+# 基准测试覆盖的地图类型和默认尺寸
+MAP_TYPES = ("simple", "maze", "complex", "advanced")
+DEFAULT_SIZES = (50, 100, 200)
+# 每张地图的起点/终点对数量
+DEFAULT_QUERIES = 5
+DEFAULT_SEED = 2024
+
+# 起点和终点之间的直线距离至少为地图边长的这个比例（地图上没有这么远的可达格子时取最远的）
+MIN_QUERY_DISTANCE = 0.5
+
+
+class Scenario:
+    """
+    一个基准测试场景：由种子确定的一张地图和一组固定的起点/终点对
+
+    queries中每项为(起点, 终点, 最优路径代价)，最优代价由反向Dijkstra代价场求出，
+    用于检查各算法返回路径的质量。
+    """
+
+    def __init__(self, map_type: str, width: int, height: int, seed: int, query_count: int = DEFAULT_QUERIES):
+        self.map_type = map_type
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.query_count = query_count
+        self.name = f"{map_type}-{width}x{height}-s{seed}"
+        self._map = None
+        self._queries = None
+
+    @property
+    def grid_map(self):
+        """场景的地图，第一次访问时生成"""
+        if self._map is None:
+            self._map = initialize_test_environment(self.width, self.height, self.map_type, seed=self.seed)
+        return self._map
+
+    @property
+    def queries(self) -> List[Tuple[Tuple[int, int], Tuple[int, int], float]]:
+        """场景的起点/终点对，第一次访问时生成"""
+        if self._queries is None:
+            self._queries = make_queries(self.grid_map, self.query_count, self.seed)
+        return self._queries
+
+    def describe(self) -> dict:
+        """场景的参数，写入结果文件，用于跨次运行对齐"""
+        return {
+            "name": self.name,
+            "map_type": self.map_type,
+            "width": self.width,
+            "height": self.height,
+            "seed": self.seed,
+            "queries": [{"start": list(start), "goal": list(goal), "optimal_cost": cost}
+                        for start, goal, cost in self.queries],
+        }
+
+
+def make_queries(grid_map, count: int, seed: Optional[int] = None) -> List[Tuple[Tuple[int, int], Tuple[int, int], float]]:
+    """
+    在地图上随机选取互相可达的起点/终点对
+
+    终点从可通行格子中随机选取，起点从能到达终点、且直线距离不小于
+    MIN_QUERY_DISTANCE * 地图边长的格子中随机选取。相同的地图和种子总是得到相同的结果。
+
+    参数:
+        grid_map: 栅格地图对象
+        count: 起点/终点对数量
+        seed: 随机种子
+
+    返回:
+        [(起点, 终点, 最优路径代价), ...]；地图上可通行格子不足两个时可能少于count个
+    """
+    rng = make_rng(seed)
+    free_y, free_x = np.nonzero(~np.asarray(grid_map.grid))
+    if len(free_x) < 2:
+        return []
+
+    queries = []
+    min_distance = MIN_QUERY_DISTANCE * max(grid_map.width, grid_map.height)
+    ys, xs = np.mgrid[0:grid_map.height, 0:grid_map.width]
+    attempts = 0
+    while len(queries) < count and attempts < count * 10:
+        attempts += 1
+        i = int(rng.integers(len(free_x)))
+        goal = (int(free_x[i]), int(free_y[i]))
+        field = compute_cost_field(grid_map, goal)
+        reachable = np.isfinite(field.cost)
+        reachable[goal[1], goal[0]] = False
+        if not reachable.any():
+            continue
+        distance = np.hypot(xs - goal[0], ys - goal[1])
+        candidates = reachable & (distance >= min_distance)
+        if candidates.any():
+            cy, cx = np.nonzero(candidates)
+            j = int(rng.integers(len(cx)))
+            start = (int(cx[j]), int(cy[j]))
+        else:
+            far = np.where(reachable, distance, -1.0)
+            sy, sx = np.unravel_index(int(np.argmax(far)), far.shape)
+            start = (int(sx), int(sy))
+        queries.append((start, goal, float(field.cost[start[1], start[0]])))
+    return queries
+
+
+def build_corpus(map_types: Sequence[str] = MAP_TYPES, sizes: Sequence[int] = DEFAULT_SIZES,
+                 seed: int = DEFAULT_SEED, query_count: int = DEFAULT_QUERIES) -> List[Scenario]:
+    """
+    生成场景集合：每种地图类型和尺寸一个场景
+
+    地图种子只由seed、地图类型和尺寸确定，与参数的顺序和选取的子集无关，
+    不同次运行的同名场景总是同一张地图。
+
+    返回:
+        场景列表，地图和查询在第一次使用时才生成
+    """
+    scenarios = []
+    for map_type in map_types:
+        for size in sizes:
+            map_seed = seed + 100000 * MAP_TYPES.index(map_type) + size
+            scenarios.append(Scenario(map_type, size, size, map_seed, query_count))
+    return scenarios
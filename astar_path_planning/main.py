@@ -13,13 +13,24 @@ app.mount("/static", StaticFiles(directory="astar_path_planning/app/static"), na
 templates = Jinja2Templates(directory="astar_path_planning/app/templates")
 
 # 导入路由
-from astar_path_planning.app.routers import grid, pathfinding, visualization
+from astar_path_planning.app.routers import grid, pathfinding, visualization, metrics, profiling
+from astar_path_planning.app.utils.metrics import MetricsMiddleware
+from astar_path_planning.app import config
 
 # 注册路由
 app.include_router(grid.router)
 app.include_router(pathfinding.router)
 app.include_router(visualization.router)
 
+# 记录请求耗时并提供 /metrics
+if config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
+
+# 查询性能分析报告
+if config.PROFILING_ENABLED:
+    app.include_router(profiling.router)
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """渲染主页"""